@@ -36,8 +36,10 @@ ENDPOINTS = {
         "upload": "POST /reports/upload",
         "list": "GET /reports/list",
         "get_detail": "GET /reports/{id}",
+        "file": "GET /reports/{id}/file",
         "delete": "DELETE /reports/{id}/delete",
-        "analyze": "POST /reports/{id}/analyze"
+        "analyze": "POST /reports/{id}/analyze",
+        "analysis": "GET /reports/{id}/analysis"
     },
     
     "diet": {
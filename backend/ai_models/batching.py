@@ -0,0 +1,141 @@
+"""Dynamic micro-batching for model inference.
+
+Callers on many threads submit one input each; a single scheduler thread
+collects them into a batch until ``max_batch_size`` inputs are waiting or
+the oldest has waited ``max_wait_ms``, runs one forward pass, and hands each
+caller its own output::
+
+    batcher = MicroBatcher(lambda images: model.predict_on_batch(np.stack(images)),
+                           max_batch_size=32, max_wait_ms=5)
+    probabilities = batcher(image)          # blocks until its batch has run
+
+With ``max_wait_ms=0`` the scheduler never waits: it takes whatever is
+already queued, so a lone caller pays no extra latency and concurrent
+callers still share forward passes.
+"""
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+LATENCY_WINDOW = 2048  # recent requests kept for the latency percentiles
+
+
+def _percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class MicroBatcher:
+    """Collect concurrent single-input calls into batched calls of ``predict_batch``.
+
+    ``predict_batch(inputs)`` gets a list of inputs and must return one output
+    per input, in order. If it raises, every caller in that batch gets the error.
+    """
+
+    def __init__(self, predict_batch, max_batch_size=32, max_wait_ms=5.0, name='micro-batcher'):
+        if max_batch_size < 1:
+            raise ValueError('max_batch_size must be at least 1')
+        self.predict_batch = predict_batch
+        self.max_batch_size = int(max_batch_size)
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self._queue = queue.Queue()
+        self._closed = False
+        self._stats_lock = threading.Lock()
+        self._queue_latency = deque(maxlen=LATENCY_WINDOW)
+        self._total_latency = deque(maxlen=LATENCY_WINDOW)
+        self._requests = 0
+        self._batches = 0
+        self._batch_seconds = 0.0
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, item):
+        """Queue one input; returns a Future for its output."""
+        if self._closed:
+            raise RuntimeError('MicroBatcher is closed')
+        future = Future()
+        self._queue.put((item, future, time.perf_counter()))
+        return future
+
+    def __call__(self, item, timeout=None):
+        return self.submit(item).result(timeout)
+
+    def close(self, timeout=5):
+        """Stop the scheduler after the queued inputs have run."""
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _collect(self):
+        """Block for the first input, then gather more until the batch is full or the wait is over."""
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = first[2] + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                entry = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is None:
+                self._queue.put(None)  # stop after this batch
+                break
+            batch.append(entry)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            started = time.perf_counter()
+            try:
+                outputs = self.predict_batch([item for item, _, _ in batch])
+                if len(outputs) < len(batch):
+                    raise RuntimeError(f'predict_batch returned {len(outputs)} outputs for {len(batch)} inputs')
+                for (_, future, _), output in zip(batch, outputs):
+                    future.set_result(output)
+            except Exception as e:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            finished = time.perf_counter()
+            with self._stats_lock:
+                self._requests += len(batch)
+                self._batches += 1
+                self._batch_seconds += finished - started
+                for _, _, submitted in batch:
+                    self._queue_latency.append(started - submitted)
+                    self._total_latency.append(finished - submitted)
+
+    def metrics(self):
+        """Batch fill rate and queue / end-to-end latency (ms) over recent requests."""
+        with self._stats_lock:
+            queue_latency = list(self._queue_latency)
+            total_latency = list(self._total_latency)
+            requests, batches, batch_seconds = self._requests, self._batches, self._batch_seconds
+
+        def ms(value):
+            return None if value is None else round(value * 1000, 3)
+
+        mean_batch = requests / batches if batches else None
+        return {
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000,
+            'requests': requests,
+            'batches': batches,
+            'queued': self._queue.qsize(),
+            'mean_batch_size': round(mean_batch, 2) if mean_batch else None,
+            'fill_rate': round(mean_batch / self.max_batch_size, 3) if mean_batch else None,
+            'mean_batch_ms': ms(batch_seconds / batches) if batches else None,
+            'queue_latency_ms': {'p50': ms(_percentile(queue_latency, 0.5)),
+                                 'p99': ms(_percentile(queue_latency, 0.99))},
+            'latency_ms': {'p50': ms(_percentile(total_latency, 0.5)),
+                           'p99': ms(_percentile(total_latency, 0.99))},
+        }
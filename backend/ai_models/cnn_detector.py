@@ -1,20 +1,42 @@
-import cv2
 import numpy as np
-from tensorflow import keras
 import os
 
+from ai_models.batching import MicroBatcher
+from ai_models.preprocessing import PreprocessPipeline, load_into
+
+IMAGE_SIZE = (224, 224)
+DEFAULT_BATCH_SIZE = 32
+
+
+def _bucket(n, largest):
+    """Smallest power of two >= n, capped at ``largest``: few distinct shapes, little padding"""
+    size = 1
+    while size < n:
+        size *= 2
+    return min(size, largest)
+
+
 class CNNDiseaseDetector:
     """CNN-based disease detection from medical images"""
     
-    def __init__(self, model_path=None):
+    def __init__(self, model_path=None, preprocess_workers=None, runtime='keras'):
         self.model_path = model_path
+        self.preprocess_workers = preprocess_workers
+        self.runtime = runtime  # 'keras', or 'tflite' for a model exported by export_models.py
         self.model = None
+        self.batcher = None
+        self.pipeline = None
+        self.tensor_cache = None  # ai_models.tensor_cache.TensorCache
         self.classes = ['normal', 'abnormal', 'uncertain']
     
     def load_model(self):
         """Load pre-trained CNN model"""
         try:
-            if self.model_path and os.path.exists(self.model_path):
+            if self.runtime == 'tflite':
+                from ai_models.runtime import TFLiteModel  # no TensorFlow needed with tflite_runtime
+                self.model = TFLiteModel(self.model_path)
+            elif self.model_path and os.path.exists(self.model_path):
+                from tensorflow import keras
                 self.model = keras.models.load_model(self.model_path)
             else:
                 self.model = self._build_default_model()
@@ -23,8 +45,30 @@ class CNNDiseaseDetector:
             print(f"Error loading model: {e}")
             return False
     
+    def warm_up(self):
+        """Run one forward pass per input shape used at serving time, so tracing happens now"""
+        largest = max(DEFAULT_BATCH_SIZE, self.batcher.max_batch_size if self.batcher else 1)
+        for batch_size in sorted({_bucket(n, largest) for n in range(1, largest + 1)} | {DEFAULT_BATCH_SIZE}):
+            self.model.predict_on_batch(np.zeros((batch_size,) + IMAGE_SIZE + (3,), dtype='float32'))
+    
+    def enable_batching(self, max_batch_size=DEFAULT_BATCH_SIZE, max_wait_ms=0):
+        """Route detect_disease through a MicroBatcher so concurrent callers share forward passes"""
+        if self.batcher is not None:
+            self.batcher.close()
+        self.batcher = MicroBatcher(self._predict_images, max_batch_size, max_wait_ms, name='cnn-batcher')
+        return self.batcher
+    
+    def _predict_images(self, images):
+        """One forward pass over preprocessed images, zero-padded to a power-of-two batch"""
+        size = _bucket(len(images), self.batcher.max_batch_size)
+        batch = np.zeros((size,) + IMAGE_SIZE + (3,), dtype='float32')
+        batch[:len(images)] = images
+        return np.asarray(self.model.predict_on_batch(batch))[:len(images)]
+    
     def _build_default_model(self):
         """Build a simple CNN model for image classification"""
+        from tensorflow import keras
+        
         model = keras.Sequential([
             keras.layers.Conv2D(32, (3, 3), activation='relu', input_shape=(224, 224, 3)),
             keras.layers.MaxPooling2D((2, 2)),
@@ -46,54 +90,58 @@ class CNNDiseaseDetector:
         return model
     
     def preprocess_image(self, image_path):
-        """Preprocess image for model input"""
-        try:
-            # Read image
-            img = cv2.imread(image_path)
-            
-            if img is None:
-                return None
-            
-            # Resize to 224x224
-            img = cv2.resize(img, (224, 224))
-            
-            # Normalize pixel values
-            img = img.astype('float32') / 255.0
-            
-            return np.expand_dims(img, axis=0)
-        except Exception as e:
-            print(f"Error preprocessing image: {e}")
+        """Preprocess image for model input: a (1, 224, 224, 3) float32 array, or None"""
+        img = np.empty((1,) + IMAGE_SIZE + (3,), dtype='float32')
+        return img if load_into(image_path, img[0]) else None
+    
+    def _input_tensor(self, image_path, content_hash=None):
+        """(224, 224, 3) model input: from the tensor cache on a hit, else preprocessed (and cached)"""
+        cache = self.tensor_cache if content_hash else None
+        if cache is not None:
+            cached = cache.get(content_hash)
+            if cached is not None:
+                return cached
+        img = self.preprocess_image(image_path)
+        if img is None:
             return None
+        # a miss feeds the model the same float16 values a later hit will read
+        return cache.put(content_hash, img[0]) if cache is not None else img[0]
     
-    def detect_disease(self, image_path):
-        """Detect disease from medical image"""
+    def detect_disease(self, image_path, content_hash=None):
+        """Detect disease from medical image (``content_hash`` enables the tensor cache)"""
         if self.model is None:
             self.load_model()
         
-        preprocessed_img = self.preprocess_image(image_path)
+        tensor = self._input_tensor(image_path, content_hash)
         
-        if preprocessed_img is None:
+        if tensor is None:
             return {'error': 'Could not process image'}
         
         try:
-            # Make prediction
-            predictions = self.model.predict(preprocessed_img, verbose=0)
-            
-            class_idx = np.argmax(predictions[0])
-            confidence = float(predictions[0][class_idx])
-            
-            return {
-                'classification': self.classes[class_idx],
-                'confidence': confidence,
-                'probabilities': {
-                    class_name: float(prob) 
-                    for class_name, prob in zip(self.classes, predictions[0])
-                },
-                'recommendation': self._get_recommendation(self.classes[class_idx], confidence)
-            }
+            # Make prediction (batched with concurrent callers when a batcher is enabled)
+            if self.batcher is not None:
+                probabilities = self.batcher(tensor)
+            else:
+                probabilities = self.model.predict(np.asarray(tensor, dtype='float32')[None], verbose=0)[0]
+            return self._format_prediction(probabilities)
         except Exception as e:
             return {'error': str(e)}
     
+    def _format_prediction(self, probabilities):
+        """Turn one row of class probabilities into a result dict"""
+        class_idx = int(np.argmax(probabilities))
+        confidence = float(probabilities[class_idx])
+        
+        return {
+            'classification': self.classes[class_idx],
+            'confidence': confidence,
+            'probabilities': {
+                class_name: float(prob) 
+                for class_name, prob in zip(self.classes, probabilities)
+            },
+            'recommendation': self._get_recommendation(self.classes[class_idx], confidence)
+        }
+    
     def _get_recommendation(self, classification, confidence):
         """Get recommendation based on classification"""
         if classification == 'abnormal':
@@ -106,13 +154,29 @@ class CNNDiseaseDetector:
         else:
             return 'Results appear normal. Continue regular health check-ups.'
     
-    def batch_analyze(self, image_paths):
-        """Analyze multiple images"""
+    def batch_analyze(self, image_paths, batch_size=DEFAULT_BATCH_SIZE):
+        """Analyze multiple images, one forward pass per batch of ``batch_size``
+        
+        A thread pool decodes the next batch into a reused buffer while the
+        model runs the current one (ai_models/preprocessing.py). Every batch
+        has the same shape, so the model never retraces. Results are in input
+        order.
+        """
+        if self.model is None:
+            self.load_model()
+        if self.pipeline is None or self.pipeline.batch_size != batch_size:
+            if self.pipeline is not None:
+                self.pipeline.close()
+            self.pipeline = PreprocessPipeline(batch_size, self.preprocess_workers)
+        
         results = []
-        for image_path in image_paths:
-            result = self.detect_disease(image_path)
-            results.append({
-                'image': image_path,
-                'result': result
-            })
+        for chunk, batch, ok in self.pipeline.batches(image_paths):
+            try:
+                predictions = np.asarray(self.model.predict_on_batch(batch)) if any(ok) else None
+                outcomes = [self._format_prediction(predictions[i]) if ok[i] else {'error': 'Could not process image'}
+                            for i in range(len(chunk))]
+            except Exception as e:
+                outcomes = [{'error': str(e)} for _ in chunk]
+            results.extend({'image': image_path, 'result': result}
+                           for image_path, result in zip(chunk, outcomes))
         return results
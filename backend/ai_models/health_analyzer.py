@@ -1,16 +1,62 @@
 import numpy as np
-from tensorflow import keras
-from tensorflow.keras import layers
 import pickle
 import os
 
+NUM_FEATURES = 10
+
+
 class HealthAnalyzer:
     """AI-based health analyzer using machine learning"""
     
-    def __init__(self, model_path=None):
+    def __init__(self, model_path=None, runtime='keras'):
         self.model_path = model_path
+        self.runtime = runtime  # 'keras', or 'tflite' for a model exported by export_models.py
         self.model = None
         self.scaler = None
+        self.predict_fn = None  # (N, 10) float32 -> (N, 1) probabilities, the cheapest call available
+    
+    def load_model(self):
+        """Load the trained model, or build an untrained one when no weights exist"""
+        try:
+            if self.runtime == 'tflite':
+                from ai_models.runtime import TFLiteModel  # no TensorFlow needed with tflite_runtime
+                self.use_model(TFLiteModel(self.model_path))
+            elif self.model_path and os.path.exists(self.model_path):
+                from tensorflow import keras
+                self.use_model(keras.models.load_model(self.model_path))
+            else:
+                self.use_model(self._build_model())
+            return True
+        except Exception as e:
+            print(f"Error loading model: {e}")
+            return False
+    
+    def use_model(self, model):
+        """Serve ``model`` and pick the fastest way to call it
+        
+        Keras ``predict`` costs milliseconds per call whatever the batch size,
+        far more than this MLP's arithmetic. A plain Dense stack runs as a
+        NumPy forward pass over its weights instead; anything else gets one
+        traced graph call for every batch size. A TFLite interpreter is
+        already cheap to call.
+        """
+        from ai_models.runtime import DenseNetwork, TFLiteModel
+        self.model = model
+        if isinstance(model, TFLiteModel):
+            self.predict_fn = model.predict_on_batch
+            return
+        network = DenseNetwork.from_keras(model)
+        if network is not None:
+            self.predict_fn = network.predict_on_batch
+            return
+        import tensorflow as tf
+        graph_call = tf.function(lambda x: model(x, training=False), reduce_retracing=True,
+                                 input_signature=[tf.TensorSpec([None, NUM_FEATURES], tf.float32)])
+        self.predict_fn = lambda batch: graph_call(batch).numpy()
+    
+    def warm_up(self):
+        """Run one prediction so the first real call does not pay for tracing"""
+        self.predict_health_condition([0.0] * NUM_FEATURES)
     
     def analyze_vital_signs(self, heart_rate, systolic, diastolic, temperature):
         """Analyze vital signs and return health status"""
@@ -56,27 +102,42 @@ class HealthAnalyzer:
             'recommendations': recommendations
         }
     
+    def predict_proba(self, features):
+        """Probabilities for an (N, 10) feature matrix (or one row of 10), as an (N,) array"""
+        if self.predict_fn is None and not self.load_model():
+            raise RuntimeError('Could not load the health analyzer model')
+        batch = np.asarray(features, dtype='float32')
+        if batch.ndim == 1:
+            batch = batch[None]
+        return np.asarray(self.predict_fn(batch)).reshape(len(batch))
+    
     def predict_health_condition(self, features):
         """Predict potential health conditions using ML model"""
         try:
-            if self.model is None:
-                self.model = self._build_model()
-            
-            # Normalize features
-            features_array = np.array(features).reshape(1, -1)
-            
-            # Make prediction
-            prediction = self.model.predict(features_array, verbose=0)
-            
-            return {
-                'prediction': float(prediction[0][0]),
-                'confidence': float(prediction[0][0]) if prediction[0][0] > 0.5 else 1 - float(prediction[0][0])
-            }
+            return self._format_prediction(self.predict_proba(features)[0])
         except Exception as e:
             return {'error': str(e)}
     
+    def predict_batch(self, features):
+        """predict_health_condition for every row of an (N, 10) feature matrix, in one call"""
+        try:
+            return [self._format_prediction(p) for p in self.predict_proba(features)]
+        except Exception as e:
+            return [{'error': str(e)} for _ in range(len(features))]
+    
+    def _format_prediction(self, probability):
+        """Turn one probability into a result dict"""
+        probability = float(probability)
+        return {
+            'prediction': probability,
+            'confidence': probability if probability > 0.5 else 1 - probability
+        }
+    
     def _build_model(self):
         """Build a simple neural network model"""
+        from tensorflow import keras
+        from tensorflow.keras import layers
+        
         model = keras.Sequential([
             layers.Dense(64, activation='relu', input_shape=(10,)),
             layers.Dropout(0.2),
@@ -1,27 +1,69 @@
 import numpy as np
-import nltk
-from nltk.tokenize import word_tokenize
-from nltk.corpus import stopwords
-from transformers import pipeline
+
+SENTIMENT_MODEL = 'distilbert-base-uncased-finetuned-sst-2-english'
+
 
 class NLPHealthProcessor:
-    """NLP-based health data processor"""
+    """NLP-based health data processor
+    
+    NLTK and transformers are imported on first use, not with this module:
+    keyword analysis only needs NLTK, and only sentiment analysis loads the
+    transformer model.
+    """
     
     def __init__(self):
+        self.sentiment_pipeline = None
+        self.stop_words = None
+        self.nltk_error = None  # a failed load is remembered, not retried on every call
+        self.sentiment_error = None
+    
+    def _load_nltk(self):
+        """Fetch the tokenizer and stopword data once and return ``word_tokenize``"""
+        if self.nltk_error is not None:
+            raise RuntimeError(self.nltk_error)
         try:
-            nltk.download('punkt', quiet=True)
-            nltk.download('stopwords', quiet=True)
-            self.sentiment_pipeline = pipeline('sentiment-analysis', model='distilbert-base-uncased-finetuned-sst-2-english')
+            from nltk.tokenize import word_tokenize
+            if self.stop_words is None:
+                import nltk
+                from nltk.corpus import stopwords
+                nltk.download('punkt', quiet=True)
+                nltk.download('stopwords', quiet=True)
+                self.stop_words = set(stopwords.words('english'))
+        except Exception as e:
+            self.nltk_error = f'NLTK unavailable: {e}'
+            raise
+        return word_tokenize
+    
+    def _load_sentiment(self):
+        """Build the sentiment pipeline once (it does not need NLTK); True if available"""
+        if self.sentiment_pipeline is None and self.sentiment_error is None:
+            try:
+                from transformers import pipeline
+                self.sentiment_pipeline = pipeline('sentiment-analysis', model=SENTIMENT_MODEL)
+            except Exception as e:
+                self.sentiment_error = f'Sentiment model unavailable: {e}'
+                print(f"Warning: {self.sentiment_error}")
+        return self.sentiment_pipeline is not None
+    
+    def load_model(self):
+        """Load the NLTK data and the sentiment model; True if sentiment analysis is available"""
+        try:
+            self._load_nltk()
         except Exception as e:
             print(f"Warning: {e}")
+        return self._load_sentiment()
+    
+    def warm_up(self):
+        """Run one sentiment prediction so the first real call does not pay for it"""
+        self.analyze_sentiment('warm up')
     
     def analyze_symptoms(self, symptom_text):
         """Analyze symptom description using NLP"""
+        word_tokenize = self._load_nltk()
         tokens = word_tokenize(symptom_text.lower())
         
         # Remove stopwords
-        stop_words = set(stopwords.words('english'))
-        filtered_tokens = [token for token in tokens if token.isalnum() and token not in stop_words]
+        filtered_tokens = [token for token in tokens if token.isalnum() and token not in self.stop_words]
         
         # Symptom keywords mapping
         symptom_keywords = {
@@ -48,6 +90,8 @@ class NLPHealthProcessor:
     def analyze_sentiment(self, text):
         """Analyze sentiment of health-related text"""
         try:
+            if not self._load_sentiment():
+                return {'error': self.sentiment_error}
             result = self.sentiment_pipeline(text[:512])  # Limit to 512 tokens
             return {
                 'sentiment': result[0]['label'],
@@ -0,0 +1,82 @@
+"""Parallel image decode / resize / normalise into reused batch buffers.
+
+``cv2.imread`` and ``cv2.resize`` release the GIL, so a thread pool keeps
+every core busy decoding. Each image is resized into a per-thread uint8
+scratch array and normalised straight into its row of a preallocated
+float32 batch buffer, so no per-image arrays are allocated apart from the
+decoded source image. Two buffers alternate: the pool fills the next batch
+while the model runs the current one.
+
+OpenCV is imported on first decode, so importing this module (and the
+detector, tensor cache and shard modules built on it) costs nothing.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+IMAGE_SIZE = (224, 224)  # (width, height) as cv2 takes it; the model input is square
+PREPROCESS_VERSION = 1  # bump when load_into's output changes; keys the tensor cache
+_SCALE = np.float32(255.0)
+
+
+def load_into(image_path, out, scratch=None):
+    """Decode, resize and normalise ``image_path`` into ``out`` (a 224x224x3 float32 view); False if unreadable.
+
+    ``scratch`` is an optional 224x224x3 uint8 array that receives the resized image.
+    """
+    import cv2  # outside the try: a missing OpenCV is an error, not an unreadable image
+    try:
+        img = cv2.imread(image_path)
+        if img is None:
+            return False
+        resized = cv2.resize(img, IMAGE_SIZE, dst=scratch)
+        np.divide(resized, _SCALE, out=out)
+        return True
+    except Exception as e:
+        print(f"Error preprocessing image: {e}")
+        return False
+
+
+class PreprocessPipeline:
+    """Fill ``(batch_size, 224, 224, 3)`` float32 buffers from image paths on a thread pool."""
+
+    def __init__(self, batch_size, workers=None, buffers=2):
+        self.batch_size = int(batch_size)
+        self.workers = workers or os.cpu_count() or 1
+        self.buffers = [np.zeros((self.batch_size, IMAGE_SIZE[1], IMAGE_SIZE[0], 3), dtype='float32')
+                        for _ in range(max(2, buffers))]
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='preprocess')
+        self._local = threading.local()
+
+    def _scratch(self):
+        scratch = getattr(self._local, 'scratch', None)
+        if scratch is None:
+            scratch = self._local.scratch = np.empty((IMAGE_SIZE[1], IMAGE_SIZE[0], 3), dtype='uint8')
+        return scratch
+
+    def load_into(self, image_path, out):
+        return load_into(image_path, out, self._scratch())
+
+    def _submit(self, image_paths, buffer):
+        return [self._pool.submit(self.load_into, path, buffer[i]) for i, path in enumerate(image_paths)]
+
+    def batches(self, image_paths):
+        """Yield ``(paths, buffer, ok flags)`` per batch, in order.
+
+        Rows past ``len(paths)`` and rows whose flag is False hold stale data.
+        A buffer is reused two batches later, so finish with it before asking
+        for the next batch.
+        """
+        image_paths = list(image_paths)
+        chunks = [image_paths[i:i + self.batch_size] for i in range(0, len(image_paths), self.batch_size)]
+        pending = self._submit(chunks[0], self.buffers[0]) if chunks else None
+        for n, chunk in enumerate(chunks):
+            ok = [future.result() for future in pending]
+            if n + 1 < len(chunks):
+                pending = self._submit(chunks[n + 1], self.buffers[(n + 1) % len(self.buffers)])
+            yield chunk, self.buffers[n % len(self.buffers)], ok
+
+    def close(self):
+        self._pool.shutdown(wait=True)
@@ -0,0 +1,192 @@
+"""Process-wide registry of loaded AI models.
+
+Each model is loaded once per process and shared by every caller::
+
+    registry.register_defaults(model_dir)      # or register(name, loader)
+    detector = registry.get('cnn_detector')    # loads and warms up on first call
+
+Loading builds the Keras graph and then runs one warm-up inference (the
+model's ``warm_up()``), so the first real request does not pay for graph
+tracing. Load time, warm-up time and the RSS growth it caused are recorded
+per model (``stats()``).
+
+TensorFlow state does not survive ``fork()``, so a forked child starts with
+an empty registry and loads its own copies. Job workers preload the models
+their job types need when they start.
+"""
+import os
+import threading
+import time
+from datetime import datetime
+
+CNN_MODEL_FILE = 'cnn_detector.h5'
+HEALTH_MODEL_FILE = 'health_analyzer.h5'
+
+_loaders = {}  # name -> zero-argument callable returning the model
+_models = {}
+_stats = {}
+_lock = threading.Lock()
+_load_locks = {}
+
+
+def _rss_bytes():
+    """Resident set size of this process, or None where it cannot be read."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return None
+
+
+def register(name, loader, replace=False):
+    """Register ``loader()`` as the way to build model ``name``; the first registration wins."""
+    with _lock:
+        if name in _loaders and not replace:
+            return False
+        _loaders[name] = loader
+        _load_locks.setdefault(name, threading.Lock())
+        if replace:
+            _models.pop(name, None)
+            _stats.pop(name, None)
+        return True
+
+
+def is_registered(name):
+    return name in _loaders
+
+
+def _load_cnn_detector(model_path, runtime, max_batch_size=0, max_wait_ms=0,
+                       tensor_cache_folder=None, tensor_cache_bytes=0):
+    from ai_models.cnn_detector import CNNDiseaseDetector
+    detector = CNNDiseaseDetector(model_path, runtime=runtime)
+    if not detector.load_model():
+        raise RuntimeError('Could not load the CNN model')
+    if tensor_cache_folder and tensor_cache_bytes:
+        from ai_models.tensor_cache import TensorCache
+        detector.tensor_cache = TensorCache(tensor_cache_folder, tensor_cache_bytes)
+    if max_batch_size:
+        detector.enable_batching(max_batch_size, max_wait_ms)
+    return detector
+
+
+def _load_health_analyzer(model_path, runtime):
+    from ai_models.health_analyzer import HealthAnalyzer
+    analyzer = HealthAnalyzer(model_path, runtime=runtime)
+    if not analyzer.load_model():
+        raise RuntimeError('Could not load the health analyzer model')
+    return analyzer
+
+
+MODEL_FILES = {'cnn_detector': CNN_MODEL_FILE, 'health_analyzer': HEALTH_MODEL_FILE}
+
+
+def model_file(model_dir, name, runtime='keras'):
+    """``(runtime, path)`` of the artifact served for model ``name`` (see ai_models/runtime.py)."""
+    from ai_models.runtime import resolve_runtime
+    return resolve_runtime(runtime, os.path.join(model_dir, MODEL_FILES[name]))
+
+
+def register_defaults(model_dir, runtime='keras', max_batch_size=0, max_wait_ms=0,
+                      tensor_cache_folder=None, tensor_cache_bytes=0):
+    """Register the bundled models with their weights under ``model_dir``.
+
+    ``runtime`` is ``keras``, ``tflite`` or ``auto``. ``max_batch_size`` > 0
+    micro-batches concurrent CNN calls (ai_models/batching.py), and a
+    ``tensor_cache_bytes`` budget caches preprocessed CNN inputs on disk
+    (ai_models/tensor_cache.py).
+    """
+    def cnn_detector():
+        served, path = model_file(model_dir, 'cnn_detector', runtime)
+        return _load_cnn_detector(path, served, max_batch_size, max_wait_ms,
+                                  tensor_cache_folder, tensor_cache_bytes)
+
+    def health_analyzer():
+        served, path = model_file(model_dir, 'health_analyzer', runtime)
+        return _load_health_analyzer(path, served)
+
+    register('cnn_detector', cnn_detector)
+    register('health_analyzer', health_analyzer)
+
+
+def get(name):
+    """The shared instance of model ``name``, loading and warming it up on first use."""
+    model = _models.get(name)
+    if model is not None:
+        return model
+    if name not in _loaders:
+        raise KeyError(f'No model registered as {name!r}')
+    with _load_locks[name]:
+        model = _models.get(name)
+        if model is None:
+            rss_before = _rss_bytes()
+            started = time.perf_counter()
+            model = _loaders[name]()
+            loaded = time.perf_counter()
+            if hasattr(model, 'warm_up'):
+                model.warm_up()
+            warmed = time.perf_counter()
+            rss_after = _rss_bytes()
+            _stats[name] = {
+                'runtime': getattr(model, 'runtime', None),
+                'load_seconds': round(loaded - started, 3),
+                'warmup_seconds': round(warmed - loaded, 3),
+                'rss_delta_bytes': rss_after - rss_before if rss_before is not None and rss_after is not None else None,
+                'loaded_at': datetime.utcnow().isoformat(),
+                'pid': os.getpid(),
+            }
+            _models[name] = model
+    return model
+
+
+def preload(names=None):
+    """Load (and warm up) ``names`` or every registered model; returns {name: stats or error}."""
+    report = {}
+    for name in names or list(_loaders):
+        try:
+            get(name)
+            report[name] = dict(_stats[name])
+        except Exception as e:
+            report[name] = {'error': str(e)}
+    return report
+
+
+def stats():
+    """Load statistics of the models resident in this process, with batching and tensor-cache metrics."""
+    report = {}
+    for name, info in list(_stats.items()):
+        report[name] = dict(info)
+        batcher = getattr(_models.get(name), 'batcher', None)
+        if batcher is not None:
+            report[name]['batching'] = batcher.metrics()
+        tensor_cache = getattr(_models.get(name), 'tensor_cache', None)
+        if tensor_cache is not None:
+            report[name]['tensor_cache'] = tensor_cache.stats()
+    return report
+
+
+def unload(name=None):
+    """Drop one model (or all) so the next ``get`` loads it again, e.g. after new weights ship."""
+    with _lock:
+        for key in ([name] if name else list(_models)):
+            batcher = getattr(_models.pop(key, None), 'batcher', None)
+            if batcher is not None:
+                batcher.close()
+            _stats.pop(key, None)
+
+
+def _after_fork_in_child():
+    global _lock
+    _lock = threading.Lock()
+    for name in _load_locks:
+        _load_locks[name] = threading.Lock()
+    _models.clear()
+    _stats.clear()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
@@ -0,0 +1,185 @@
+"""Serve exported models from the TFLite interpreter instead of full Keras.
+
+``export_models.py`` converts the Keras models to ``.tflite`` files (float32,
+dynamic-range or full int8 weights/activations). ``TFLiteModel`` exposes the
+part of the Keras API the detectors use (``predict`` / ``predict_on_batch``),
+so it can stand in for ``self.model``. It uses the standalone
+``tflite_runtime`` package when installed (no TensorFlow import at all) and
+falls back to ``tf.lite``.
+
+``MODEL_RUNTIME`` selects what is served: ``keras``, ``tflite``, or ``auto``
+(TFLite when the exported file exists and an interpreter is available).
+
+``DenseNetwork`` runs a plain stack of Dense layers (the health model) as
+NumPy matrix products over weights copied out of the Keras model: a
+single-sample call costs microseconds instead of Keras' per-call overhead.
+"""
+import importlib.util
+import os
+import threading
+
+import numpy as np
+
+RUNTIMES = ('keras', 'tflite', 'auto')
+TFLITE_SUFFIX = '.tflite'
+
+
+def _interpreter_class():
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        import tensorflow as tf
+        Interpreter = tf.lite.Interpreter
+    return Interpreter
+
+
+def tflite_available():
+    return (importlib.util.find_spec('tflite_runtime') is not None
+            or importlib.util.find_spec('tensorflow') is not None)
+
+
+def tflite_path(keras_path):
+    """``cnn_detector.h5`` -> ``cnn_detector.tflite``"""
+    return os.path.splitext(keras_path)[0] + TFLITE_SUFFIX
+
+
+def resolve_runtime(runtime, keras_path):
+    """``(runtime, path)`` actually served for ``runtime`` in RUNTIMES."""
+    if runtime not in RUNTIMES:
+        raise ValueError(f"MODEL_RUNTIME must be one of {', '.join(RUNTIMES)}, not {runtime!r}")
+    exported = tflite_path(keras_path)
+    if runtime == 'tflite' or (runtime == 'auto' and os.path.exists(exported) and tflite_available()):
+        return 'tflite', exported
+    return 'keras', keras_path
+
+
+class TFLiteModel:
+    """A ``.tflite`` model with a Keras-like ``predict_on_batch``.
+
+    One interpreter is kept per batch size, so alternating shapes never
+    re-allocate tensors. Interpreters are not thread-safe; calls are serialised.
+    """
+
+    def __init__(self, path, num_threads=None):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f'No exported model at {path}; run export_models.py first')
+        self.path = path
+        self.num_threads = num_threads
+        self._interpreter_class = _interpreter_class()
+        self._interpreters = {}
+        self._lock = threading.Lock()
+        self.input_details, self.output_details = self._interpreter(1)[1:]
+
+    def _interpreter(self, batch_size):
+        entry = self._interpreters.get(batch_size)
+        if entry is None:
+            interpreter = self._interpreter_class(model_path=self.path, num_threads=self.num_threads)
+            inp = interpreter.get_input_details()[0]
+            if inp['shape'][0] != batch_size:
+                interpreter.resize_tensor_input(inp['index'], [batch_size] + list(inp['shape'][1:]))
+            interpreter.allocate_tensors()
+            entry = self._interpreters[batch_size] = (
+                interpreter, interpreter.get_input_details()[0], interpreter.get_output_details()[0])
+        return entry
+
+    @property
+    def quantized(self):
+        return self.input_details['dtype'] != np.float32 or self.output_details['dtype'] != np.float32
+
+    def predict_on_batch(self, batch):
+        batch = np.asarray(batch, dtype='float32')
+        with self._lock:
+            interpreter, inp, out = self._interpreter(len(batch))
+            if inp['dtype'] != np.float32:  # integer-only input: quantize with the tensor's scale
+                scale, zero_point = inp['quantization']
+                info = np.iinfo(inp['dtype'])
+                batch = np.clip(np.round(batch / scale + zero_point), info.min, info.max).astype(inp['dtype'])
+            interpreter.set_tensor(inp['index'], batch)
+            interpreter.invoke()
+            result = interpreter.get_tensor(out['index'])
+            if out['dtype'] != np.float32:
+                scale, zero_point = out['quantization']
+                return (result.astype('float32') - zero_point) * scale
+            return result.copy()
+
+    def predict(self, batch, verbose=0):
+        return self.predict_on_batch(batch)
+
+
+def _sigmoid(x):
+    return 0.5 * (1.0 + np.tanh(0.5 * x))  # no overflow for large |x|
+
+
+def _softmax(x):
+    e = np.exp(x - x.max(axis=1, keepdims=True))
+    return e / e.sum(axis=1, keepdims=True)
+
+
+ACTIVATIONS = {
+    'linear': lambda x: x,
+    'relu': lambda x: np.maximum(x, 0.0, out=x),
+    'sigmoid': _sigmoid,
+    'tanh': np.tanh,
+    'softmax': _softmax,
+}
+PASSTHROUGH_LAYERS = ('InputLayer', 'Dropout')  # no-ops at inference
+
+
+class DenseNetwork:
+    """A Keras model made only of Dense (and Dropout) layers, evaluated with NumPy."""
+
+    def __init__(self, layers):
+        self.layers = [(np.asarray(w, dtype='float32'), np.asarray(b, dtype='float32'), ACTIVATIONS[act])
+                       for w, b, act in layers]
+
+    @classmethod
+    def from_keras(cls, model):
+        """The model's weights as a DenseNetwork, or None if it has any other kind of layer."""
+        layers = []
+        for layer in model.layers:
+            kind = type(layer).__name__
+            if kind in PASSTHROUGH_LAYERS:
+                continue
+            activation = getattr(getattr(layer, 'activation', None), '__name__', None)
+            if kind != 'Dense' or activation not in ACTIVATIONS:
+                return None
+            weights = layer.get_weights()
+            bias = weights[1] if len(weights) > 1 else np.zeros(weights[0].shape[1], dtype='float32')
+            layers.append((weights[0], bias, activation))
+        return cls(layers) if layers else None
+
+    def predict_on_batch(self, batch):
+        x = np.asarray(batch, dtype='float32')
+        for weights, bias, activation in self.layers:
+            x = activation(x @ weights + bias)
+        return x
+
+    def predict(self, batch, verbose=0):
+        return self.predict_on_batch(batch)
+
+
+def export_tflite(keras_model, path, quantize=None, representative_data=None):
+    """Convert ``keras_model`` to ``path``; returns the file size.
+
+    ``quantize``: None (float32), ``'dynamic'`` (int8 weights) or ``'int8'``
+    (int8 weights and activations, calibrated on ``representative_data``, an
+    iterable of single inputs). Input and output stay float32 either way.
+    """
+    import tensorflow as tf
+    converter = tf.lite.TFLiteConverter.from_keras_model(keras_model)
+    if quantize in ('dynamic', 'int8'):
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantize == 'int8':
+        if representative_data is None:
+            raise ValueError('int8 quantization needs representative_data')
+        samples = list(representative_data)
+        converter.representative_dataset = lambda: ([np.asarray(s, dtype='float32')[None]] for s in samples)
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    elif quantize not in (None, 'dynamic'):
+        raise ValueError(f'Unknown quantization {quantize!r}')
+    flatbuffer = converter.convert()
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(flatbuffer)
+    os.replace(tmp, path)
+    return len(flatbuffer)
@@ -0,0 +1,148 @@
+"""Memory-mapped shard files of preprocessed images, for bulk re-scoring.
+
+A dataset is a directory::
+
+    manifest.json         preprocess version, tensor shape/dtype, shard list
+    shard-00000.npy       (shard_size, 224, 224, 3) float16, rows [0, count) used
+    shard-00000.keys      one content hash per row, in row order
+    ...
+
+Shards are written once with ``np.lib.format.open_memmap`` and read back
+with ``np.load(mmap_mode='r')``: a pass over the dataset is a sequential
+read of a few large files instead of a decode of millions of small ones.
+``ShardDataset.batches`` converts the next batch to float32 on a helper
+thread while the caller runs the current one, so the model is never
+waiting on disk.
+"""
+import json
+import mmap
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from ai_models.preprocessing import IMAGE_SIZE, PREPROCESS_VERSION
+
+MANIFEST = 'manifest.json'
+DEFAULT_SHARD_SIZE = 4096  # ~1.2 GB of float16 tensors per shard
+SHARD_DTYPE = np.float16
+ROW_SHAPE = (IMAGE_SIZE[1], IMAGE_SIZE[0], 3)
+
+
+class ShardWriter:
+    """Append preprocessed tensors to fixed-size shards; call ``close()`` to write the manifest."""
+
+    def __init__(self, out_dir, shard_size=DEFAULT_SHARD_SIZE):
+        if os.path.exists(os.path.join(out_dir, MANIFEST)):
+            raise FileExistsError(f'{out_dir} already holds a dataset')
+        os.makedirs(out_dir, exist_ok=True)
+        self.out_dir = out_dir
+        self.shard_size = int(shard_size)
+        self.shards = []
+        self._array = None
+        self._keys = []
+
+    def _open_shard(self):
+        name = f'shard-{len(self.shards):05d}'
+        self._array = np.lib.format.open_memmap(os.path.join(self.out_dir, f'{name}.npy'), mode='w+',
+                                                dtype=SHARD_DTYPE, shape=(self.shard_size,) + ROW_SHAPE)
+        self._keys = []
+        self.shards.append({'name': name, 'count': 0})
+
+    def _close_shard(self):
+        if self._array is None:
+            return
+        self._array.flush()
+        self._array = None
+        with open(os.path.join(self.out_dir, f"{self.shards[-1]['name']}.keys"), 'w') as f:
+            f.write('\n'.join(self._keys) + ('\n' if self._keys else ''))
+        self.shards[-1]['count'] = len(self._keys)
+
+    def add_batch(self, keys, tensors):
+        """Append ``tensors[i]`` (float32 or float16) under ``keys[i]``."""
+        i = 0
+        while i < len(keys):
+            if self._array is None or len(self._keys) == self.shard_size:
+                self._close_shard()
+                self._open_shard()
+            row = len(self._keys)
+            take = min(len(keys) - i, self.shard_size - row)
+            self._array[row:row + take] = tensors[i:i + take]  # float32 -> float16 in place
+            self._keys.extend(keys[i:i + take])
+            i += take
+
+    @property
+    def count(self):
+        return sum(s['count'] for s in self.shards[:-1]) + len(self._keys)
+
+    def close(self):
+        self._close_shard()
+        manifest = {
+            'preprocess_version': PREPROCESS_VERSION,
+            'dtype': np.dtype(SHARD_DTYPE).name,
+            'row_shape': list(ROW_SHAPE),
+            'shard_size': self.shard_size,
+            'count': sum(s['count'] for s in self.shards),
+            'shards': self.shards,
+        }
+        tmp = os.path.join(self.out_dir, MANIFEST + '.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp, os.path.join(self.out_dir, MANIFEST))
+        return manifest
+
+
+class ShardDataset:
+    """Read a dataset written by ShardWriter."""
+
+    def __init__(self, path):
+        with open(os.path.join(path, MANIFEST)) as f:
+            self.manifest = json.load(f)
+        if self.manifest['preprocess_version'] != PREPROCESS_VERSION:
+            raise ValueError(f"Dataset was built with preprocess version {self.manifest['preprocess_version']}, "
+                             f'current is {PREPROCESS_VERSION}; rebuild it')
+        self.path = path
+
+    def __len__(self):
+        return self.manifest['count']
+
+    def shard(self, entry):
+        """``(keys, rows)`` of one shard; rows is a read-only float16 memmap."""
+        array = np.load(os.path.join(self.path, f"{entry['name']}.npy"), mmap_mode='r')
+        madvise = getattr(getattr(array, '_mmap', None), 'madvise', None)
+        if madvise is not None and hasattr(mmap, 'MADV_SEQUENTIAL'):
+            madvise(mmap.MADV_SEQUENTIAL)  # aggressive read-ahead, drop pages behind us
+        with open(os.path.join(self.path, f"{entry['name']}.keys")) as f:
+            keys = f.read().split()
+        return keys, array[:entry['count']]
+
+    def _slices(self, batch_size):
+        for entry in self.manifest['shards']:
+            keys, rows = self.shard(entry)
+            for start in range(0, len(keys), batch_size):
+                yield keys[start:start + batch_size], rows[start:start + batch_size]
+
+    def batches(self, batch_size):
+        """Yield ``(keys, float32 batch)`` in dataset order.
+
+        The batch array is one of two reused buffers; finish with it before
+        asking for the next batch. Padding rows past ``len(keys)`` are stale.
+        """
+        buffers = [np.zeros((batch_size,) + ROW_SHAPE, dtype='float32') for _ in range(2)]
+
+        def load(item, buffer):
+            keys, rows = item
+            buffer[:len(keys)] = rows  # page-in and float16 -> float32 happen here, off the caller's thread
+            return keys, buffer
+
+        slices = self._slices(batch_size)
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix='shard-reader') as reader:
+            first = next(slices, None)
+            pending = reader.submit(load, first, buffers[0]) if first else None
+            n = 0
+            while pending is not None:
+                keys, batch = pending.result()
+                upcoming = next(slices, None)
+                pending = reader.submit(load, upcoming, buffers[(n + 1) % 2]) if upcoming else None
+                yield keys, batch
+                n += 1
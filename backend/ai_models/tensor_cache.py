@@ -0,0 +1,126 @@
+"""On-disk cache of preprocessed image tensors, keyed by content hash.
+
+Each entry is a 224x224x3 float16 ``.npy`` file at
+``<folder>/v<PREPROCESS_VERSION>/ab/<sha256>.npy``. A hit is an
+``np.load(mmap_mode='r')``: no decode, no resize, and the page cache
+serves the bytes without a copy. Bumping PREPROCESS_VERSION (when
+preprocessing changes) starts a fresh namespace; old entries age out.
+
+Entries are evicted least-recently-used first once the folder exceeds
+``max_bytes``, down to ``LOW_WATERMARK`` of it. A hit refreshes the file's
+mtime (at most once per ``TOUCH_INTERVAL``), which is what eviction
+orders by, so several processes can share one folder.
+"""
+import os
+import re
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from ai_models.preprocessing import PREPROCESS_VERSION
+
+TENSOR_DTYPE = np.float16
+LOW_WATERMARK = 0.9
+TOUCH_INTERVAL = 60  # seconds
+_SHA256 = re.compile(r'^[0-9a-f]{64}$')
+
+
+class TensorCache:
+    """Preprocessed tensors on disk with LRU eviction against a byte budget."""
+
+    def __init__(self, folder, max_bytes, version=PREPROCESS_VERSION):
+        self.root = os.path.join(folder, f'v{version}')
+        self.max_bytes = int(max_bytes)
+        self._lock = threading.Lock()
+        self._bytes = None  # measured lazily; corrected on every eviction scan
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, content_hash):
+        if not _SHA256.match(content_hash or ''):
+            raise ValueError('content_hash must be a SHA-256 hex digest')
+        return os.path.join(self.root, content_hash[:2], f'{content_hash}.npy')
+
+    def get(self, content_hash):
+        """The cached tensor as a read-only memmap, or None."""
+        path = self.path(content_hash)
+        try:
+            tensor = np.load(path, mmap_mode='r')
+        except (OSError, ValueError):  # missing, or evicted / half-written by another process
+            with self._lock:
+                self.misses += 1
+            return None
+        try:
+            if time.time() - os.stat(path).st_mtime > TOUCH_INTERVAL:
+                os.utime(path)
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+        return tensor
+
+    def put(self, content_hash, tensor):
+        """Store ``tensor`` as float16 and return what a later ``get`` will read back."""
+        stored = np.asarray(tensor, dtype=TENSOR_DTYPE)
+        path = self.path(content_hash)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, stored)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        size = os.path.getsize(path)
+        with self._lock:
+            if self._bytes is not None:
+                self._bytes += size
+            over = self._bytes is None or self._bytes > self.max_bytes
+        if over:
+            self.evict()
+        return stored
+
+    def _entries(self):
+        entries = []
+        try:
+            shards = list(os.scandir(self.root))
+        except OSError:
+            return entries
+        for shard in shards:
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith('.npy'):
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+        return entries
+
+    def evict(self):
+        """Delete least-recently-used entries until the cache is under its low watermark; returns bytes freed."""
+        with self._lock:
+            entries = self._entries()
+            total = sum(size for _, size, _ in entries)
+            freed = 0
+            if total > self.max_bytes:
+                target = self.max_bytes * LOW_WATERMARK
+                for _, size, path in sorted(entries):
+                    if total - freed <= target:
+                        break
+                    try:
+                        os.remove(path)  # processes that mmapped it keep their mapping
+                        freed += size
+                    except OSError:
+                        pass
+            self._bytes = total - freed
+            return freed
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'bytes': self._bytes, 'max_bytes': self.max_bytes}
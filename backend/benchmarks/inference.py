@@ -0,0 +1,310 @@
+#!/usr/bin/env python
+"""
+Inference benchmark suite: throughput, latency, peak memory and load time of
+the AI models across batch sizes, thread counts and runtimes, on synthetic
+inputs. Meant for CPU-only CI: save a baseline once per runner type, then
+compare every run against it.
+
+Run from the project root:
+  python backend/benchmarks/inference.py                                  # everything installed
+  python backend/benchmarks/inference.py --models health_analyzer --runtimes keras,tflite --threads 1,4
+  python backend/benchmarks/inference.py --json bench.json --save-baseline backend/benchmarks/baseline.json
+  python backend/benchmarks/inference.py --baseline backend/benchmarks/baseline.json   # exit 1 on regression
+
+Each (model, runtime, threads) combination runs in its own subprocess, so
+load time includes the framework import, peak RSS is that combination's
+alone, and thread settings take effect before the framework starts. Inside
+it every batch size is timed after warm-up calls. What is timed:
+
+  cnn_detector     model.predict_on_batch on (N, 224, 224, 3) images
+  health_analyzer  predict_health_condition for N=1, predict_proba on (N, 10) otherwise
+  nlp_processor    transformers: the sentiment pipeline over N texts; nltk: analyze_symptoms per text
+
+Combinations whose packages or exported model files are missing are
+reported as skipped, not failed.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, BACKEND)
+
+RUNTIMES = {
+    'cnn_detector': ('keras', 'tflite'),
+    'health_analyzer': ('keras', 'tflite'),
+    'nlp_processor': ('transformers', 'nltk'),
+}
+REQUIRES = {'keras': ('tensorflow',), 'transformers': ('transformers', 'torch'), 'nltk': ('nltk',)}
+DEFAULT_BATCH_SIZES = {'cnn_detector': '1,8,32', 'health_analyzer': '1,32,256', 'nlp_processor': '1,8,32'}
+SYMPTOM_WORDS = ['fever', 'cough', 'headache', 'tired', 'nausea', 'chest', 'pain', 'sore', 'throat', 'since',
+                 'yesterday', 'mild', 'severe', 'night', 'after', 'eating', 'and', 'a', 'the', 'with']
+# a regression is a change beyond these fractions of the baseline value
+DEFAULT_TOLERANCE = 0.25
+DEFAULT_LOAD_TOLERANCE = 1.0  # load time includes disk and import caches; only flag doubling
+
+
+def peak_rss_bytes():
+    """Peak resident set size of this process, or None where it cannot be read."""
+    try:
+        import resource  # POSIX only
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024  # Linux reports KiB
+    except ImportError:
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, 'peak_wset', info.rss)  # Windows keeps the peak working set
+    except ImportError:
+        return None
+
+
+def missing_packages(runtime):
+    if runtime == 'tflite':
+        if importlib.util.find_spec('tflite_runtime') or importlib.util.find_spec('tensorflow'):
+            return []
+        return ['tflite_runtime or tensorflow']
+    return [name for name in REQUIRES.get(runtime, ()) if importlib.util.find_spec(name) is None]
+
+
+def synthetic_inputs(model, n, rng):
+    if model == 'cnn_detector':
+        return rng.random((n, 224, 224, 3), dtype='float32')
+    if model == 'health_analyzer':
+        return rng.standard_normal((n, 10)).astype('float32')
+    return [' '.join(rng.choice(SYMPTOM_WORDS, size=12)) for _ in range(n)]
+
+
+def set_threads(runtime, threads):
+    """Limit the framework's CPU threads; called before it is imported."""
+    for var in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'TF_NUM_INTRAOP_THREADS'):
+        os.environ[var] = str(threads)
+    os.environ['TF_NUM_INTEROP_THREADS'] = '1'
+    if runtime == 'keras':
+        import tensorflow as tf
+        tf.config.threading.set_intra_op_parallelism_threads(threads)
+        tf.config.threading.set_inter_op_parallelism_threads(1)
+    elif runtime == 'transformers':
+        import torch
+        torch.set_num_threads(threads)
+
+
+def load(model, runtime, threads, model_dir):
+    """``(callable taking a batch of inputs, model file used)``"""
+    if model == 'nlp_processor':
+        from ai_models.nlp_processor import NLPHealthProcessor
+        processor = NLPHealthProcessor()  # loads nothing until first use
+        if runtime == 'nltk':
+            processor.analyze_symptoms('load')  # NLTK import and data only
+            return (lambda texts: [processor.analyze_symptoms(t) for t in texts]), None
+        if not processor.load_model():
+            raise RuntimeError('could not load the sentiment model')
+        return (lambda texts: processor.analyze_sentiment(texts[0]) if len(texts) == 1
+                else processor.sentiment_pipeline(texts, batch_size=len(texts))), None
+
+    from ai_models import registry
+    path = os.path.join(model_dir, registry.MODEL_FILES[model])
+    if runtime == 'tflite':
+        from ai_models.runtime import TFLiteModel, tflite_path
+        path = tflite_path(path)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f'no exported model at {path}; run export_models.py')
+    if model == 'cnn_detector':
+        from ai_models.cnn_detector import CNNDiseaseDetector
+        instance = CNNDiseaseDetector(path, runtime=runtime)
+    else:
+        from ai_models.health_analyzer import HealthAnalyzer
+        instance = HealthAnalyzer(path, runtime=runtime)
+    if runtime == 'tflite':
+        lite = TFLiteModel(path, num_threads=threads)
+        if model == 'health_analyzer':
+            instance.use_model(lite)
+        else:
+            instance.model = lite
+    elif not instance.load_model():
+        raise RuntimeError(f'could not load {model}')
+    if model == 'health_analyzer':
+        return (lambda x: instance.predict_health_condition(x[0]) if len(x) == 1
+                else instance.predict_proba(x)), path if os.path.exists(path) else None
+    return instance.model.predict_on_batch, path if os.path.exists(path) else None
+
+
+def measure(call, inputs, n, warmup, min_calls, min_seconds):
+    """Time ``call(inputs)`` until both ``min_calls`` and ``min_seconds`` are reached."""
+    for _ in range(warmup):
+        call(inputs)
+    latencies = []
+    started = time.perf_counter()
+    while len(latencies) < min_calls or time.perf_counter() - started < min_seconds:
+        t0 = time.perf_counter()
+        call(inputs)
+        latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        'batch_size': n,
+        'calls': len(latencies),
+        'throughput_per_s': round(n * len(latencies) / elapsed, 1),
+        'p50_ms': round(latencies[len(latencies) // 2] * 1000, 4),
+        'p99_ms': round(latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))] * 1000, 4),
+    }
+
+
+def run_combination(spec):
+    """Benchmark one (model, runtime, threads) in this process; returns result rows."""
+    model, runtime, threads = spec['model'], spec['runtime'], spec['threads']
+    base = {'model': model, 'runtime': runtime, 'threads': threads}
+    missing = missing_packages(runtime)
+    if missing:
+        return [dict(base, skipped=f"not installed: {', '.join(missing)}")]
+    rng = np.random.default_rng(0)
+    started = time.perf_counter()
+    try:
+        set_threads(runtime, threads)
+        imported = time.perf_counter()
+        call, model_file = load(model, runtime, threads, spec['model_dir'])
+    except Exception as e:
+        return [dict(base, skipped=str(e))]
+    loaded = time.perf_counter()
+    rows = []
+    for n in spec['batch_sizes']:
+        row = measure(call, synthetic_inputs(model, n, rng), n, spec['warmup'], spec['min_calls'], spec['min_seconds'])
+        rows.append(dict(base, **row))
+    for row in rows:
+        row.update({
+            'import_seconds': round(imported - started, 3),
+            'load_seconds': round(loaded - started, 3),  # framework import + model load
+            'peak_rss_bytes': peak_rss_bytes(),
+            'model_file': model_file,
+        })
+    return rows
+
+
+def run_subprocess(spec):
+    proc = subprocess.run([sys.executable, os.path.abspath(__file__), '--worker', json.dumps(spec)],
+                          capture_output=True, text=True)
+    if proc.returncode != 0:
+        tail = (proc.stderr or proc.stdout).strip().splitlines()[-1:] or ['no output']
+        return [{'model': spec['model'], 'runtime': spec['runtime'], 'threads': spec['threads'],
+                 'skipped': f'benchmark process failed: {tail[0]}'}]
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def machine():
+    return {'platform': platform.platform(), 'machine': platform.machine(), 'python': platform.python_version(),
+            'cpu_count': os.cpu_count(), 'numpy': np.__version__}
+
+
+def _key(row):
+    return row['model'], row['runtime'], row['threads'], row.get('batch_size')
+
+
+def compare(current, baseline, tolerance=DEFAULT_TOLERANCE, load_tolerance=DEFAULT_LOAD_TOLERANCE):
+    """Regressions of ``current`` against ``baseline`` (both as written by this script), as strings.
+
+    A combination measured in the baseline that is skipped or missing now counts as a regression.
+    """
+    measured = {_key(row): row for row in current['results'] if 'skipped' not in row}
+    skipped = {_key(row)[:3]: row['skipped'] for row in current['results'] if 'skipped' in row}
+    problems = []
+    for base in baseline['results']:
+        if 'skipped' in base:
+            continue
+        name = '{} {} threads={} batch={}'.format(*_key(base))
+        row = measured.get(_key(base))
+        if row is None:
+            reason = skipped.get(_key(base)[:3])
+            problems.append(f'{name}: skipped ({reason})' if reason else f'{name}: missing from this run')
+            continue
+        checks = [
+            ('throughput_per_s', row['throughput_per_s'] < base['throughput_per_s'] * (1 - tolerance)),
+            ('p99_ms', row['p99_ms'] > base['p99_ms'] * (1 + tolerance)),
+            ('peak_rss_bytes', None not in (row['peak_rss_bytes'], base['peak_rss_bytes'])
+             and row['peak_rss_bytes'] > base['peak_rss_bytes'] * (1 + tolerance)),
+            ('load_seconds', row['load_seconds'] > base['load_seconds'] * (1 + load_tolerance)),
+        ]
+        problems += [f'{name}: {metric} {base[metric]} -> {row[metric]}' for metric, worse in checks if worse]
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark model inference')
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    parser.add_argument('--models', default=','.join(RUNTIMES), help='Comma-separated model names')
+    parser.add_argument('--runtimes', help='Comma-separated runtimes (default: all for each model)')
+    parser.add_argument('--threads', default='1,{}'.format(os.cpu_count() or 1), help='Comma-separated thread counts')
+    parser.add_argument('--batch-sizes', help='Comma-separated batch sizes (default: per model)')
+    parser.add_argument('--model-dir', help='Where the model files live (default: MODEL_PATH)')
+    parser.add_argument('--warmup', type=int, default=3, help='Untimed calls per batch size')
+    parser.add_argument('--min-calls', type=int, default=20, help='Timed calls per batch size, at least')
+    parser.add_argument('--min-seconds', type=float, default=1.0, help='Timed seconds per batch size, at least')
+    parser.add_argument('--json', help='Write the results to this file')
+    parser.add_argument('--save-baseline', help='Also write the results here as the new baseline')
+    parser.add_argument('--baseline', help='Compare against this baseline; exit 1 on a regression')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='Allowed fractional change in throughput, p99 and peak RSS')
+    parser.add_argument('--load-tolerance', type=float, default=DEFAULT_LOAD_TOLERANCE,
+                        help='Allowed fractional increase in load time')
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_combination(json.loads(args.worker))))
+        return
+
+    model_dir = args.model_dir
+    if model_dir is None:
+        from config import config
+        model_dir = config.MODEL_PATH
+    threads = sorted({int(t) for t in args.threads.split(',')})
+    results = []
+    for model in [m.strip() for m in args.models.split(',') if m.strip()]:
+        runtimes = [r for r in (args.runtimes.split(',') if args.runtimes else RUNTIMES[model]) if r in RUNTIMES[model]]
+        batch_sizes = [int(b) for b in (args.batch_sizes or DEFAULT_BATCH_SIZES[model]).split(',')]
+        for runtime in runtimes:
+            for count in threads:
+                spec = {'model': model, 'runtime': runtime, 'threads': count, 'batch_sizes': batch_sizes,
+                        'model_dir': model_dir, 'warmup': args.warmup, 'min_calls': args.min_calls,
+                        'min_seconds': args.min_seconds}
+                print(f'{model} {runtime} threads={count} ...', flush=True)
+                results += run_subprocess(spec)
+
+    print(f"\n{'model':<17}{'runtime':<14}{'thr':>4}{'batch':>6}{'items/s':>11}{'p50 ms':>10}{'p99 ms':>10}"
+          f"{'RSS MiB':>9}{'load s':>8}")
+    for row in results:
+        if 'skipped' in row:
+            print(f"{row['model']:<17}{row['runtime']:<14}{row['threads']:>4}  skipped: {row['skipped']}")
+            continue
+        print(f"{row['model']:<17}{row['runtime']:<14}{row['threads']:>4}{row['batch_size']:>6}"
+              f"{row['throughput_per_s']:>11}{row['p50_ms']:>10}{row['p99_ms']:>10}"
+              f"{(row['peak_rss_bytes'] or 0) / 2**20:>9.0f}{row['load_seconds']:>8}")
+
+    report = {'machine': machine(), 'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'), 'results': results}
+    for path in (args.json, args.save_baseline):
+        if path:
+            with open(path, 'w') as f:
+                json.dump(report, f, indent=2)
+            print(f'Wrote {path}')
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline['machine'].get('cpu_count') != report['machine']['cpu_count']:
+            print(f"Warning: baseline is from a {baseline['machine'].get('cpu_count')}-CPU machine, "
+                  f"this one has {report['machine']['cpu_count']}")
+        problems = compare(report, baseline, args.tolerance, args.load_tolerance)
+        print(f"\n{len(problems)} regression(s) against {args.baseline}")
+        for problem in problems:
+            print(f'  {problem}')
+        sys.exit(1 if problems else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+"""
+Micro-batching benchmark: throughput and latency of concurrent CNN calls
+with and without the MicroBatcher, across batch-size and wait limits.
+
+Run from the project root:
+  python backend/benchmarks/microbatch.py                       # CNN if TensorFlow is installed
+  python backend/benchmarks/microbatch.py --model synthetic     # fixed per-call + per-image cost
+  python backend/benchmarks/microbatch.py --clients 32 --requests 2000 --batch-sizes 8,32 --waits 0,2,5 --json out.json
+
+Each configuration runs ``--clients`` threads that together send
+``--requests`` single-image calls. "unbatched" is the baseline: every call
+runs its own batch-of-one forward pass (serialised, as in one worker process).
+"""
+import argparse
+import importlib.util
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ai_models.batching import MicroBatcher
+
+IMAGE_SHAPE = (224, 224, 3)
+
+
+def synthetic_model(call_ms, image_ms):
+    """A stand-in with a fixed cost per forward pass plus a cost per image (sleeps release the GIL like TF)."""
+    def predict(batch):
+        time.sleep((call_ms + image_ms * len(batch)) / 1000.0)
+        return np.tile([[0.7, 0.2, 0.1]], (len(batch), 1)).astype('float32')
+    return predict
+
+
+def cnn_model():
+    from ai_models.cnn_detector import CNNDiseaseDetector, DEFAULT_BATCH_SIZE, _bucket
+    detector = CNNDiseaseDetector()
+    detector.load_model()
+    model = detector.model
+    for n in sorted({_bucket(i, 64) for i in range(1, 65)}):  # trace every shape before timing
+        model.predict_on_batch(np.zeros((n,) + IMAGE_SHAPE, dtype='float32'))
+
+    def predict(batch):
+        return np.asarray(model.predict_on_batch(batch))
+    return predict, _bucket
+
+
+def run_clients(call, clients, requests, image):
+    """Send ``requests`` calls from ``clients`` threads; returns (seconds, per-call latencies)."""
+    latencies = []
+    lock = threading.Lock()
+    counter = iter(range(requests))
+
+    def client():
+        mine = []
+        while True:
+            with lock:
+                if next(counter, None) is None:
+                    break
+            started = time.perf_counter()
+            call(image)
+            mine.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(mine)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - started, latencies
+
+
+def summarize(name, seconds, latencies, extra=None):
+    ordered = sorted(latencies)
+    row = {
+        'config': name,
+        'throughput_per_s': round(len(ordered) / seconds, 1),
+        'p50_ms': round(ordered[len(ordered) // 2] * 1000, 2),
+        'p99_ms': round(ordered[min(len(ordered) - 1, int(0.99 * len(ordered)))] * 1000, 2),
+    }
+    row.update(extra or {})
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark micro-batched inference')
+    parser.add_argument('--model', choices=['auto', 'cnn', 'synthetic'], default='auto')
+    parser.add_argument('--clients', type=int, default=16, help='Concurrent callers')
+    parser.add_argument('--requests', type=int, default=1000, help='Calls per configuration')
+    parser.add_argument('--batch-sizes', default='8,16,32', help='Comma-separated max batch sizes')
+    parser.add_argument('--waits', default='0,2,5,10', help='Comma-separated max waits (ms)')
+    parser.add_argument('--call-ms', type=float, default=8.0, help='Synthetic model: cost per forward pass')
+    parser.add_argument('--image-ms', type=float, default=0.5, help='Synthetic model: cost per image')
+    parser.add_argument('--json', help='Also write the results to this file')
+    args = parser.parse_args()
+
+    model = args.model
+    if model == 'auto':
+        model = 'cnn' if importlib.util.find_spec('tensorflow') else 'synthetic'
+    if model == 'cnn':
+        predict, bucket = cnn_model()
+    else:
+        predict, bucket = synthetic_model(args.call_ms, args.image_ms), (lambda n, largest: n)
+    image = np.random.rand(*IMAGE_SHAPE).astype('float32')
+    print(f'model={model} clients={args.clients} requests={args.requests}\n')
+
+    results = []
+    model_lock = threading.Lock()
+
+    def unbatched(img):
+        with model_lock:
+            return predict(img[None])[0]
+
+    results.append(summarize('unbatched', *run_clients(unbatched, args.clients, args.requests, image)))
+
+    for max_batch in [int(b) for b in args.batch_sizes.split(',')]:
+        for wait in [float(w) for w in args.waits.split(',')]:
+            def predict_batch(images, max_batch=max_batch):
+                size = bucket(len(images), max_batch)
+                batch = np.zeros((size,) + IMAGE_SHAPE, dtype='float32')
+                batch[:len(images)] = images
+                return predict(batch)[:len(images)]
+
+            batcher = MicroBatcher(predict_batch, max_batch, wait)
+            seconds, latencies = run_clients(batcher, args.clients, args.requests, image)
+            metrics = batcher.metrics()
+            batcher.close()
+            results.append(summarize(f'batch={max_batch} wait={wait:g}ms', seconds, latencies, {
+                'fill_rate': metrics['fill_rate'],
+                'mean_batch_size': metrics['mean_batch_size'],
+                'queue_p50_ms': metrics['queue_latency_ms']['p50'],
+                'queue_p99_ms': metrics['queue_latency_ms']['p99'],
+            }))
+
+    baseline = results[0]['throughput_per_s']
+    print(f"{'config':<24}{'req/s':>10}{'speedup':>9}{'p50 ms':>9}{'p99 ms':>9}{'fill':>7}{'queue p99':>11}")
+    for row in results:
+        print(f"{row['config']:<24}{row['throughput_per_s']:>10}{row['throughput_per_s'] / baseline:>8.1f}x"
+              f"{row['p50_ms']:>9}{row['p99_ms']:>9}{row.get('fill_rate') or '':>7}{row.get('queue_p99_ms') or '':>11}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'model': model, 'clients': args.clients, 'requests': args.requests, 'results': results}, f, indent=2)
+        print(f'\nWrote {args.json}')
+
+
+if __name__ == '__main__':
+    main()
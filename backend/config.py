@@ -36,10 +36,47 @@ class Config:
     
     # File Upload
     UPLOAD_FOLDER = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'uploads'))
-    MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB
+    MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB, per request (resumable uploads send chunks below this)
+    # Maps Report.file_path to a file under UPLOAD_FOLDER (import path of a resolver class)
+    STORAGE_PATH_RESOLVER = os.getenv('STORAGE_PATH_RESOLVER', 'flask_app.utils.blob_store.ShardedPathResolver')
+    MAX_RESUMABLE_UPLOAD_SIZE = int(os.getenv('MAX_RESUMABLE_UPLOAD_SIZE', 1024 * 1024 * 1024))  # whole file
+    # Internal nginx location mapped to UPLOAD_FOLDER (see docker/nginx.conf); empty = Flask sends files itself.
+    # Used only for requests carrying nginx's "X-Sendfile-Type: X-Accel-Redirect" header
+    X_ACCEL_REDIRECT_PREFIX = os.getenv('X_ACCEL_REDIRECT_PREFIX', '')
+
+    # Report file storage (flask_app/utils/storage.py): 'local' (UPLOAD_FOLDER) or 's3' (S3 / MinIO)
+    STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'local')
+    S3_BUCKET = os.getenv('S3_BUCKET', 'health-reports')
+    S3_ENDPOINT_URL = os.getenv('S3_ENDPOINT_URL', '')  # empty = AWS
+    S3_PUBLIC_ENDPOINT_URL = os.getenv('S3_PUBLIC_ENDPOINT_URL', '')  # what browsers reach, if different
+    S3_ACCESS_KEY = os.getenv('S3_ACCESS_KEY', '')
+    S3_SECRET_KEY = os.getenv('S3_SECRET_KEY', '')
+    S3_REGION = os.getenv('S3_REGION', 'us-east-1')
+    S3_PREFIX = os.getenv('S3_PREFIX', '')
+    S3_PART_SIZE = int(os.getenv('S3_PART_SIZE', 8 * 1024 * 1024))  # multipart upload part size
+    PRESIGN_SECONDS = int(os.getenv('PRESIGN_SECONDS', 300))  # lifetime of download URLs
+    
+    # Data cleanup (admin data-management)
+    CLEANUP_BATCH_SIZE = int(os.getenv('CLEANUP_BATCH_SIZE', 500))
+    CLEANUP_BATCH_PAUSE = float(os.getenv('CLEANUP_BATCH_PAUSE', 0.05))  # seconds between batches
+    CANCELLED_APPOINTMENT_RETENTION_DAYS = int(os.getenv('CANCELLED_APPOINTMENT_RETENTION_DAYS', 90))
+    DEACTIVATED_USER_RETENTION_DAYS = int(os.getenv('DEACTIVATED_USER_RETENTION_DAYS', 365))
+    
+    # Admin system-health probes
+    HEALTH_PROBE_TIMEOUT = float(os.getenv('HEALTH_PROBE_TIMEOUT', 2.0))  # seconds, whole endpoint
+    
+    # Admin analytics cube, refreshed by the job workers
+    ANALYTICS_REFRESH_SECONDS = int(os.getenv('ANALYTICS_REFRESH_SECONDS', 900))  # 0 disables the schedule
     
     # AI Models
     MODEL_PATH = os.path.join(os.path.dirname(__file__), '../ml_models')
+    PRELOAD_MODELS = os.getenv('PRELOAD_MODELS', 'true').lower() in ('1', 'true', 'yes')  # warm models when inference workers start
+    # keras | tflite | auto: serve the .tflite exports from export_models.py (auto = when they exist)
+    MODEL_RUNTIME = os.getenv('MODEL_RUNTIME', 'keras')
+    # Micro-batching of concurrent CNN calls in one worker process (run_workers.py --threads); 0 disables
+    INFERENCE_MAX_BATCH_SIZE = int(os.getenv('INFERENCE_MAX_BATCH_SIZE', 32))
+    INFERENCE_MAX_WAIT_MS = float(os.getenv('INFERENCE_MAX_WAIT_MS', 0))  # 0 = batch only what is already queued
+    TENSOR_CACHE_MAX_BYTES = int(os.getenv('TENSOR_CACHE_MAX_BYTES', 2 * 1024 ** 3))  # preprocessed CNN inputs; 0 disables
     KAGGLE_API_KEY = os.getenv('KAGGLE_API_KEY', '')
 
 
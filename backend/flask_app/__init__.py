@@ -43,6 +43,12 @@ def create_flask_app():
     # Flask-JWT-Extended 4.x requires timedelta, NOT a plain integer
     app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=24)
     app.config['UPLOAD_FOLDER'] = uploads_dir
+    # Uploads handed to background jobs (e.g. bulk imports) wait here until processed
+    app.config['JOB_SPOOL_FOLDER'] = os.path.join(project_root, 'instance', 'job_spool')
+    # Rendered report thumbnails, keyed by content hash (see utils/thumbnails.py)
+    app.config['THUMBNAIL_FOLDER'] = os.path.join(project_root, 'instance', 'thumbnails')
+    # Preprocessed CNN inputs, keyed by content hash (see ai_models/tensor_cache.py)
+    app.config['TENSOR_CACHE_FOLDER'] = os.path.join(project_root, 'instance', 'tensor_cache')
     app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16 MB
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'flask-secret-key')
 
@@ -52,6 +58,9 @@ def create_flask_app():
     db.init_app(app)
     jwt.init_app(app)
 
+    from flask_app.utils import telemetry
+    telemetry.init_app(app)
+
     # CORS – allow all origins for /api/* (for dev; tighten in production)
     CORS(app, resources={r"/api/*": {"origins": "*"}}, supports_credentials=True)
 
@@ -61,6 +70,9 @@ def create_flask_app():
     with app.app_context():
         db.create_all()
 
+        from flask_app.utils.report_search import ensure_index
+        ensure_index()  # FTS table is not a model, so create_all() skips it
+
         from flask_app.routes import auth, health, appointments, diet, exercise, reports, chatbot, admin
 
         app.register_blueprint(auth.bp)
@@ -1,4 +1,5 @@
 from datetime import datetime
+import json
 import bcrypt
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.orm import DeclarativeBase
@@ -8,8 +9,41 @@ class Base(DeclarativeBase):
 
 db = SQLAlchemy(model_class=Base)
 
+
+class JSONDocument(db.TypeDecorator):
+    """Native JSON on MySQL / PostgreSQL, JSON text elsewhere.
+
+    Text that is not valid JSON (rows written before a column held JSON) is
+    returned as the raw string rather than raising.
+    """
+    impl = db.Text
+    cache_ok = True
+    NATIVE_DIALECTS = ('mysql', 'mariadb', 'postgresql')
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name in self.NATIVE_DIALECTS:
+            return dialect.type_descriptor(db.JSON())
+        return dialect.type_descriptor(db.Text())
+
+    def process_bind_param(self, value, dialect):
+        if value is None or dialect.name in self.NATIVE_DIALECTS:
+            return value
+        return json.dumps(value)
+
+    def process_result_value(self, value, dialect):
+        if not isinstance(value, str) or dialect.name in self.NATIVE_DIALECTS:
+            return value
+        try:
+            return json.loads(value)
+        except ValueError:
+            return value
+
+
 class User(db.Model):
     __tablename__ = 'users'
+    __table_args__ = (
+        db.Index('ix_users_created_at', 'created_at'),  # analytics refresh scans by day
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(120), nullable=False)
@@ -57,6 +91,9 @@ class User(db.Model):
 
 class HealthRecord(db.Model):
     __tablename__ = 'health_records'
+    __table_args__ = (
+        db.Index('ix_health_records_timestamp', 'timestamp'),  # analytics refresh scans by day
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -117,6 +154,13 @@ class Appointment(db.Model):
 
 class Report(db.Model):
     __tablename__ = 'reports'
+    __table_args__ = (
+        # Admin review queue: WHERE status = ? ORDER BY upload_date
+        db.Index('ix_reports_status_upload_date', 'status', 'upload_date'),
+        db.Index('ix_reports_upload_date', 'upload_date'),  # analytics refresh scans by day
+        # Admin filtering: WHERE ai_classification = ? AND ai_confidence >= ?
+        db.Index('ix_reports_ai_classification_confidence', 'ai_classification', 'ai_confidence'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -125,8 +169,15 @@ class Report(db.Model):
     description = db.Column(db.Text)
     upload_date = db.Column(db.DateTime, default=datetime.utcnow)
     test_date = db.Column(db.Date)
-    status = db.Column(db.String(50), default='uploaded')  # uploaded, pending_review, approved, rejected, analyzed
-    ai_analysis = db.Column(db.Text)  # AI-generated analysis
+    status = db.Column(db.String(50), default='uploaded')  # uploaded, pending_review, approved, rejected, queued, analyzing, analyzed, analysis_failed
+    ai_analysis = db.Column(JSONDocument)  # AI-generated analysis, incl. model_version and input_sha256
+    ai_classification = db.Column(db.String(50))  # copied out of ai_analysis for filtering
+    ai_confidence = db.Column(db.Float)
+    analysis_model_version = db.Column(db.String(64))
+    analysis_job_id = db.Column(db.Integer)  # latest analyze_report job
+    content_hash = db.Column(db.String(64), index=True)  # SHA-256 of the file; NULL for pre-blob uploads
+    original_filename = db.Column(db.String(255))
+    file_size = db.Column(db.BigInteger)  # bytes
     
     def to_dict(self):
         ud = self.upload_date.isoformat() if self.upload_date else None
@@ -140,7 +191,14 @@ class Report(db.Model):
             'uploaded_at': ud,
             'test_date': self.test_date.isoformat() if self.test_date else None,
             'status': self.status,
-            'ai_analysis': self.ai_analysis
+            'ai_analysis': self.ai_analysis,
+            'ai_classification': self.ai_classification,
+            'ai_confidence': self.ai_confidence,
+            'analysis_model_version': self.analysis_model_version,
+            'content_hash': self.content_hash,
+            'original_filename': self.original_filename,
+            'file_size': self.file_size,
+            'analysis_job_id': self.analysis_job_id
         }
 
 
@@ -204,3 +262,157 @@ class ExerciseRecommendation(db.Model):
     calories_burned = db.Column(db.Integer)
     benefits = db.Column(db.Text)
     created_date = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class Job(db.Model):
+    """Durable background job, claimed and run by the worker pool (flask_app.utils.jobs)."""
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        # Workers poll: WHERE status = 'queued' ORDER BY priority, run_after
+        db.Index('ix_jobs_status_priority_run_after', 'status', 'priority', 'run_after'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    job_type = db.Column(db.String(80), nullable=False)
+    payload = db.Column(db.Text)  # JSON
+    status = db.Column(db.String(20), default='queued')  # queued, running, succeeded, failed, cancelled
+    priority = db.Column(db.Integer, default=100)  # lower runs first
+    attempts = db.Column(db.Integer, default=0)
+    max_attempts = db.Column(db.Integer, default=3)
+    run_after = db.Column(db.DateTime, default=datetime.utcnow)
+    progress = db.Column(db.Float, default=0.0)  # 0..1
+    progress_message = db.Column(db.String(255))
+    result = db.Column(db.Text)  # JSON
+    error = db.Column(db.Text)
+    cancel_requested = db.Column(db.Boolean, default=False)
+    worker_id = db.Column(db.String(120))
+    heartbeat_at = db.Column(db.DateTime)
+    created_by = db.Column(db.Integer)  # user id; no FK so jobs outlive deleted users
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'job_type': self.job_type,
+            'payload': json.loads(self.payload) if self.payload else {},
+            'status': self.status,
+            'priority': self.priority,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'run_after': self.run_after.isoformat() if self.run_after else None,
+            'progress': self.progress,
+            'progress_message': self.progress_message,
+            'result': json.loads(self.result) if self.result else None,
+            'error': self.error,
+            'cancel_requested': bool(self.cancel_requested),
+            'worker_id': self.worker_id,
+            'created_by': self.created_by,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+
+class AnalyticsDaily(db.Model):
+    """One cell of the admin analytics cube: ``value`` of ``metric`` on ``day`` for one dimension value.
+
+    ``dimension = 'all'`` rows (``dim_value = ''``) hold the daily totals. Rebuilt
+    a window of days at a time by flask_app.utils.analytics.
+    """
+    __tablename__ = 'analytics_daily'
+    __table_args__ = (
+        # /api/admin/analytics: WHERE metric = ? AND dimension = ? AND day BETWEEN ? AND ?
+        db.UniqueConstraint('metric', 'dimension', 'day', 'dim_value', name='uq_analytics_daily_cell'),
+        db.Index('ix_analytics_daily_day', 'day'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False)
+    metric = db.Column(db.String(40), nullable=False)  # signups, active_users, health_records, ...
+    dimension = db.Column(db.String(40), nullable=False, default='all')  # all, gender, age_band, ...
+    dim_value = db.Column(db.String(80), nullable=False, default='')
+    value = db.Column(db.Float, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class Blob(db.Model):
+    """A content-addressed upload stored once at ``ab/cd/<sha256>`` and shared by every Report with that hash.
+
+    ``ref_count`` is the number of reports pointing at it; the file is removed
+    when it drops to zero (flask_app.utils.blob_store).
+    """
+    __tablename__ = 'blobs'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    sha256 = db.Column(db.String(64), unique=True, nullable=False)
+    size = db.Column(db.BigInteger, nullable=False)  # bytes
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    preview_format = db.Column(db.String(10))  # webp / jpeg once thumbnails exist, 'none' if not previewable
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'sha256': self.sha256,
+            'size': self.size,
+            'ref_count': self.ref_count,
+            'preview_format': self.preview_format,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+
+class AnalysisCache(db.Model):
+    """Analysis result for one file content under one model version.
+
+    Re-analysing a file whose (content_hash, model_version) is already here
+    copies the stored result instead of running inference
+    (flask_app.utils.report_analysis).
+    """
+    __tablename__ = 'analysis_cache'
+    __table_args__ = (
+        db.UniqueConstraint('content_hash', 'model_version', name='uq_analysis_cache_input_model'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    content_hash = db.Column(db.String(64), nullable=False)
+    model_version = db.Column(db.String(64), nullable=False)
+    result = db.Column(JSONDocument, nullable=False)
+    classification = db.Column(db.String(50))
+    confidence = db.Column(db.Float)
+    hits = db.Column(db.Integer, nullable=False, default=0)  # reuses after the first inference
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_used_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class UploadSession(db.Model):
+    """An in-progress resumable upload; its bytes so far are in ``.incoming/resumable/<id>.part``.
+
+    ``received`` is the next offset the client must send. The row is deleted
+    when the upload completes into a Report, is aborted, or expires
+    (flask_app.utils.resumable_uploads).
+    """
+    __tablename__ = 'upload_sessions'
+    
+    id = db.Column(db.String(32), primary_key=True)  # random token, also the URL id
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
+    filename = db.Column(db.String(255), nullable=False)
+    report_type = db.Column(db.String(120))
+    description = db.Column(db.Text)
+    test_date = db.Column(db.Date)
+    size = db.Column(db.BigInteger, nullable=False)  # declared total, bytes
+    sha256 = db.Column(db.String(64))  # declared by the client, checked on completion
+    received = db.Column(db.BigInteger, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    
+    def to_dict(self):
+        return {
+            'upload_id': self.id,
+            'filename': self.filename,
+            'size': self.size,
+            'offset': self.received,
+            'sha256': self.sha256,
+            'expires_at': self.expires_at.isoformat() if self.expires_at else None
+        }
@@ -1,12 +1,28 @@
 """Admin API: users, reports, appointments, stats. All routes require admin role."""
 from flask import Blueprint, request, jsonify, current_app
-from sqlalchemy import or_
-from flask_app.models import db, User, HealthRecord, Appointment, Report
+from sqlalchemy import or_, and_, update
+from datetime import datetime, timedelta
+from flask_jwt_extended import get_jwt_identity
+from flask_app.models import db, User, HealthRecord, Appointment, Report, Job
 from flask_app.utils.admin_decorator import admin_required
+from flask_app.utils.bulk_import import (
+    bulk_import, detect_format, enqueue_analytics_refresh, IMPORT_KINDS, DEFAULT_BATCH_SIZE,
+    BULK_IMPORT_MAX_ATTEMPTS,
+)
+from flask_app.utils.cleanup import run_cleanup, CLEANUP_TASKS
+from flask_app.utils import jobs, telemetry, analytics, blob_store
+from flask_app.utils.report_analysis import PENDING_STATUSES
 import os
+import uuid
 
 bp = Blueprint('admin', __name__, url_prefix='/api/admin')
 
+# Bulk-status targets: review states only; queued / analyzing / analysis_failed belong to the analyze jobs
+REPORT_STATUSES = ('uploaded', 'pending_review', 'approved', 'rejected', 'analyzed')
+# Review queue, highest priority first; each status is read off ix_reports_status_upload_date
+REVIEW_QUEUE_STATUSES = ('pending_review', 'uploaded')
+MAX_BULK_IDS = 10000
+
 
 # ========================
 # STATS & OVERVIEW
@@ -46,19 +62,67 @@ def get_statistics():
 @bp.route('/system-health', methods=['GET'])
 @admin_required
 def get_system_health():
-    """System health status."""
+    """Live probes (DB, pool, storage, process, queues, models) plus per-endpoint latency."""
     try:
-        health_status = {
-            'database': 'healthy',
-            'api': 'healthy',
-            'storage': 'healthy',
-            'total_users': User.query.count(),
-        }
+        health_status = telemetry.system_health(current_app.config.get('HEALTH_PROBE_TIMEOUT', 2.0))
         return jsonify(health_status), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+@bp.route('/analytics', methods=['GET'])
+@admin_required
+def get_analytics():
+    """Daily trend for one metric, read from the analytics cube only.
+
+    Query: metric (signups, active_users, health_records, abnormal_vitals, reports),
+    from / to (YYYY-MM-DD, default the last 30 days), group_by (all, gender, age_band, ...).
+    """
+    try:
+        metric = request.args.get('metric', 'signups').strip()
+        group_by = request.args.get('group_by', 'all').strip() or 'all'
+        try:
+            end = _parse_day(request.args.get('to')) or datetime.utcnow().date()
+            start = _parse_day(request.args.get('from')) or end - timedelta(days=29)
+            result = analytics.query_cube(metric, start, end, group_by)
+        except ValueError as e:
+            return jsonify({'error': str(e), 'metrics': analytics.METRICS}), 400
+        return jsonify(result), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/analytics/refresh', methods=['POST'])
+@admin_required
+def refresh_analytics():
+    """Queue a cube refresh (202 + job). Body: since / until (YYYY-MM-DD), full; background=false runs it inline."""
+    try:
+        data = request.get_json(silent=True) or {}
+        try:
+            since, until = _parse_day(data.get('since')), _parse_day(data.get('until'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        full = _truthy(data.get('full', False))
+        if not _truthy(data.get('background', True)):
+            summary = analytics.refresh_analytics(since=since, until=until, full=full)
+            return jsonify({'message': 'Analytics refreshed', 'summary': summary}), 200
+        job = analytics.enqueue_refresh(since, until, full, created_by=int(get_jwt_identity()),
+                                        priority=jobs.INTERACTIVE_PRIORITY)
+        return jsonify({'message': 'Analytics refresh queued', 'job': job.to_dict()}), 202
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
+def _parse_day(value):
+    if not value:
+        return None
+    try:
+        return datetime.strptime(str(value).strip()[:10], '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError(f'Invalid date {value!r}; expected YYYY-MM-DD')
+
+
 # ========================
 # USERS
 # ========================
@@ -152,8 +216,10 @@ def delete_user(user_id):
             return jsonify({'error': 'User not found'}), 404
         if getattr(user, 'role', None) == 'admin':
             return jsonify({'error': 'Cannot delete an admin'}), 400
+        released = blob_store.release_report_files(user.reports)
         db.session.delete(user)
         db.session.commit()
+        blob_store.purge_files(current_app.config.get('UPLOAD_FOLDER', 'uploads'), released)
         return jsonify({'message': 'User deleted'}), 200
     except Exception as e:
         db.session.rollback()
@@ -167,7 +233,7 @@ def delete_user(user_id):
 @bp.route('/reports', methods=['GET'])
 @admin_required
 def get_all_reports():
-    """List all reports across users, optional status filter."""
+    """List all reports across users; optional status, classification and min_confidence / max_confidence filters."""
     try:
         status_filter = request.args.get('status', '').strip()
         page = request.args.get('page', 1, type=int)
@@ -175,6 +241,11 @@ def get_all_reports():
         query = Report.query.join(User).order_by(Report.upload_date.desc())
         if status_filter:
             query = query.filter(Report.status == status_filter)
+        criteria = _analysis_filter_criteria(request.args)
+        if criteria is None:
+            return jsonify({'error': 'min_confidence / max_confidence must be numbers'}), 400
+        if criteria:
+            query = query.filter(*criteria)
         pagination = query.paginate(page=page, per_page=per_page, error_out=False)
         items = []
         for r in pagination.items:
@@ -240,6 +311,144 @@ def reject_report(report_id):
         return jsonify({'error': str(e)}), 500
 
 
+@bp.route('/reports/bulk-status', methods=['POST'])
+@admin_required
+def bulk_update_report_status():
+    """Set status on many reports with one UPDATE; reports an analyze job is working on are skipped.
+
+    Body: {"status": "approved", "ids": [1, 2, ...]} or
+          {"status": "approved", "filter": {"status": "uploaded", "report_type": "x_ray",
+                                            "from": "2024-01-01", "to": "2024-02-01",
+                                            "classification": "normal", "min_confidence": 0.9}}
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        new_status = data.get('status')
+        if new_status not in REPORT_STATUSES:
+            return jsonify({'error': f"status must be one of: {', '.join(REPORT_STATUSES)}"}), 400
+
+        ids = data.get('ids')
+        filters = data.get('filter') or {}
+        if ids is not None:
+            if not isinstance(ids, list) or not ids:
+                return jsonify({'error': 'ids must be a non-empty list'}), 400
+            if len(ids) > MAX_BULK_IDS:
+                return jsonify({'error': f'At most {MAX_BULK_IDS} ids per request'}), 400
+            try:
+                ids = sorted({int(i) for i in ids})
+            except (TypeError, ValueError):
+                return jsonify({'error': 'ids must be integers'}), 400
+            criteria = [Report.id.in_(ids)]
+        else:
+            criteria = _report_filter_criteria(filters)
+            if criteria is None:
+                return jsonify({'error': 'Invalid date or confidence in filter'}), 400
+            if not criteria:
+                return jsonify({'error': 'Provide ids or a non-empty filter'}), 400
+
+        result = db.session.execute(
+            update(Report)
+            .where(and_(*criteria), Report.status != new_status,
+                   Report.status.notin_(PENDING_STATUSES))  # a running analysis would overwrite it
+            .values(status=new_status)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return jsonify({'message': f'Reports set to {new_status}', 'updated': result.rowcount}), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
+def _report_filter_criteria(filters):
+    """Build WHERE criteria from a bulk-status filter; None if a date or confidence is malformed."""
+    criteria = []
+    if filters.get('status'):
+        criteria.append(Report.status == filters['status'])
+    if filters.get('report_type'):
+        criteria.append(Report.report_type == filters['report_type'])
+    analysis_criteria = _analysis_filter_criteria(filters)
+    if analysis_criteria is None:
+        return None
+    criteria.extend(analysis_criteria)
+    try:
+        if filters.get('from'):
+            criteria.append(Report.upload_date >= datetime.fromisoformat(filters['from']))
+        if filters.get('to'):
+            criteria.append(Report.upload_date < datetime.fromisoformat(filters['to']))
+    except (TypeError, ValueError):
+        return None
+    return criteria
+
+
+def _analysis_filter_criteria(filters):
+    """classification / min_confidence / max_confidence criteria (ix_reports_ai_classification_confidence); None if malformed."""
+    criteria = []
+    if filters.get('classification'):
+        criteria.append(Report.ai_classification == filters['classification'])
+    try:
+        if filters.get('min_confidence') not in (None, ''):
+            criteria.append(Report.ai_confidence >= float(filters['min_confidence']))
+        if filters.get('max_confidence') not in (None, ''):
+            criteria.append(Report.ai_confidence <= float(filters['max_confidence']))
+    except (TypeError, ValueError):
+        return None
+    return criteria
+
+
+@bp.route('/reports/queue', methods=['GET'])
+@admin_required
+def get_review_queue():
+    """Reports awaiting review, pending_review before uploaded, oldest first.
+
+    Keyset-paginated: pass back ``next_cursor`` as ``cursor`` for the next page.
+    """
+    try:
+        limit = max(1, min(request.args.get('limit', 50, type=int), 200))
+        cursor = request.args.get('cursor', '').strip()
+        start_status, after_date, after_id = None, None, None
+        if cursor:
+            try:
+                start_status, date_str, id_str = cursor.split('|')
+                after_date, after_id = datetime.fromisoformat(date_str), int(id_str)
+                REVIEW_QUEUE_STATUSES.index(start_status)
+            except ValueError:
+                return jsonify({'error': 'Invalid cursor'}), 400
+
+        reports = []
+        statuses = REVIEW_QUEUE_STATUSES
+        if start_status:
+            statuses = statuses[statuses.index(start_status):]
+        for status in statuses:
+            query = Report.query.filter(Report.status == status)
+            if status == start_status:
+                query = query.filter(or_(
+                    Report.upload_date > after_date,
+                    and_(Report.upload_date == after_date, Report.id > after_id)
+                ))
+            reports.extend(query.order_by(Report.upload_date.asc(), Report.id.asc())
+                           .limit(limit - len(reports)).all())
+            if len(reports) >= limit:
+                break
+
+        users = {u.id: u for u in User.query.filter(User.id.in_({r.user_id for r in reports}))} if reports else {}
+        items = []
+        for r in reports:
+            d = r.to_dict()
+            user = users.get(r.user_id)
+            d['user_name'] = user.name if user else None
+            d['user_email'] = user.email if user else None
+            items.append(d)
+
+        next_cursor = None
+        if len(reports) == limit:
+            last = reports[-1]
+            next_cursor = f"{last.status}|{last.upload_date.isoformat()}|{last.id}"
+        return jsonify({'reports': items, 'next_cursor': next_cursor}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 @bp.route('/reports/<int:report_id>/delete', methods=['DELETE'])
 @admin_required
 def delete_report(report_id):
@@ -248,15 +457,10 @@ def delete_report(report_id):
         report = Report.query.get(report_id)
         if not report:
             return jsonify({'error': 'Report not found'}), 404
-        upload_folder = current_app.config.get('UPLOAD_FOLDER', 'uploads')
-        filepath = os.path.join(upload_folder, report.file_path)
-        if os.path.exists(filepath):
-            try:
-                os.remove(filepath)
-            except OSError:
-                pass
+        released = blob_store.release_report_files([report])
         db.session.delete(report)
         db.session.commit()
+        blob_store.purge_files(current_app.config.get('UPLOAD_FOLDER', 'uploads'), released)
         return jsonify({'message': 'Report deleted'}), 200
     except Exception as e:
         db.session.rollback()
@@ -311,6 +515,65 @@ def reject_appointment(appointment_id):
         return jsonify({'error': str(e)}), 500
 
 
+# ========================
+# BACKGROUND JOBS
+# ========================
+
+@bp.route('/jobs', methods=['GET'])
+@admin_required
+def get_jobs():
+    """List background jobs (newest first) with queue depths."""
+    try:
+        status_filter = request.args.get('status', '').strip()
+        type_filter = request.args.get('job_type', '').strip()
+        page = request.args.get('page', 1, type=int)
+        per_page = min(request.args.get('per_page', 20, type=int), 100)
+        query = Job.query.order_by(Job.id.desc())
+        if status_filter:
+            query = query.filter(Job.status == status_filter)
+        if type_filter:
+            query = query.filter(Job.job_type == type_filter)
+        pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+        return jsonify({
+            'total': pagination.total,
+            'page': page,
+            'per_page': per_page,
+            'queue': jobs.queue_depths(),
+            'jobs': [j.to_dict() for j in pagination.items]
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/jobs/<int:job_id>', methods=['GET'])
+@admin_required
+def get_job(job_id):
+    """Status, progress and result of one job."""
+    try:
+        job = db.session.get(Job, job_id)
+        if not job:
+            return jsonify({'error': 'Job not found'}), 404
+        return jsonify(job.to_dict()), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/jobs/<int:job_id>/cancel', methods=['POST'])
+@admin_required
+def cancel_job(job_id):
+    """Cancel a queued job, or ask a running one to stop at its next progress update."""
+    try:
+        job = db.session.get(Job, job_id)
+        if not job:
+            return jsonify({'error': 'Job not found'}), 404
+        if not jobs.cancel(job):
+            return jsonify({'error': f'Job already {job.status}'}), 409
+        return jsonify({'message': 'Cancellation requested', 'job': job.to_dict()}), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
 # ========================
 # LEGACY (data-management)
 # ========================
@@ -318,16 +581,83 @@ def reject_appointment(appointment_id):
 @bp.route('/data-management', methods=['POST'])
 @admin_required
 def manage_data():
-    """Placeholder for bulk actions."""
+    """Bulk data actions. bulk_import expects a multipart upload with kind=users|health_records.
+
+    Pass background=true to run bulk_import/cleanup as a job (202 + job, see /jobs).
+    """
     try:
-        data = request.get_json() or {}
+        data = request.get_json(silent=True) or request.form.to_dict()
         action = data.get('action')
+        background = _truthy(data.get('background', False))
         if action == 'bulk_import':
-            return jsonify({'message': 'Data import started'}), 200
+            return _bulk_import(data, background)
         elif action == 'export':
             return jsonify({'message': 'Data export prepared'}), 200
         elif action == 'cleanup':
-            return jsonify({'message': 'Data cleanup completed'}), 200
+            return _cleanup(data, background)
         return jsonify({'error': 'Invalid action'}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+
+
+def _truthy(value):
+    return str(value).lower() in ('true', '1', 'yes', 'on')
+
+
+def _bulk_import(data, background=False):
+    """Stream an uploaded CSV/NDJSON file into the users or health_records table."""
+    kind = data.get('kind')
+    if kind not in IMPORT_KINDS:
+        return jsonify({'error': f"kind must be one of: {', '.join(IMPORT_KINDS)}"}), 400
+    file = request.files.get('file')
+    if not file or file.filename == '':
+        return jsonify({'error': 'No file provided'}), 400
+    fmt = data.get('format') or detect_format(file.filename)
+    try:
+        batch_size = int(data.get('batch_size') or DEFAULT_BATCH_SIZE)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'batch_size must be an integer'}), 400
+    if background:
+        spool = current_app.config['JOB_SPOOL_FOLDER']
+        os.makedirs(spool, exist_ok=True)
+        path = os.path.join(spool, f'import_{uuid.uuid4().hex}.{fmt}')
+        file.save(path)
+        job = jobs.enqueue('bulk_import', {'path': path, 'kind': kind, 'fmt': fmt, 'batch_size': batch_size},
+                           max_attempts=BULK_IMPORT_MAX_ATTEMPTS, created_by=int(get_jwt_identity()))
+        return jsonify({'message': 'Data import queued', 'job': job.to_dict()}), 202
+    try:
+        summary = bulk_import(file.stream, kind, fmt=fmt, batch_size=batch_size)
+    except (ValueError, UnicodeDecodeError) as e:
+        return jsonify({'error': f'Could not parse file: {e}'}), 400
+    enqueue_analytics_refresh(summary, created_by=int(get_jwt_identity()))
+    return jsonify({'message': 'Data import completed', 'summary': summary}), 200
+
+
+def _cleanup(data, background=False):
+    """Run the batched cleanup; dry_run (default true) only reports what would go."""
+    dry_run = str(data.get('dry_run', True)).lower() not in ('false', '0', 'no')
+    tasks = data.get('tasks')
+    if isinstance(tasks, str):
+        tasks = [t.strip() for t in tasks.split(',') if t.strip()]
+    unknown = [t for t in tasks or [] if t not in CLEANUP_TASKS]
+    if unknown:
+        return jsonify({'error': f"Unknown cleanup task(s): {', '.join(unknown)}"}), 400
+    cfg = current_app.config
+    options = {
+        'dry_run': dry_run,
+        'batch_size': cfg.get('CLEANUP_BATCH_SIZE', 500),
+        'pause': cfg.get('CLEANUP_BATCH_PAUSE', 0.05),
+        'appointment_retention_days': cfg.get('CANCELLED_APPOINTMENT_RETENTION_DAYS', 90),
+        'user_retention_days': cfg.get('DEACTIVATED_USER_RETENTION_DAYS', 365),
+    }
+    upload_folder = cfg.get('UPLOAD_FOLDER', 'uploads')
+    if background:
+        job = jobs.enqueue('cleanup', dict(options, upload_folder=upload_folder, tasks=tasks),
+                           created_by=int(get_jwt_identity()))
+        return jsonify({'message': 'Data cleanup queued', 'job': job.to_dict()}), 202
+    try:
+        report = run_cleanup(upload_folder, tasks=tasks, **options)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    message = 'Data cleanup dry run completed' if dry_run else 'Data cleanup completed'
+    return jsonify({'message': message, 'report': report}), 200
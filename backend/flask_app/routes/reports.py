@@ -1,13 +1,20 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, url_for, send_file, redirect
+from sqlalchemy import select
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from flask_app.models import db, Report
+from flask_app.models import db, Report, Job, Blob, User, UploadSession
+from flask_app.utils import blob_store, jobs, report_analysis, report_search, resumable_uploads, thumbnails
+from flask_app.utils.storage import get_storage
 from werkzeug.utils import secure_filename
+from urllib.parse import quote
+from datetime import datetime, timedelta
+import mimetypes
 import os
-from datetime import datetime
 
 bp = Blueprint('reports', __name__, url_prefix='/api/reports')
 
 ALLOWED_EXTENSIONS = {'pdf', 'jpg', 'jpeg', 'png', 'txt', 'docx'}
+ANALYSIS_POLL_SECONDS = 2  # Retry-After hint while analysis is pending
+REPORT_FILE_MAX_AGE = 365 * 24 * 3600  # private cache; a report's file never changes
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -30,36 +37,211 @@ def upload_report():
         if not allowed_file(file.filename):
             return jsonify({'error': 'File type not allowed'}), 400
         
-        filename = secure_filename(file.filename)
-        timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S_')
-        filename = timestamp + filename
+        # Stored once per distinct content at ab/cd/<sha256>; duplicates only add a reference
+        blob = blob_store.store_upload(file.stream, current_app.config['UPLOAD_FOLDER'])
         
-        filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
-        
-        # Create report record
-        report = Report(
-            user_id=user_id,
+        report = _add_report(
+            user_id, blob, secure_filename(file.filename),
             report_type=request.form.get('report_type', 'general'),
-            file_path=filename,
             description=request.form.get('description'),
-            test_date=request.form.get('test_date'),
-            status='uploaded'
+            test_date=request.form.get('test_date')
         )
+        return _uploaded_response(report, blob, user_id)
         
-        db.session.add(report)
-        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
+def _add_report(user_id, blob, filename, report_type=None, description=None, test_date=None):
+    """Create the Report for a stored upload and commit it."""
+    report = Report(
+        user_id=user_id,
+        report_type=report_type,
+        file_path=blob_store.blob_path(blob.sha256),
+        content_hash=blob.sha256,
+        original_filename=filename,
+        file_size=blob.size,
+        description=description,
+        test_date=test_date,
+        status='uploaded'
+    )
+    db.session.add(report)
+    db.session.commit()
+    return report
+
+
+def _uploaded_response(report, blob, user_id):
+    """Queue the post-upload jobs and build the 201 response."""
+    thumbnails.enqueue_thumbnails(blob, report.original_filename, created_by=user_id)
+    report_search.enqueue_indexing(report, created_by=user_id)
+    return jsonify({
+        'message': 'Report uploaded successfully',
+        'report': report.to_dict(),
+        'duplicate': blob.ref_count > 1
+    }), 201
+
+
+# ========================
+# RESUMABLE UPLOADS
+# ========================
+
+def _get_upload_session(upload_id, user_id):
+    return UploadSession.query.filter_by(id=upload_id, user_id=user_id).first()
+
+
+def _offset_response(upload_id, offset, size, status=200, **extra):
+    """Where the upload stands; ``Upload-Offset`` is the next byte the server expects."""
+    response = jsonify({'upload_id': upload_id, 'offset': offset, 'size': size,
+                        'complete': offset == size, **extra})
+    response.headers['Upload-Offset'] = str(offset)
+    if offset:
+        response.headers['Range'] = f'bytes=0-{offset - 1}'
+    return response, status
+
+
+@bp.route('/uploads', methods=['POST'])
+@jwt_required()
+def create_upload_session():
+    """Start a resumable upload.
+
+    Body: {"filename", "size", "sha256" (optional), "report_type", "description", "test_date"}.
+    PUT the bytes to upload_url in chunks (Content-Range: bytes <start>-<end>/<size>),
+    then POST upload_url + /complete.
+    """
+    try:
+        user_id = int(get_jwt_identity())
+        data = request.get_json(silent=True) or {}
+        filename = secure_filename(data.get('filename') or '')
+        if not filename:
+            return jsonify({'error': 'filename is required'}), 400
+        if not allowed_file(filename):
+            return jsonify({'error': 'File type not allowed'}), 400
         
-        return jsonify({
-            'message': 'Report uploaded successfully',
-            'report': report.to_dict()
-        }), 201
+        try:
+            session = resumable_uploads.create_session(
+                user_id, filename, data.get('size'), current_app.config['UPLOAD_FOLDER'],
+                max_size=current_app.config.get('MAX_RESUMABLE_UPLOAD_SIZE', resumable_uploads.DEFAULT_MAX_UPLOAD_BYTES),
+                sha256=data.get('sha256'),
+                report_type=data.get('report_type', 'general'),
+                description=data.get('description'),
+                test_date=data.get('test_date')
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        body = session.to_dict()
+        body['upload_url'] = url_for('reports.upload_chunk', upload_id=session.id)
+        body['chunk_size'] = resumable_uploads.SUGGESTED_CHUNK_BYTES
+        body['max_chunk_size'] = resumable_uploads.MAX_CHUNK_BYTES
+        response = jsonify(body)
+        response.headers['Location'] = body['upload_url']
+        return response, 201
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/uploads/<upload_id>', methods=['GET'])
+@jwt_required()
+def get_upload_session(upload_id):
+    """Offset to resume from after a dropped connection"""
+    try:
+        session = _get_upload_session(upload_id, int(get_jwt_identity()))
+        if not session:
+            return jsonify({'error': 'Upload not found'}), 404
+        return _offset_response(session.id, session.received, session.size,
+                                expires_at=session.expires_at.isoformat())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/uploads/<upload_id>', methods=['PUT'])
+@jwt_required()
+def upload_chunk(upload_id):
+    """Append one chunk; the body is the raw bytes named by Content-Range.
+
+    Optional X-Chunk-SHA256 makes the chunk all-or-nothing. 409 means the
+    chunk did not start at the current offset: resume from ``offset``.
+    """
+    try:
+        session = _get_upload_session(upload_id, int(get_jwt_identity()))
+        if not session:
+            return jsonify({'error': 'Upload not found'}), 404
+        size = session.size
+        try:
+            start, length = resumable_uploads.parse_content_range(request.headers.get('Content-Range'), size)
+        except ValueError as e:
+            return _offset_response(upload_id, session.received, size, 400, error=str(e))
+        if request.content_length is not None and request.content_length != length:
+            return _offset_response(upload_id, session.received, size, 400,
+                                    error='Content-Length does not match Content-Range')
+        
+        try:
+            offset = resumable_uploads.write_chunk(
+                session, request.stream, start, length, current_app.config['UPLOAD_FOLDER'],
+                chunk_sha256=request.headers.get('X-Chunk-SHA256')
+            )
+        except resumable_uploads.OffsetMismatch as e:
+            return _offset_response(upload_id, e.offset, size, 409, error=str(e))
+        except resumable_uploads.IncompleteChunk as e:
+            return _offset_response(upload_id, e.offset, size, 400, error=str(e))
+        except ValueError as e:
+            return _offset_response(upload_id, start, size, 400, error=str(e))
+        return _offset_response(upload_id, offset, size)
         
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
 
+@bp.route('/uploads/<upload_id>/complete', methods=['POST'])
+@jwt_required()
+def complete_upload(upload_id):
+    """Verify the assembled file (size and declared SHA-256) and create the report"""
+    try:
+        user_id = int(get_jwt_identity())
+        session = _get_upload_session(upload_id, user_id)
+        if not session:
+            return jsonify({'error': 'Upload not found'}), 404
+        filename, report_type = session.filename, session.report_type
+        description, test_date = session.description, session.test_date
+        
+        try:
+            blob, report = resumable_uploads.complete_session(
+                session, current_app.config['UPLOAD_FOLDER'],
+                lambda blob: _add_report(user_id, blob, filename, report_type=report_type,
+                                         description=description, test_date=test_date)
+            )
+        except resumable_uploads.OffsetMismatch:
+            db.session.rollback()
+            return jsonify({'error': 'Upload already completed'}), 409
+        except ValueError as e:
+            db.session.rollback()
+            return jsonify({'error': str(e)}), 400
+        return _uploaded_response(report, blob, user_id)
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/uploads/<upload_id>', methods=['DELETE'])
+@jwt_required()
+def abort_upload(upload_id):
+    """Abandon a resumable upload and discard its bytes"""
+    try:
+        session = _get_upload_session(upload_id, int(get_jwt_identity()))
+        if not session:
+            return jsonify({'error': 'Upload not found'}), 404
+        resumable_uploads.abort_session(session, current_app.config['UPLOAD_FOLDER'])
+        return jsonify({'message': 'Upload aborted'}), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
 @bp.route('/list', methods=['GET'])
 @jwt_required()
 def get_reports():
@@ -80,6 +262,54 @@ def get_reports():
         return jsonify({'error': str(e)}), 500
 
 
+@bp.route('/search', methods=['GET'])
+@jwt_required()
+def search_reports():
+    """Full-text search over report text and descriptions, best match first.
+
+    Query: q, type, from / to (YYYY-MM-DD, inclusive), limit, offset.
+    Users search their own reports; admins search everyone's, or one user's with user_id.
+    """
+    try:
+        user_id = int(get_jwt_identity())
+        q = request.args.get('q', '').strip()
+        if not q:
+            return jsonify({'error': 'q is required'}), 400
+        try:
+            limit = min(max(int(request.args.get('limit', 20)), 1), report_search.MAX_RESULTS)
+            offset = max(int(request.args.get('offset', 0)), 0)
+            date_from = _parse_day(request.args.get('from'))
+            date_to = _parse_day(request.args.get('to'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        owner = user_id
+        user = db.session.get(User, user_id)
+        if user is not None and user.role == 'admin':
+            owner = request.args.get('user_id', type=int)
+
+        results = report_search.search_reports(
+            q, user_id=owner,
+            report_type=request.args.get('type'),
+            date_from=date_from,
+            date_to=date_to + timedelta(days=1) if date_to else None,
+            limit=limit, offset=offset,
+        )
+        return jsonify({'query': q, 'limit': limit, 'offset': offset, 'results': results}), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+def _parse_day(value):
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError(f'Invalid date {value!r}; expected YYYY-MM-DD')
+
+
 @bp.route('/<int:report_id>', methods=['GET'])
 @jwt_required()
 def get_report(report_id):
@@ -100,6 +330,118 @@ def get_report(report_id):
         return jsonify({'error': str(e)}), 500
 
 
+@bp.route('/<int:report_id>/file', methods=['GET'])
+@jwt_required()
+def download_report_file(report_id):
+    """Serve the report file (Range, ETag and If-None-Match supported; ?download=1 for an attachment)"""
+    try:
+        user_id = int(get_jwt_identity())
+        row = db.session.execute(
+            select(Report.file_path, Report.content_hash, Report.original_filename)
+            .where(Report.id == report_id, Report.user_id == user_id)
+        ).first()
+        
+        if not row:
+            return jsonify({'error': 'Report not found'}), 404
+        
+        download_name = row.original_filename or os.path.basename(row.file_path)
+        mimetype = mimetypes.guess_type(download_name)[0] or 'application/octet-stream'
+        as_attachment = request.args.get('download', '').lower() in ('1', 'true', 'yes')
+        
+        storage = get_storage()
+        url = storage.presign(row.file_path, expires=current_app.config.get('PRESIGN_SECONDS', 300),
+                              filename=download_name, as_attachment=as_attachment)
+        if url:
+            # object storage serves the bytes (with Range) straight to the client; the URL expires, so never cache it
+            response = redirect(url, code=302)
+            response.cache_control.no_store = True
+            return response
+        
+        path = storage.local_path(row.file_path)
+        if not os.path.isfile(path):
+            return jsonify({'error': 'Report file is missing'}), 404
+        
+        accel_prefix = current_app.config.get('X_ACCEL_REDIRECT_PREFIX')
+        # only nginx sets X-Sendfile-Type; requests straight to :5000 get the bytes from Flask
+        behind_nginx = request.headers.get('X-Sendfile-Type') == 'X-Accel-Redirect'
+        if accel_prefix and behind_nginx and row.content_hash:
+            # nginx streams the file (with Range) from an internal location; this worker returns at once
+            response = current_app.response_class(mimetype=mimetype)
+            response.set_etag(row.content_hash)
+            if request.if_none_match.contains(row.content_hash):
+                response.status_code = 304
+            else:
+                response.headers['X-Accel-Redirect'] = accel_prefix.rstrip('/') + '/' + quote(row.file_path)
+            response.headers.set('Content-Disposition', 'attachment' if as_attachment else 'inline',
+                                 filename=download_name)
+        else:
+            # Content-addressed files never change, so the hash is a strong ETag
+            response = send_file(
+                path,
+                mimetype=mimetype,
+                as_attachment=as_attachment,
+                download_name=download_name,
+                conditional=True,
+                etag=row.content_hash or True,
+                max_age=REPORT_FILE_MAX_AGE,
+            )
+        response.cache_control.public = False
+        response.cache_control.private = True
+        response.cache_control.max_age = REPORT_FILE_MAX_AGE
+        if row.content_hash:
+            response.cache_control.immutable = True
+        response.headers['X-Content-Type-Options'] = 'nosniff'
+        return response
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/<int:report_id>/thumbnail', methods=['GET'])
+@jwt_required()
+def get_report_thumbnail(report_id):
+    """Pre-rendered thumbnail (?size=thumb|preview); never decodes the original file"""
+    try:
+        user_id = int(get_jwt_identity())
+        size = request.args.get('size', 'thumb')
+        if size not in thumbnails.THUMBNAIL_SIZES:
+            return jsonify({'error': f"size must be one of: {', '.join(thumbnails.THUMBNAIL_SIZES)}"}), 400
+        
+        row = db.session.execute(
+            select(Report.content_hash, Blob.preview_format)
+            .outerjoin(Blob, Blob.sha256 == Report.content_hash)
+            .where(Report.id == report_id, Report.user_id == user_id)
+        ).first()
+        
+        if not row:
+            return jsonify({'error': 'Report not found'}), 404
+        if row.content_hash and row.preview_format is None:
+            response = jsonify({'error': 'Thumbnail not ready yet', 'status': 'pending'})
+            response.headers['Retry-After'] = str(ANALYSIS_POLL_SECONDS)
+            return response, 404
+        if not row.content_hash or row.preview_format == thumbnails.NO_PREVIEW:
+            return jsonify({'error': 'No preview available for this report', 'status': 'unavailable'}), 404
+        
+        path = os.path.join(current_app.config['THUMBNAIL_FOLDER'],
+                            thumbnails.thumbnail_path(row.content_hash, size, row.preview_format))
+        response = send_file(
+            path,
+            mimetype=f'image/{row.preview_format}',
+            conditional=True,
+            etag=f'{row.content_hash}-{size}',
+            max_age=REPORT_FILE_MAX_AGE,
+        )
+        response.cache_control.public = False
+        response.cache_control.private = True
+        response.cache_control.immutable = True
+        return response
+        
+    except FileNotFoundError:
+        return jsonify({'error': 'Thumbnail is missing', 'status': 'unavailable'}), 404
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 @bp.route('/<int:report_id>/delete', methods=['DELETE'])
 @jwt_required()
 def delete_report(report_id):
@@ -114,13 +456,11 @@ def delete_report(report_id):
         if not report:
             return jsonify({'error': 'Report not found'}), 404
         
-        # Delete file
-        filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], report.file_path)
-        if os.path.exists(filepath):
-            os.remove(filepath)
-        
+        # The file goes only once no other report shares its blob
+        released = blob_store.release_report_files([report])
         db.session.delete(report)
         db.session.commit()
+        blob_store.purge_files(current_app.config['UPLOAD_FOLDER'], released)
         
         return jsonify({'message': 'Report deleted successfully'}), 200
         
@@ -132,7 +472,10 @@ def delete_report(report_id):
 @bp.route('/<int:report_id>/analyze', methods=['POST'])
 @jwt_required()
 def analyze_report(report_id):
-    """Analyze report using AI"""
+    """Queue AI analysis of a report (202 + job); poll /<id>/analysis for the result.
+
+    A file the current model has already analysed is answered from the result cache (200).
+    """
     try:
         user_id = int(get_jwt_identity())
         report = Report.query.filter_by(
@@ -143,29 +486,75 @@ def analyze_report(report_id):
         if not report:
             return jsonify({'error': 'Report not found'}), 404
         
-        # Simulate AI analysis
-        analysis = {
-            'report_type': report.report_type,
-            'analysis': f'Preliminary analysis of {report.report_type}',
-            'findings': [
-                'All values within normal range',
-                'No abnormalities detected',
-                'Recommend follow-up in 6 months'
-            ],
-            'recommendations': [
-                'Continue current lifestyle',
-                'Maintain regular check-ups',
-                'Monitor for any changes'
-            ],
-            'confidence_score': 0.92
-        }
+        # Already waiting for a worker: hand back the same job instead of queueing another
+        job = db.session.get(Job, report.analysis_job_id) if report.analysis_job_id else None
+        pending = report.status in report_analysis.PENDING_STATUSES and job and job.status not in jobs.FINISHED_STATUSES
         
-        report.ai_analysis = str(analysis)
-        report.status = 'analyzed'
-        db.session.commit()
+        # Same file already analysed by the current model: answer from the cache, no job
+        if not pending and report_analysis.apply_cached_analysis(report):
+            db.session.commit()
+            return jsonify({
+                'message': 'Report analyzed (cached result)',
+                'report_id': report.id,
+                'status': report.status,
+                'analysis': report.ai_analysis
+            }), 200
+        
+        if not pending:
+            job = report_analysis.enqueue_analysis(report, created_by=user_id)
+            db.session.commit()
         
-        return jsonify(analysis), 200
+        response = jsonify({
+            'message': 'Report queued for analysis',
+            'report_id': report.id,
+            'status': report.status,
+            'job_id': job.id,
+            'status_url': url_for('reports.get_report_analysis', report_id=report.id)
+        })
+        response.headers['Location'] = response.json['status_url']
+        response.headers['Retry-After'] = str(ANALYSIS_POLL_SECONDS)
+        return response, 202
         
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/<int:report_id>/analysis', methods=['GET'])
+@jwt_required()
+def get_report_analysis(report_id):
+    """Analysis status and, once analyzed, the result"""
+    try:
+        user_id = int(get_jwt_identity())
+        report = Report.query.filter_by(
+            id=report_id,
+            user_id=user_id
+        ).first()
+        
+        if not report:
+            return jsonify({'error': 'Report not found'}), 404
+        
+        job = db.session.get(Job, report.analysis_job_id) if report.analysis_job_id else None
+        status = report.status
+        if status in report_analysis.PENDING_STATUSES and job and job.status in ('failed', 'cancelled'):
+            status = 'analysis_failed' if job.status == 'failed' else 'analysis_cancelled'
+        
+        body = {
+            'report_id': report.id,
+            'status': status,
+            'analysis': report_analysis.parse_analysis(report.ai_analysis) if status == 'analyzed' else None,
+            'job': {
+                'id': job.id,
+                'status': job.status,
+                'progress': job.progress,
+                'attempts': job.attempts,
+                'error': job.error.splitlines()[0] if job.error else None
+            } if job else None
+        }
+        response = jsonify(body)
+        if status in report_analysis.PENDING_STATUSES:
+            response.headers['Retry-After'] = str(ANALYSIS_POLL_SECONDS)
+        return response, 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
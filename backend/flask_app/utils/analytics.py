@@ -0,0 +1,266 @@
+"""Daily analytics cube for the admin dashboard (table ``analytics_daily``).
+
+Raw tables are scanned only by the refresh job, one window of days at a
+time; ``/api/admin/analytics`` reads nothing but the cube. Each window is
+recomputed from scratch and swapped in with delete + insert in one
+transaction, so refreshing the same days twice is harmless.
+
+Incremental refreshes start ``LOOKBACK_DAYS`` before the newest day already in
+the cube, which picks up late writes to recent days. Imports that add older
+data enqueue a refresh of exactly the range they touched.
+"""
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import select, delete, insert, func
+
+from flask_app.models import db, User, HealthRecord, Report, AnalyticsDaily
+from flask_app.utils.jobs import job_handler, enqueue, DEFAULT_PRIORITY
+
+LOOKBACK_DAYS = 2
+WINDOW_DAYS = 31  # days rebuilt per transaction
+STREAM_BATCH = 5000
+MAX_QUERY_DAYS = 731
+
+# metric -> dimensions it is broken down by ('all' is the daily total)
+METRICS = {
+    'signups': ('all', 'gender', 'age_band'),
+    'active_users': ('all', 'gender', 'age_band'),
+    'health_records': ('all', 'gender', 'age_band'),
+    'abnormal_vitals': ('all', 'gender', 'age_band', 'vital'),
+    'reports': ('all', 'report_type'),
+}
+
+# vital -> (low, high) normal range, inclusive. Heart rate, blood pressure and temperature use the
+# /api/health/analysis thresholds; oxygen saturation and blood glucose (which it does not check) use
+# common clinical reference ranges.
+NORMAL_VITALS = {
+    'heart_rate': (60, 100),
+    'systolic': (None, 139),
+    'diastolic': (None, 89),
+    'temperature': (None, 37.5),
+    'oxygen_saturation': (95, None),
+    'blood_glucose': (70, 180),
+}
+
+AGE_BANDS = ((18, '<18'), (30, '18-29'), (45, '30-44'), (65, '45-64'), (None, '65+'))
+
+
+def age_band(date_of_birth, on_day):
+    if date_of_birth is None:
+        return 'unknown'
+    age = on_day.year - date_of_birth.year - ((on_day.month, on_day.day) < (date_of_birth.month, date_of_birth.day))
+    for upper, label in AGE_BANDS:
+        if upper is None or age < upper:
+            return label
+
+
+def abnormal_vitals(row):
+    """Names of the vitals in ``row`` that fall outside NORMAL_VITALS."""
+    out = []
+    for vital, (low, high) in NORMAL_VITALS.items():
+        value = getattr(row, vital)
+        if value is None:
+            continue
+        if (low is not None and value < low) or (high is not None and value > high):
+            out.append(vital)
+    return out
+
+
+def _as_date(value):
+    return value.date() if isinstance(value, datetime) else value
+
+
+def _day_bounds(start, end):
+    """``[start, end]`` days as a half-open datetime range."""
+    return datetime.combine(start, datetime.min.time()), datetime.combine(end + timedelta(days=1), datetime.min.time())
+
+
+def _stream(statement):
+    return db.session.execute(statement.execution_options(yield_per=STREAM_BATCH))
+
+
+# ========================
+# AGGREGATION
+# ========================
+
+def compute_window(start, end):
+    """Aggregate the raw tables for days ``start..end``; returns ``{(day, metric, dimension, dim_value): value}``."""
+    lo, hi = _day_bounds(start, end)
+    cells = defaultdict(float)
+    active = {}  # (day, user_id) -> (gender, age_band)
+
+    def add(day, metric, value=1, **dims):
+        cells[(day, metric, 'all', '')] += value
+        for dimension, dim_value in dims.items():
+            cells[(day, metric, dimension, dim_value)] += value
+
+    for created_at, gender, dob in _stream(
+        select(User.created_at, User.gender, User.date_of_birth)
+        .where(User.created_at >= lo, User.created_at < hi)
+    ):
+        day = created_at.date()
+        add(day, 'signups', gender=gender or 'unknown', age_band=age_band(dob, day))
+
+    for row in _stream(
+        select(HealthRecord.user_id, HealthRecord.timestamp, *(getattr(HealthRecord, v) for v in NORMAL_VITALS),
+               User.gender, User.date_of_birth)
+        .join(User, User.id == HealthRecord.user_id)
+        .where(HealthRecord.timestamp >= lo, HealthRecord.timestamp < hi)
+    ):
+        day = row.timestamp.date()
+        dims = {'gender': row.gender or 'unknown', 'age_band': age_band(row.date_of_birth, day)}
+        add(day, 'health_records', **dims)
+        flagged = abnormal_vitals(row)
+        if flagged:
+            add(day, 'abnormal_vitals', **dims)
+            for vital in flagged:
+                cells[(day, 'abnormal_vitals', 'vital', vital)] += 1
+        active[(day, row.user_id)] = (dims['gender'], dims['age_band'])
+
+    for user_id, upload_date, report_type, gender, dob in _stream(
+        select(Report.user_id, Report.upload_date, Report.report_type, User.gender, User.date_of_birth)
+        .join(User, User.id == Report.user_id)
+        .where(Report.upload_date >= lo, Report.upload_date < hi)
+    ):
+        day = upload_date.date()
+        add(day, 'reports', report_type=report_type or 'unspecified')
+        active.setdefault((day, user_id), (gender or 'unknown', age_band(dob, day)))
+
+    for (day, _), (gender, band) in active.items():
+        add(day, 'active_users', gender=gender, age_band=band)
+    return cells
+
+
+def write_window(start, end, cells):
+    """Replace the cube rows for days ``start..end`` with ``cells`` in one transaction."""
+    now = datetime.utcnow()
+    rows = [{'day': day, 'metric': metric, 'dimension': dimension, 'dim_value': dim_value,
+             'value': value, 'updated_at': now}
+            for (day, metric, dimension, dim_value), value in cells.items()]
+    try:
+        db.session.execute(delete(AnalyticsDaily).where(AnalyticsDaily.day >= start, AnalyticsDaily.day <= end))
+        if rows:
+            db.session.execute(insert(AnalyticsDaily.__table__), rows)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return len(rows)
+
+
+# ========================
+# REFRESH
+# ========================
+
+def _earliest_source_day():
+    firsts = [db.session.execute(select(func.min(col))).scalar()
+              for col in (User.created_at, HealthRecord.timestamp, Report.upload_date)]
+    firsts = [_as_date(d) for d in firsts if d is not None]
+    return min(firsts) if firsts else None
+
+
+def refresh_window(since=None, until=None, full=False):
+    """Work out which days need rebuilding: everything if ``full`` or the cube is empty,
+    otherwise from ``LOOKBACK_DAYS`` before its newest day. Returns ``(start, end)`` or None.
+    """
+    end = _as_date(until) or datetime.utcnow().date()
+    if since is not None:
+        start = _as_date(since)
+    else:
+        newest = None if full else db.session.execute(select(func.max(AnalyticsDaily.day))).scalar()
+        start = newest - timedelta(days=LOOKBACK_DAYS) if newest else _earliest_source_day()
+    db.session.rollback()
+    if start is None or start > end:
+        return None
+    return start, end
+
+
+def refresh_analytics(since=None, until=None, full=False, progress=None):
+    """Rebuild the cube for the refresh window, ``WINDOW_DAYS`` per transaction."""
+    started = time.perf_counter()
+    window = refresh_window(since, until, full)
+    summary = {'from': None, 'to': None, 'days': 0, 'cells': 0}
+    if window is None:
+        return summary
+    start, end = window
+    summary.update({'from': start.isoformat(), 'to': end.isoformat(), 'days': (end - start).days + 1})
+
+    chunk_start = start
+    while chunk_start <= end:
+        chunk_end = min(end, chunk_start + timedelta(days=WINDOW_DAYS - 1))
+        summary['cells'] += write_window(chunk_start, chunk_end, compute_window(chunk_start, chunk_end))
+        if progress:
+            progress(((chunk_end - start).days + 1) / summary['days'], f'{chunk_end.isoformat()} done')
+        chunk_start = chunk_end + timedelta(days=1)
+    summary['elapsed_seconds'] = round(time.perf_counter() - started, 3)
+    return summary
+
+
+def enqueue_refresh(since=None, until=None, full=False, created_by=None, priority=DEFAULT_PRIORITY):
+    """Queue a ``refresh_analytics`` job (e.g. after an import touched past days)."""
+    payload = {'full': bool(full)}
+    if since is not None:
+        payload['since'] = _as_date(since).isoformat()
+    if until is not None:
+        payload['until'] = _as_date(until).isoformat()
+    return enqueue('refresh_analytics', payload, priority=priority, max_attempts=1, created_by=created_by)
+
+
+@job_handler('refresh_analytics')
+def run_refresh_analytics_job(ctx, since=None, until=None, full=False):
+    """Scheduled every ``ANALYTICS_REFRESH_SECONDS`` by the workers; also queued on demand."""
+    return refresh_analytics(
+        since=date.fromisoformat(since) if since else None,
+        until=date.fromisoformat(until) if until else None,
+        full=full,
+        progress=ctx.set_progress,
+    )
+
+
+# ========================
+# QUERY
+# ========================
+
+def query_cube(metric, start, end, group_by='all'):
+    """Daily series for ``metric`` between ``start`` and ``end`` (inclusive), read from the cube only.
+
+    Days without a row are zero. ``totals`` sums the daily values, so for
+    ``active_users`` it counts user-days rather than distinct users.
+    """
+    if metric not in METRICS:
+        raise ValueError(f"metric must be one of: {', '.join(METRICS)}")
+    if group_by not in METRICS[metric]:
+        raise ValueError(f"group_by for {metric} must be one of: {', '.join(METRICS[metric])}")
+    if start > end:
+        raise ValueError('from must not be after to')
+    if (end - start).days >= MAX_QUERY_DAYS:
+        raise ValueError(f'At most {MAX_QUERY_DAYS} days per query')
+
+    days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+    index = {d: i for i, d in enumerate(days)}
+    series = {} if group_by != 'all' else {'': [0] * len(days)}
+    refreshed_at = None
+    for day, dim_value, value, updated_at in db.session.execute(
+        select(AnalyticsDaily.day, AnalyticsDaily.dim_value, AnalyticsDaily.value, AnalyticsDaily.updated_at)
+        .where(AnalyticsDaily.metric == metric, AnalyticsDaily.dimension == group_by,
+               AnalyticsDaily.day >= start, AnalyticsDaily.day <= end)
+    ):
+        values = series.setdefault(dim_value, [0] * len(days))
+        values[index[day]] = int(value) if float(value).is_integer() else value
+        if refreshed_at is None or updated_at > refreshed_at:
+            refreshed_at = updated_at
+
+    if group_by == 'all':
+        series = {'total': series['']}
+    return {
+        'metric': metric,
+        'group_by': group_by,
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'days': [d.isoformat() for d in days],
+        'series': dict(sorted(series.items())),
+        'totals': {k: sum(v) for k, v in sorted(series.items())},
+        'refreshed_at': refreshed_at.isoformat() if refreshed_at else None,
+    }
@@ -0,0 +1,203 @@
+"""Content-addressed, reference-counted storage for report uploads.
+
+An upload is copied in chunks to a temp file under ``<upload folder>/.incoming``
+while its SHA-256 is computed, then stored at ``ab/cd/<sha256>`` by the storage
+backend (flask_app.utils.storage). The ``blobs``
+row counts how many reports point at that file, so a duplicate upload only
+bumps the count and a deleted report only removes the file when the last
+reference goes.
+
+Write order matters for concurrent uploads and deletes of the same content:
+the refcount row is updated first (taking its row lock) and files are only
+removed after the commit, once no ``blobs`` row for the hash remains.
+
+``Report.file_path`` values are turned into filesystem paths by the resolver
+named in ``STORAGE_PATH_RESOLVER`` (ShardedPathResolver by default). Uploads
+from before content addressing still hold bare file names in the folder
+root; migrate_uploads.py moves them into the sharded layout.
+"""
+import hashlib
+import os
+import tempfile
+from collections import Counter
+
+from flask import current_app
+from werkzeug.utils import import_string
+from sqlalchemy import select, update, delete
+from sqlalchemy.exc import IntegrityError
+
+from flask_app.models import db, Blob
+from flask_app.utils.storage import get_storage
+
+CHUNK_SIZE = 1024 * 1024
+INCOMING_DIR = '.incoming'
+
+
+def blob_path(sha256):
+    """Path of a blob relative to the upload folder: ``ab/cd/<sha256>``."""
+    return f'{sha256[:2]}/{sha256[2:4]}/{sha256}'
+
+
+class ShardedPathResolver:
+    """Maps stored ``file_path`` values to files under the upload folder."""
+
+    def __init__(self, upload_folder):
+        self.root = os.path.abspath(upload_folder)
+
+    def relative_path(self, sha256):
+        """Where new content with this hash is stored."""
+        return blob_path(sha256)
+
+    def absolute_path(self, file_path):
+        path = os.path.abspath(os.path.join(self.root, file_path))
+        if os.path.commonpath([path, self.root]) != self.root:
+            raise ValueError(f'{file_path!r} is outside the upload folder')
+        return path
+
+    @staticmethod
+    def is_legacy(file_path):
+        """A bare file name in the folder root, stored before content addressing."""
+        return '/' not in file_path
+
+
+DEFAULT_PATH_RESOLVER = 'flask_app.utils.blob_store.ShardedPathResolver'
+_resolvers = {}
+
+
+def get_resolver(upload_folder=None):
+    """The configured path resolver for ``upload_folder`` (UPLOAD_FOLDER by default)."""
+    cfg = current_app.config
+    upload_folder = upload_folder or cfg['UPLOAD_FOLDER']
+    name = cfg.get('STORAGE_PATH_RESOLVER') or DEFAULT_PATH_RESOLVER
+    key = (name, upload_folder)
+    if key not in _resolvers:
+        _resolvers[key] = import_string(name)(upload_folder)
+    return _resolvers[key]
+
+
+def resolve_path(file_path, upload_folder=None):
+    """Absolute path of a stored report file."""
+    return get_resolver(upload_folder).absolute_path(file_path)
+
+
+def spool_stream(stream, upload_folder, chunk_size=CHUNK_SIZE):
+    """Copy ``stream`` to a temp file in the upload folder, hashing as it goes.
+
+    Returns ``(tmp_path, sha256, size)``. The temp file is on the same
+    filesystem as the blobs, so moving it into place is a rename.
+    """
+    incoming = os.path.join(upload_folder, INCOMING_DIR)
+    os.makedirs(incoming, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=incoming)
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while True:
+                chunk = stream.read(chunk_size)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+            out.flush()
+            os.fsync(out.fileno())
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return tmp_path, digest.hexdigest(), size
+
+
+def _increment(sha256):
+    return db.session.execute(
+        update(Blob).where(Blob.sha256 == sha256).values(ref_count=Blob.ref_count + 1)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+
+def acquire_blob(tmp_path, sha256, size, upload_folder):
+    """Add one reference to the blob for ``sha256`` and make sure its file exists.
+
+    Hands ``tmp_path`` to the storage backend for new content and discards it for
+    duplicates. Call this before any other write in the transaction: a
+    concurrent first upload of the same content is resolved by rolling back
+    and incrementing instead. The caller commits.
+    """
+    try:
+        if not _increment(sha256):
+            try:
+                db.session.add(Blob(sha256=sha256, size=size, ref_count=1))
+                db.session.flush()
+            except IntegrityError:
+                db.session.rollback()
+                _increment(sha256)
+
+        storage = get_storage(upload_folder)
+        if storage.exists(blob_path(sha256)):
+            os.remove(tmp_path)
+        else:  # new content, or a blob whose file went missing
+            storage.put_file(blob_path(sha256), tmp_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return db.session.execute(
+        select(Blob).where(Blob.sha256 == sha256).execution_options(populate_existing=True)
+    ).scalar_one()
+
+
+def store_upload(stream, upload_folder):
+    """Stream an upload into the blob store; returns the (uncommitted) Blob."""
+    tmp_path, sha256, size = spool_stream(stream, upload_folder)
+    return acquire_blob(tmp_path, sha256, size, upload_folder)
+
+
+def release_report_files(reports):
+    """Drop the file references of reports that are about to be deleted.
+
+    ``reports`` may be Report objects or rows with ``file_path`` and
+    ``content_hash``. Returns the relative paths to hand to
+    :func:`purge_files` after the commit: blobs whose count reached zero, and
+    files of older uploads that were never content-addressed.
+    """
+    counts = Counter()
+    released = []
+    for report in reports:
+        if report.content_hash:
+            counts[report.content_hash] += 1
+        elif report.file_path:
+            released.append(report.file_path)
+    for sha256, n in counts.items():
+        db.session.execute(
+            update(Blob).where(Blob.sha256 == sha256).values(ref_count=Blob.ref_count - n)
+            .execution_options(synchronize_session=False)
+        )
+    if counts:
+        unreferenced = db.session.execute(
+            select(Blob.sha256).where(Blob.sha256.in_(list(counts)), Blob.ref_count <= 0)
+        ).scalars().all()
+        if unreferenced:
+            db.session.execute(delete(Blob).where(Blob.sha256.in_(unreferenced))
+                               .execution_options(synchronize_session=False))
+            released.extend(blob_path(h) for h in unreferenced)
+    return released
+
+
+def purge_files(upload_folder, released):
+    """Remove released files (and blob thumbnails) after the commit; a blob re-uploaded in the meantime is kept."""
+    blob_hashes = [os.path.basename(p) for p in released if p == blob_path(os.path.basename(p))]
+    revived = set(db.session.execute(
+        select(Blob.sha256).where(Blob.sha256.in_(blob_hashes))
+    ).scalars()) if blob_hashes else set()
+    thumbnail_folder = current_app.config.get('THUMBNAIL_FOLDER')
+    storage = get_storage(upload_folder)
+    removed = 0
+    for rel in released:
+        if os.path.basename(rel) in revived:
+            continue
+        if storage.delete(rel):
+            removed += 1
+        if thumbnail_folder and os.path.basename(rel) in blob_hashes:
+            from flask_app.utils.thumbnails import remove_thumbnails  # imports this module
+            remove_thumbnails(thumbnail_folder, os.path.basename(rel))
+    return removed
@@ -0,0 +1,467 @@
+"""Streaming bulk loader for users and health records (admin data-management).
+
+Rows are parsed one at a time from a CSV or NDJSON stream, validated column-wise
+per batch and written with executemany inserts. On SQLite the whole import runs
+in one transaction on one connection with relaxed durability pragmas; on other
+backends (and for background jobs, which write progress between batches) each
+batch is committed on its own so undo logs and lock times stay bounded.
+"""
+import csv
+import io
+import json
+import os
+import secrets
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import bcrypt
+import numpy as np
+from sqlalchemy import insert, select
+
+from flask_app.models import db, User, HealthRecord
+from flask_app.utils.analytics import enqueue_refresh
+from flask_app.utils.jobs import job_handler
+
+DEFAULT_BATCH_SIZE = 5000
+MAX_REPORTED_ERRORS = 100
+BULK_IMPORT_MAX_ATTEMPTS = 1  # batches are committed as they go; a retry would duplicate them
+
+IMPORT_KINDS = ('users', 'health_records')
+
+USER_FIELDS = ('name', 'email', 'phone', 'date_of_birth', 'gender')
+USER_TEXT_FIELDS = ('name', 'email', 'gender', 'blood_type', 'password', 'password_hash')  # strings or absent
+VALID_GENDERS = {'male', 'female', 'other'}
+
+# column -> (min, max); same bounds as utils.validators.validate_health_record
+HEALTH_RANGES = {
+    'heart_rate': (0, 220),
+    'systolic': (0, 300),
+    'diastolic': (0, 200),
+    'weight': (0, 500),
+    'temperature': (30, 45),
+    'blood_glucose': (0, 1000),
+    'oxygen_saturation': (0, 100),
+}
+INTEGER_COLUMNS = {'heart_rate', 'systolic', 'diastolic'}
+ROW_ERROR = '_error'  # set by iter_rows on NDJSON lines that are not a JSON object
+HEALTH_INSERT_COLUMNS = tuple(HEALTH_RANGES) + ('notes', 'timestamp')
+
+
+# ========================
+# PARSING
+# ========================
+
+def detect_format(filename):
+    """Guess the input format from a file name (csv unless it looks like NDJSON)."""
+    ext = os.path.splitext(filename or '')[1].lower()
+    return 'ndjson' if ext in ('.ndjson', '.jsonl', '.json') else 'csv'
+
+
+def iter_rows(stream, fmt='csv'):
+    """Yield one dict per input row without reading the whole stream into memory."""
+    wrapper = None
+    if not hasattr(stream, 'encoding'):
+        stream = wrapper = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    try:
+        if fmt == 'ndjson':
+            for line in stream:
+                line = line.strip()
+                if line:
+                    yield _parse_ndjson_line(line)
+        else:
+            reader = csv.reader(stream)
+            header = [h.strip() for h in next(reader, [])]
+            for row in reader:
+                if row:
+                    yield dict(zip(header, row))
+    finally:
+        if wrapper is not None:
+            wrapper.detach()  # leave the caller's binary stream open
+
+
+def _parse_ndjson_line(line):
+    """The line's JSON object, or a row the validators reject with ``ROW_ERROR``."""
+    try:
+        row = json.loads(line)
+    except ValueError:
+        return {ROW_ERROR: 'Invalid JSON'}
+    return row if isinstance(row, dict) else {ROW_ERROR: 'Row is not a JSON object'}
+
+
+def iter_batches(rows, size):
+    """Group an iterable of rows into lists of at most ``size`` rows."""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _blank(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def _to_float_column(values):
+    """Convert a column to a float64 array in one numpy call.
+
+    Returns ``(array, unparsable)``; blanks become NaN and ``unparsable`` flags
+    cells that held something that is not a number.
+    """
+    nan = float('nan')
+    try:
+        out = np.array([nan if v is None or v == '' else v for v in values], dtype=np.float64)
+        return out, np.zeros(len(values), dtype=bool)
+    except (TypeError, ValueError):
+        pass
+    out = np.full(len(values), np.nan)
+    unparsable = np.zeros(len(values), dtype=bool)
+    for i, v in enumerate(values):
+        if not _blank(v):
+            try:
+                out[i] = float(v)
+            except (TypeError, ValueError):
+                unparsable[i] = True
+    return out, unparsable
+
+
+def _is_text(value):
+    return value is None or isinstance(value, str)
+
+
+def _parse_datetime(value):
+    if _blank(value):
+        return None
+    if isinstance(value, (int, float)):
+        return datetime.utcfromtimestamp(value)
+    value = str(value).strip()
+    if value.endswith('Z'):
+        value = value[:-1] + '+00:00'
+    return datetime.fromisoformat(value).replace(tzinfo=None)
+
+
+def _column_to_list(values, integer=False):
+    """numpy column -> list of Python scalars with None for NaN."""
+    if integer:
+        return [None if v != v else int(v) for v in values.tolist()]
+    return [None if v != v else v for v in values.tolist()]
+
+
+# ========================
+# VALIDATION
+# ========================
+
+def validate_health_batch(rows, offset=0):
+    """Validate a batch of health rows column by column.
+
+    Returns ``(columns, errors)``. ``columns`` maps each output column
+    (including ``user_id``, ``user_email`` and ``_row``) to a list holding the
+    accepted rows only; ``errors`` is a list of ``{'row': n, 'error': msg}``.
+    """
+    n = len(rows)
+    bad = np.zeros(n, dtype=bool)
+    reasons = [None] * n
+    arrays = {}
+
+    for i, row in enumerate(rows):
+        if ROW_ERROR in row:
+            bad[i], reasons[i] = True, row[ROW_ERROR]
+
+    for col, (lo, hi) in HEALTH_RANGES.items():
+        values, unparsable = _to_float_column([r.get(col) for r in rows])
+        with np.errstate(invalid='ignore'):
+            invalid = unparsable | (values < lo) | (values > hi)
+        for i in np.flatnonzero(invalid & ~bad):
+            reasons[i] = f'Invalid {col}'
+        bad |= invalid
+        arrays[col] = values
+
+    user_ids, unparsable = _to_float_column([r.get('user_id') for r in rows])
+    with np.errstate(invalid='ignore'):
+        invalid = unparsable | (~np.isnan(user_ids) & (user_ids % 1 != 0))  # 1.7 must not become user 1
+    for i in np.flatnonzero(invalid & ~bad):
+        reasons[i] = 'Invalid user_id'
+    bad |= invalid
+
+    raw_emails = [r.get('user_email') or r.get('email') for r in rows]
+    invalid = np.array([not _is_text(e) for e in raw_emails], dtype=bool)
+    for i in np.flatnonzero(invalid & ~bad):
+        reasons[i] = 'Invalid user_email'
+    bad |= invalid
+    emails = [e.strip() if isinstance(e, str) else '' for e in raw_emails]
+    missing_user = np.isnan(user_ids) & np.array([not e for e in emails], dtype=bool)
+    for i in np.flatnonzero(missing_user & ~bad):
+        reasons[i] = 'user_id or user_email is required'
+    bad |= missing_user
+
+    now = datetime.utcnow()
+    parsed = {}
+    timestamps = [None] * n
+    for i in np.flatnonzero(~bad):
+        raw = rows[i].get('timestamp')
+        try:
+            if raw not in parsed:
+                parsed[raw] = _parse_datetime(raw) or now
+            timestamps[i] = parsed[raw]
+        except (TypeError, ValueError, OverflowError, OSError):  # utcfromtimestamp on out-of-range numbers
+            bad[i], reasons[i] = True, 'Invalid timestamp'
+
+    errors = [{'row': offset + int(i) + 1, 'error': reasons[i]} for i in np.flatnonzero(bad)]
+    keep = np.flatnonzero(~bad)
+    columns = {col: _column_to_list(arrays[col][keep], col in INTEGER_COLUMNS) for col in HEALTH_RANGES}
+    columns['user_id'] = _column_to_list(user_ids[keep], integer=True)
+    columns['user_email'] = [emails[i] for i in keep]
+    columns['notes'] = [str(rows[i].get('notes') or '') for i in keep]
+    columns['timestamp'] = [timestamps[i] for i in keep]
+    columns['_row'] = (keep + offset + 1).tolist()
+    return columns, errors
+
+
+def validate_user_batch(rows, offset=0):
+    """Validate a batch of user rows; returns ``(records, errors)``."""
+    records, errors = [], []
+    seen = set()
+    for i, row in enumerate(rows):
+        if ROW_ERROR in row:
+            errors.append({'row': offset + i + 1, 'error': row[ROW_ERROR]})
+            continue
+        missing = [f for f in USER_FIELDS if _blank(row.get(f))]
+        if missing:
+            errors.append({'row': offset + i + 1, 'error': f"Missing fields: {', '.join(missing)}"})
+            continue
+        wrong_type = [f for f in USER_TEXT_FIELDS if not _is_text(row.get(f))]
+        if wrong_type:
+            errors.append({'row': offset + i + 1, 'error': f"Invalid {', '.join(wrong_type)}"})
+            continue
+        email = row['email'].strip()
+        gender = row['gender'].strip().lower()
+        if '@' not in email:
+            errors.append({'row': offset + i + 1, 'error': 'Invalid email'})
+            continue
+        if gender not in VALID_GENDERS:
+            errors.append({'row': offset + i + 1, 'error': 'Invalid gender'})
+            continue
+        if email in seen:
+            errors.append({'row': offset + i + 1, 'error': 'Duplicate email in file'})
+            continue
+        try:
+            dob = datetime.fromisoformat(str(row['date_of_birth']).strip()).date()
+        except ValueError:
+            errors.append({'row': offset + i + 1, 'error': 'Invalid date_of_birth'})
+            continue
+        try:
+            height = None if _blank(row.get('height')) else float(row['height'])
+        except (TypeError, ValueError):
+            errors.append({'row': offset + i + 1, 'error': 'Invalid height'})
+            continue
+        seen.add(email)
+        records.append({
+            'name': row['name'].strip(),
+            'email': email,
+            'phone': str(row['phone']).strip(),
+            'date_of_birth': dob,
+            'gender': gender,
+            'role': 'user',  # admins are never created through imports
+            'is_active': True,
+            'height': height,
+            'blood_type': row.get('blood_type') or None,
+            'password': row.get('password') or None,
+            'password_hash': row.get('password_hash') or None,
+        })
+    return records, errors
+
+
+# ========================
+# PASSWORD HASHING
+# ========================
+
+def _hash_one(password):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+
+
+def hash_passwords(passwords, executor):
+    """Hash passwords on a thread pool (bcrypt releases the GIL while hashing)."""
+    return list(executor.map(_hash_one, passwords))
+
+
+# ========================
+# LOADER
+# ========================
+
+class BulkImporter:
+    """Load users or health records from a stream in large batches."""
+
+    def __init__(self, kind, batch_size=DEFAULT_BATCH_SIZE, hash_workers=None, progress=None,
+                 commit_every_batch=None):
+        if kind not in IMPORT_KINDS:
+            raise ValueError(f'Unknown import kind: {kind}')
+        self.kind = kind
+        self.batch_size = max(1, int(batch_size))
+        self.hash_workers = hash_workers or os.cpu_count() or 4
+        self.progress = progress
+        self.commit_every_batch = commit_every_batch
+        self._user_ids = set()
+        self._email_ids = {}
+        self._time_range = None  # (first, last) timestamp of inserted health records
+
+    def run(self, stream, fmt='csv'):
+        started = time.perf_counter()
+        summary = {'kind': self.kind, 'processed': 0, 'inserted': 0, 'skipped': 0,
+                   'error_count': 0, 'errors': []}
+        engine = db.engine
+        is_sqlite = engine.dialect.name == 'sqlite'
+        commit_every_batch = not is_sqlite if self.commit_every_batch is None else self.commit_every_batch
+
+        with engine.connect() as conn, ThreadPoolExecutor(self.hash_workers) as executor:
+            if is_sqlite:
+                self._relax_sqlite(conn)
+            try:
+                for batch in iter_batches(iter_rows(stream, fmt), self.batch_size):
+                    inserted, skipped, errors = self._load_batch(conn, batch, summary['processed'], executor)
+                    summary['processed'] += len(batch)
+                    summary['inserted'] += inserted
+                    summary['skipped'] += skipped
+                    summary['error_count'] += len(errors)
+                    room = MAX_REPORTED_ERRORS - len(summary['errors'])
+                    summary['errors'].extend(errors[:max(room, 0)])
+                    if commit_every_batch:
+                        conn.commit()
+                    if self.progress:
+                        self.progress(summary['processed'])
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                if is_sqlite:
+                    conn.exec_driver_sql('PRAGMA synchronous=FULL')
+
+        if self._time_range:
+            summary['first_timestamp'], summary['last_timestamp'] = (ts.isoformat() for ts in self._time_range)
+        elapsed = time.perf_counter() - started
+        summary['elapsed_seconds'] = round(elapsed, 3)
+        summary['rows_per_second'] = int(summary['processed'] / elapsed) if elapsed else summary['processed']
+        return summary
+
+    @staticmethod
+    def _relax_sqlite(conn):
+        """Trade crash durability for speed; the import is one transaction anyway."""
+        conn.exec_driver_sql('PRAGMA synchronous=OFF')
+        conn.exec_driver_sql('PRAGMA temp_store=MEMORY')
+        conn.exec_driver_sql('PRAGMA cache_size=-65536')
+
+    def _load_batch(self, conn, batch, offset, executor):
+        if self.kind == 'users':
+            return self._load_users(conn, batch, offset, executor)
+        return self._load_health_records(conn, batch, offset)
+
+    def _load_users(self, conn, batch, offset, executor):
+        records, errors = validate_user_batch(batch, offset)
+        emails = [r['email'] for r in records]
+        existing = set(conn.execute(select(User.email).where(User.email.in_(emails))).scalars()) if emails else set()
+        records = [r for r in records if r['email'] not in existing]
+
+        needs_hash = [r for r in records if not r['password_hash']]
+        plain = [r['password'] or secrets.token_urlsafe(16) for r in needs_hash]
+        for record, hashed in zip(needs_hash, hash_passwords(plain, executor)):
+            record['password_hash'] = hashed
+        for record in records:
+            del record['password']
+
+        if records:
+            now = datetime.utcnow()
+            for record in records:
+                record['created_at'] = record['updated_at'] = now
+            conn.execute(insert(User.__table__), records)
+        return len(records), len(existing), errors
+
+    def _load_health_records(self, conn, batch, offset):
+        columns, errors = validate_health_batch(batch, offset)
+        user_ids = self._resolve_users(conn, columns['user_id'], columns['user_email'])
+
+        known = self._user_ids
+        keep = []
+        for i, user_id in enumerate(user_ids):
+            if user_id is None or user_id not in known:
+                errors.append({'row': columns['_row'][i],
+                               'error': f"Unknown user {columns['user_id'][i] or columns['user_email'][i]}"})
+            else:
+                keep.append(i)
+        if len(keep) < len(user_ids):
+            columns = {col: [values[i] for i in keep] for col, values in columns.items()}
+            user_ids = [user_ids[i] for i in keep]
+
+        if user_ids:
+            first, last = min(columns['timestamp']), max(columns['timestamp'])
+            if self._time_range:
+                first, last = min(first, self._time_range[0]), max(last, self._time_range[1])
+            self._time_range = (first, last)
+            ts_type = HealthRecord.__table__.c.timestamp.type.dialect_impl(conn.dialect)
+            to_db = ts_type.bind_processor(conn.dialect)
+            if to_db:
+                columns['timestamp'] = [to_db(ts) for ts in columns['timestamp']]
+            params = list(zip(user_ids, *(columns[col] for col in HEALTH_INSERT_COLUMNS)))
+            conn.exec_driver_sql(self._health_insert_sql(conn), params)
+        return len(user_ids), 0, errors
+
+    @staticmethod
+    def _health_insert_sql(conn):
+        """Plain positional INSERT; executemany on it skips per-row SQLAlchemy bookkeeping."""
+        marker = '?' if conn.dialect.paramstyle == 'qmark' else '%s'
+        names = ('user_id',) + HEALTH_INSERT_COLUMNS
+        return (f"INSERT INTO {HealthRecord.__tablename__} ({', '.join(names)}) "
+                f"VALUES ({', '.join([marker] * len(names))})")
+
+    def _resolve_users(self, conn, ids, emails):
+        """Map each row to a user id, looking up unseen ids/emails with one query each."""
+        new_ids = {i for i in ids if i is not None} - self._user_ids
+        new_emails = {e for i, e in zip(ids, emails) if i is None} - set(self._email_ids)
+        if new_ids:
+            self._user_ids.update(conn.execute(select(User.id).where(User.id.in_(new_ids))).scalars())
+        if new_emails:
+            for user_id, email in conn.execute(select(User.id, User.email).where(User.email.in_(new_emails))):
+                self._email_ids[email] = user_id
+                self._user_ids.add(user_id)
+        return [i if i is not None else self._email_ids.get(e) for i, e in zip(ids, emails)]
+
+
+def bulk_import(stream, kind, fmt='csv', batch_size=DEFAULT_BATCH_SIZE, hash_workers=None, progress=None,
+                commit_every_batch=None):
+    """Import ``kind`` rows from ``stream`` and return a summary dict."""
+    return BulkImporter(kind, batch_size=batch_size, hash_workers=hash_workers, progress=progress,
+                        commit_every_batch=commit_every_batch).run(stream, fmt)
+
+
+@job_handler('bulk_import')
+def run_bulk_import_job(ctx, path, kind, fmt='csv', batch_size=DEFAULT_BATCH_SIZE):
+    """Background variant: import a spooled upload, reporting progress by bytes read.
+
+    Every batch is committed as it goes, so a retry would insert the
+    committed batches again: enqueue with ``BULK_IMPORT_MAX_ATTEMPTS``. The
+    spool file is removed once the last attempt ends, whether it succeeded,
+    failed or was cancelled.
+    """
+    try:
+        total = os.path.getsize(path) or 1
+        with open(path, 'rb') as f:
+            summary = bulk_import(
+                f, kind, fmt=fmt, batch_size=batch_size, commit_every_batch=True,
+                progress=lambda n: ctx.set_progress(f.tell() / total, f'{n} rows processed'),
+            )
+    finally:
+        if ctx.final_attempt and os.path.exists(path):
+            os.remove(path)
+    enqueue_analytics_refresh(summary)
+    return summary
+
+
+def enqueue_analytics_refresh(summary, created_by=None):
+    """Queue a cube refresh for the days an import added health records to; returns the job or None."""
+    if not summary.get('first_timestamp'):
+        return None
+    return enqueue_refresh(since=datetime.fromisoformat(summary['first_timestamp']),
+                           until=datetime.fromisoformat(summary['last_timestamp']),
+                           created_by=created_by)
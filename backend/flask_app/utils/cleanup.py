@@ -0,0 +1,269 @@
+"""Batched cleanup for admin data-management.
+
+Finds orphaned upload files, reports whose file is gone, old cancelled
+appointments and the data of users deactivated past retention. Every delete
+runs as its own short transaction of at most ``batch_size`` rows with a pause
+in between, so no statement holds locks long enough to stall user traffic.
+"""
+import os
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, delete, or_
+
+from flask_app.models import (
+    db, User, HealthRecord, Appointment, Report, Medicine,
+    DietRecommendation, ExerciseRecommendation, UploadSession,
+)
+from flask_app.utils.blob_store import release_report_files, purge_files, resolve_path, INCOMING_DIR
+from flask_app.utils import resumable_uploads
+from flask_app.utils.jobs import job_handler
+from flask_app.utils.storage import get_storage
+
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_BATCH_PAUSE = 0.05  # seconds between batches
+ORPHAN_GRACE_SECONDS = 3600  # a file is written before its Report row is committed
+SAMPLE_SIZE = 20
+
+CLEANUP_TASKS = ('orphan_files', 'missing_files', 'cancelled_appointments', 'deactivated_users', 'stale_uploads')
+# Resumable upload parts live here until completed; stale_uploads owns them, not orphan_files
+RESUMABLE_PARTS_DIR = f'{INCOMING_DIR}/{resumable_uploads.RESUMABLE_DIR}/'
+
+
+# Tables holding per-user data, deleted before the user row itself
+USER_DATA_MODELS = (HealthRecord, Appointment, Medicine, DietRecommendation, ExerciseRecommendation, Report)
+
+
+class CleanupRunner:
+    """Run one or more cleanup tasks and collect a report."""
+
+    def __init__(self, upload_folder, dry_run=True, batch_size=DEFAULT_BATCH_SIZE,
+                 pause=DEFAULT_BATCH_PAUSE, appointment_retention_days=90,
+                 user_retention_days=365, progress=None):
+        self.upload_folder = upload_folder
+        self.storage = get_storage(upload_folder)
+        self.dry_run = dry_run
+        self.batch_size = max(1, int(batch_size))
+        self.pause = max(0.0, float(pause))
+        self.appointment_retention = timedelta(days=int(appointment_retention_days))
+        self.user_retention = timedelta(days=int(user_retention_days))
+        self.progress = progress
+
+    def run(self, tasks=None):
+        tasks = list(tasks or CLEANUP_TASKS)
+        unknown = [t for t in tasks if t not in CLEANUP_TASKS]
+        if unknown:
+            raise ValueError(f"Unknown cleanup task(s): {', '.join(unknown)}")
+
+        started = time.perf_counter()
+        report = {'dry_run': self.dry_run, 'tasks': {}}
+        for name in tasks:
+            report['tasks'][name] = getattr(self, f'_cleanup_{name}')()
+            db.session.commit()  # close the last read transaction before reporting progress
+            if self.progress:
+                self.progress(name)
+        report['elapsed_seconds'] = round(time.perf_counter() - started, 3)
+        return report
+
+    # ------------------------------------------------------------------
+    # helpers
+    # ------------------------------------------------------------------
+
+    def _sleep(self):
+        if self.pause:
+            time.sleep(self.pause)
+
+    def _commit_batch(self, statement):
+        """Execute one bounded write and commit it immediately."""
+        result = db.session.execute(statement)
+        db.session.commit()
+        self._sleep()
+        return result.rowcount or 0
+
+    def _delete_where(self, model, *criteria):
+        """Delete matching rows ``batch_size`` primary keys at a time."""
+        deleted = 0
+        while True:
+            ids = db.session.execute(
+                select(model.id).where(*criteria).order_by(model.id).limit(self.batch_size)
+            ).scalars().all()
+            if not ids:
+                return deleted
+            deleted += self._commit_batch(delete(model).where(model.id.in_(ids)))
+
+    def _count_where(self, model, *criteria):
+        return db.session.execute(
+            select(db.func.count()).select_from(model).where(*criteria)
+        ).scalar_one()
+
+    def _remove_file(self, relative_path, size):
+        """Delete an upload from storage; returns the bytes freed, or None if it could not be removed."""
+        return size if self.storage.delete(relative_path) else None
+
+    def _file_exists(self, row):
+        if row.content_hash is None:  # not migrated yet: legacy files are always in the local folder
+            return os.path.exists(resolve_path(row.file_path, self.upload_folder))
+        return self.storage.exists(row.file_path)
+
+    # ------------------------------------------------------------------
+    # tasks
+    # ------------------------------------------------------------------
+
+    def _cleanup_orphan_files(self):
+        """Stored files that no Report row points at."""
+        result = {'found': 0, 'deleted': 0, 'bytes': 0, 'sample': []}
+        cutoff = time.time() - ORPHAN_GRACE_SECONDS
+        batch = {}
+
+        def flush():
+            referenced = set(db.session.execute(
+                select(Report.file_path).where(Report.file_path.in_(list(batch)))
+            ).scalars())
+            for rel, size in batch.items():
+                if rel in referenced:
+                    continue
+                result['found'] += 1
+                if len(result['sample']) < SAMPLE_SIZE:
+                    result['sample'].append(rel)
+                if self.dry_run:
+                    result['bytes'] += size
+                    continue
+                freed = self._remove_file(rel, size)
+                if freed is not None:
+                    result['deleted'] += 1
+                    result['bytes'] += freed
+            batch.clear()
+            db.session.rollback()  # release the read snapshot between batches
+            self._sleep()
+
+        for rel, size, mtime in self.storage.iter_keys():
+            if mtime > cutoff or rel.startswith(RESUMABLE_PARTS_DIR):
+                continue
+            batch[rel] = size
+            if len(batch) >= self.batch_size:
+                flush()
+        if batch:
+            flush()
+        return result
+
+    def _cleanup_missing_files(self):
+        """Report rows whose file no longer exists in storage."""
+        result = {'found': 0, 'deleted': 0, 'sample': []}
+        last_id = 0
+        while True:
+            rows = db.session.execute(
+                select(Report.id, Report.file_path, Report.content_hash)
+                .where(Report.id > last_id).order_by(Report.id).limit(self.batch_size)
+            ).all()
+            db.session.rollback()
+            if not rows:
+                return result
+            last_id = rows[-1].id
+            missing = [r for r in rows if not self._file_exists(r)]
+            result['found'] += len(missing)
+            result['sample'].extend(r.id for r in missing[:SAMPLE_SIZE - len(result['sample'])])
+            if missing and not self.dry_run:
+                release_report_files(missing)
+                result['deleted'] += self._commit_batch(delete(Report).where(Report.id.in_([r.id for r in missing])))
+            else:
+                self._sleep()
+
+    def _cleanup_cancelled_appointments(self):
+        """Cancelled appointments older than the retention window."""
+        criteria = (Appointment.status == 'cancelled',
+                    Appointment.appointment_date < datetime.utcnow() - self.appointment_retention)
+        if self.dry_run:
+            return {'found': self._count_where(Appointment, *criteria), 'deleted': 0}
+        deleted = self._delete_where(Appointment, *criteria)
+        return {'found': deleted, 'deleted': deleted}
+
+    def _cleanup_deactivated_users(self):
+        """All data of non-admin users deactivated longer than the retention window."""
+        criteria = (User.is_active.is_(False),
+                    or_(User.role.is_(None), User.role != 'admin'),
+                    User.updated_at < datetime.utcnow() - self.user_retention)
+        result = {'found': 0, 'deleted': 0, 'rows_deleted': {}, 'files_deleted': 0}
+        if self.dry_run:
+            result['found'] = self._count_where(User, *criteria)
+            return result
+
+        while True:
+            user_ids = db.session.execute(
+                select(User.id).where(*criteria).order_by(User.id).limit(self.batch_size)
+            ).scalars().all()
+            if not user_ids:
+                return result
+            result['found'] += len(user_ids)
+
+            while True:  # reports first, releasing their (possibly shared) blobs
+                reports = db.session.execute(
+                    select(Report.id, Report.file_path, Report.content_hash)
+                    .where(Report.user_id.in_(user_ids))
+                    .order_by(Report.id).limit(self.batch_size)
+                ).all()
+                if not reports:
+                    break
+                released = release_report_files(reports)
+                n = self._commit_batch(delete(Report).where(Report.id.in_([r.id for r in reports])))
+                result['rows_deleted']['reports'] = result['rows_deleted'].get('reports', 0) + n
+                result['files_deleted'] += purge_files(self.upload_folder, released)
+
+            while True:  # upload sessions with their part files
+                session_ids = db.session.execute(
+                    select(UploadSession.id).where(UploadSession.user_id.in_(user_ids)).limit(self.batch_size)
+                ).scalars().all()
+                if not session_ids:
+                    break
+                resumable_uploads.remove_sessions(session_ids, self.upload_folder)
+                result['rows_deleted']['upload_sessions'] = (
+                    result['rows_deleted'].get('upload_sessions', 0) + len(session_ids))
+                self._sleep()
+
+            for model in USER_DATA_MODELS:
+                n = self._delete_where(model, model.user_id.in_(user_ids))
+                result['rows_deleted'][model.__tablename__] = result['rows_deleted'].get(model.__tablename__, 0) + n
+            result['deleted'] += self._commit_batch(delete(User).where(User.id.in_(user_ids)))
+
+    def _cleanup_stale_uploads(self):
+        """Resumable upload sessions past their expiry, and part files whose session is gone."""
+        result = {'found': 0, 'deleted': 0, 'bytes': 0}
+        now = datetime.utcnow()
+        if self.dry_run:
+            result['found'] = self._count_where(UploadSession, UploadSession.expires_at < now)
+        else:
+            while True:
+                ids = resumable_uploads.expired_session_ids(now, limit=self.batch_size)
+                if not ids:
+                    break
+                result['found'] += len(ids)
+                result['bytes'] += resumable_uploads.remove_sessions(ids, self.upload_folder)
+                result['deleted'] += len(ids)
+                self._sleep()
+
+        for path in resumable_uploads.stray_part_files(self.upload_folder, time.time() - ORPHAN_GRACE_SECONDS):
+            result['found'] += 1
+            size = os.path.getsize(path)
+            if self.dry_run:
+                result['bytes'] += size
+            elif resumable_uploads.remove_file(path):
+                result['deleted'] += 1
+                result['bytes'] += size
+        return result
+
+
+def run_cleanup(upload_folder, tasks=None, **options):
+    """Run the cleanup tasks (all by default) and return the report dict."""
+    return CleanupRunner(upload_folder, **options).run(tasks)
+
+
+@job_handler('cleanup')
+def run_cleanup_job(ctx, upload_folder, tasks=None, **options):
+    """Background variant of run_cleanup; progress advances per finished task."""
+    tasks = list(tasks or CLEANUP_TASKS)
+    done = []
+
+    def progress(name):
+        done.append(name)
+        ctx.set_progress(len(done) / len(tasks), f'{name} done')
+
+    return CleanupRunner(upload_folder, progress=progress, **options).run(tasks)
@@ -0,0 +1,420 @@
+"""Local background jobs: a durable ``jobs`` table plus a pool of worker processes.
+
+Usage::
+
+    @job_handler('cleanup')
+    def run_cleanup_job(ctx, dry_run=True):
+        ...
+        ctx.set_progress(0.5, 'half way')   # also raises JobCancelled if cancelled
+        return {'deleted': 10}              # stored as the job result
+
+    job = enqueue('cleanup', {'dry_run': False}, created_by=admin_id)
+
+Workers claim jobs with a conditional UPDATE (``status = 'queued'`` -> ``'running'``),
+so any number of processes can poll the same table without a broker. Failed
+jobs are retried with exponential backoff until ``max_attempts``; jobs whose
+worker stopped heart-beating are put back in the queue. Job types listed in
+``PERIODIC_JOBS`` are enqueued by the workers themselves on a fixed interval.
+"""
+import importlib
+import json
+import multiprocessing
+import os
+import random
+import socket
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update, func
+
+from flask_app.models import db, Job
+
+DEFAULT_PRIORITY = 100   # lower runs first
+INTERACTIVE_PRIORITY = 50
+PERIODIC_PRIORITY = 200
+DEFAULT_MAX_ATTEMPTS = 3
+BACKOFF_BASE_SECONDS = 5
+BACKOFF_MAX_SECONDS = 600
+HEARTBEAT_SECONDS = 15
+STALE_AFTER_SECONDS = 120
+POLL_INTERVAL_SECONDS = 1.0
+
+JOB_STATUSES = ('queued', 'running', 'succeeded', 'failed', 'cancelled')
+FINISHED_STATUSES = ('succeeded', 'failed', 'cancelled')
+
+# Modules that register handlers with @job_handler; imported by workers on start
+HANDLER_MODULES = (
+    'flask_app.utils.bulk_import',
+    'flask_app.utils.cleanup',
+    'flask_app.utils.analytics',
+    'flask_app.utils.report_analysis',
+    'flask_app.utils.thumbnails',
+    'flask_app.utils.report_search',
+)
+
+# job type -> (config key holding the interval in seconds, default); 0 disables
+PERIODIC_JOBS = {
+    'refresh_analytics': ('ANALYTICS_REFRESH_SECONDS', 900),
+}
+
+_handlers = {}
+_startup_hooks = []  # (job type, fn)
+
+
+class JobCancelled(Exception):
+    """Raised inside a handler when an admin cancelled the running job."""
+
+
+def job_handler(job_type):
+    """Register ``fn(ctx, **payload)`` as the handler for ``job_type``."""
+    def decorator(fn):
+        _handlers[job_type] = fn
+        return fn
+    return decorator
+
+
+def worker_startup(job_type):
+    """Register ``fn()`` to run (in an app context) when a worker that takes ``job_type`` starts."""
+    def decorator(fn):
+        _startup_hooks.append((job_type, fn))
+        return fn
+    return decorator
+
+
+def run_startup_hooks(app, job_types=None):
+    """Run the startup hooks for ``job_types`` (all of them if None); a failing hook is logged, not fatal."""
+    with app.app_context():
+        for job_type, fn in _startup_hooks:
+            if job_types and job_type not in job_types:
+                continue
+            try:
+                fn()
+            except Exception:
+                traceback.print_exc()
+            finally:
+                db.session.remove()
+
+
+def load_handlers():
+    for module in HANDLER_MODULES:
+        importlib.import_module(module)
+    return dict(_handlers)
+
+
+def _dumps(value):
+    return json.dumps(value, default=str)
+
+
+# ========================
+# PRODUCER SIDE
+# ========================
+
+def enqueue(job_type, payload=None, priority=DEFAULT_PRIORITY, max_attempts=DEFAULT_MAX_ATTEMPTS,
+            created_by=None, run_after=None, commit=True):
+    """Insert a queued job and return it."""
+    job = Job(
+        job_type=job_type,
+        payload=_dumps(payload or {}),
+        status='queued',
+        priority=priority,
+        max_attempts=max_attempts,
+        run_after=run_after or datetime.utcnow(),
+        created_by=created_by,
+    )
+    db.session.add(job)
+    if commit:
+        db.session.commit()
+    return job
+
+
+def cancel(job):
+    """Cancel a queued job now, or ask a running one to stop. Returns False if already finished."""
+    if job.status in FINISHED_STATUSES:
+        return False
+    if job.status == 'queued':
+        job.status = 'cancelled'
+        job.finished_at = datetime.utcnow()
+    job.cancel_requested = True
+    db.session.commit()
+    return True
+
+
+def queue_depths():
+    """``{status: count}`` for every job status, plus queued counts per job type."""
+    counts = dict.fromkeys(JOB_STATUSES, 0)
+    for status, n in db.session.execute(select(Job.status, func.count()).group_by(Job.status)):
+        counts[status] = n
+    by_type = dict(db.session.execute(
+        select(Job.job_type, func.count()).where(Job.status == 'queued').group_by(Job.job_type)
+    ).all())
+    return {'by_status': counts, 'queued_by_type': by_type}
+
+
+# ========================
+# WORKER SIDE
+# ========================
+
+class JobContext:
+    """Handed to handlers for progress reporting and cooperative cancellation."""
+
+    def __init__(self, job_id, attempt, worker_id, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        self.job_id = job_id
+        self.attempt = attempt
+        self.worker_id = worker_id
+        self.max_attempts = max_attempts
+
+    @property
+    def final_attempt(self):
+        """True when a failure now will not be retried."""
+        return self.attempt >= self.max_attempts
+
+    def cancelled(self):
+        with db.engine.connect() as conn:
+            return bool(conn.execute(
+                select(Job.cancel_requested).where(Job.id == self.job_id)
+            ).scalar())
+
+    def set_progress(self, fraction, message=None):
+        """Record progress (0..1) on its own connection; raises JobCancelled if requested."""
+        with db.engine.begin() as conn:
+            conn.execute(
+                update(Job).where(Job.id == self.job_id).values(
+                    progress=max(0.0, min(1.0, float(fraction))),
+                    progress_message=(message or '')[:255] or None,
+                    heartbeat_at=datetime.utcnow(),
+                )
+            )
+        if self.cancelled():
+            raise JobCancelled()
+
+
+def backoff_seconds(attempts):
+    """Exponential backoff with jitter for the given number of failed attempts."""
+    delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** max(0, attempts - 1))
+    return delay * random.uniform(0.8, 1.2)
+
+
+def claim_next(worker_id, job_types=None):
+    """Atomically claim the highest-priority runnable job (of ``job_types``, if given), or return None."""
+    now = datetime.utcnow()
+    criteria = [Job.status == 'queued', Job.run_after <= now]
+    if job_types:
+        criteria.append(Job.job_type.in_(list(job_types)))
+    for _ in range(5):  # lose a race -> try the next candidate
+        job_id = db.session.execute(
+            select(Job.id)
+            .where(*criteria)
+            .order_by(Job.priority, Job.run_after, Job.id)
+            .limit(1)
+        ).scalar()
+        if job_id is None:
+            db.session.rollback()
+            return None
+        claimed = db.session.execute(
+            update(Job)
+            .where(Job.id == job_id, Job.status == 'queued')
+            .values(status='running', worker_id=worker_id, started_at=now,
+                    heartbeat_at=now, attempts=Job.attempts + 1, error=None)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+        if claimed == 1:
+            return db.session.get(Job, job_id)
+    return None
+
+
+def _finish(job_id, **values):
+    values.setdefault('finished_at', datetime.utcnow())
+    db.session.execute(update(Job).where(Job.id == job_id).values(**values)
+                       .execution_options(synchronize_session=False))
+    db.session.commit()
+
+
+def run_job(job, worker_id='inline'):
+    """Run one claimed job to completion and record the outcome."""
+    job_id, attempts, max_attempts = job.id, job.attempts, job.max_attempts
+    handler = load_handlers().get(job.job_type)
+    payload = json.loads(job.payload) if job.payload else {}
+    db.session.rollback()  # handlers start from a clean session
+
+    if handler is None:
+        _finish(job_id, status='failed', error=f'No handler registered for {job.job_type!r}')
+        return
+    try:
+        result = handler(JobContext(job_id, attempts, worker_id, max_attempts), **payload)
+        _finish(job_id, status='succeeded', progress=1.0, result=_dumps(result))
+    except JobCancelled:
+        db.session.rollback()
+        _finish(job_id, status='cancelled')
+    except Exception as e:
+        db.session.rollback()
+        error = f'{type(e).__name__}: {e}\n{traceback.format_exc(limit=5)}'
+        if attempts < max_attempts:
+            _finish(job_id, status='queued', finished_at=None, error=error, worker_id=None,
+                    run_after=datetime.utcnow() + timedelta(seconds=backoff_seconds(attempts)))
+        else:
+            _finish(job_id, status='failed', error=error)
+
+
+def requeue_stale_jobs():
+    """Requeue running jobs whose worker stopped heart-beating (or fail them if out of attempts)."""
+    now = datetime.utcnow()
+    stale = (Job.status == 'running', Job.heartbeat_at < now - timedelta(seconds=STALE_AFTER_SECONDS))
+    error = 'Worker stopped responding'
+    failed = db.session.execute(
+        update(Job).where(*stale, Job.attempts >= Job.max_attempts)
+        .values(status='failed', finished_at=now, error=error)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    requeued = db.session.execute(
+        update(Job).where(*stale)
+        .values(status='queued', worker_id=None, run_after=now, error=f'{error}; requeued')
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    return requeued + failed
+
+
+def schedule_periodic_jobs(config):
+    """Enqueue each PERIODIC_JOBS type that has nothing pending and was last queued over its interval ago."""
+    now = datetime.utcnow()
+    scheduled = []
+    for job_type, (key, default) in PERIODIC_JOBS.items():
+        interval = int(config.get(key, default) or 0)
+        if interval <= 0:
+            continue
+        pending = db.session.execute(
+            select(Job.id).where(Job.job_type == job_type, Job.status.in_(('queued', 'running'))).limit(1)
+        ).scalar()
+        last = db.session.execute(
+            select(Job.created_at).where(Job.job_type == job_type).order_by(Job.id.desc()).limit(1)
+        ).scalar()
+        if pending is None and (last is None or last <= now - timedelta(seconds=interval)):
+            enqueue(job_type, priority=PERIODIC_PRIORITY, max_attempts=1, commit=False)
+            scheduled.append(job_type)
+    db.session.commit()
+    return scheduled
+
+
+class _Heartbeat(threading.Thread):
+    """Keeps ``heartbeat_at`` fresh for whichever job this worker is running."""
+
+    def __init__(self, app):
+        super().__init__(daemon=True)
+        self.app = app
+        self.job_id = None
+        self.stop = threading.Event()
+
+    def run(self):
+        while not self.stop.wait(HEARTBEAT_SECONDS):
+            job_id = self.job_id
+            if job_id is None:
+                continue
+            try:
+                with self.app.app_context(), db.engine.begin() as conn:
+                    conn.execute(update(Job).where(Job.id == job_id, Job.status == 'running')
+                                 .values(heartbeat_at=datetime.utcnow()))
+            except Exception:
+                pass
+
+
+def worker_loop(app, worker_id=None, stop_event=None, poll_interval=POLL_INTERVAL_SECONDS, max_jobs=None,
+                job_types=None):
+    """Claim and run jobs until ``stop_event`` is set (or ``max_jobs`` have run).
+
+    ``job_types`` restricts the worker to those types, e.g. a dedicated pool
+    for model inference whose processes keep the model loaded between jobs.
+    Startup hooks for those types (``@worker_startup``) run before the first claim.
+    """
+    worker_id = worker_id or f'{socket.gethostname()}:{os.getpid()}'
+    stop_event = stop_event or threading.Event()
+    heartbeat = _Heartbeat(app)
+    heartbeat.start()
+    load_handlers()
+    run_startup_hooks(app, job_types)
+    done = 0
+    last_sweep = 0.0
+    try:
+        while not stop_event.is_set():
+            with app.app_context():
+                if time.monotonic() - last_sweep > STALE_AFTER_SECONDS / 2:
+                    requeue_stale_jobs()
+                    schedule_periodic_jobs(app.config)
+                    last_sweep = time.monotonic()
+                job = claim_next(worker_id, job_types)
+                if job is None:
+                    db.session.remove()
+                    stop_event.wait(poll_interval)
+                    continue
+                heartbeat.job_id = job.id
+                try:
+                    run_job(job, worker_id)
+                finally:
+                    heartbeat.job_id = None
+                    db.session.remove()
+            done += 1
+            if max_jobs and done >= max_jobs:
+                break
+    finally:
+        heartbeat.stop.set()
+
+
+def _worker_main(worker_index, stop_event, job_types=None, threads=1):
+    """Entry point of a spawned worker process: build its own app and poll.
+
+    With ``threads`` > 1 the process runs that many polling loops, which share
+    its resident models (concurrent inference calls are micro-batched).
+    """
+    from flask_app import create_flask_app
+    app = create_flask_app()
+    base_id = f'{socket.gethostname()}:{os.getpid()}:{worker_index}'
+    extra = [threading.Thread(target=worker_loop, args=(app, f'{base_id}.{t}', stop_event),
+                              kwargs={'job_types': job_types}, daemon=True)
+             for t in range(1, threads)]
+    for thread in extra:
+        thread.start()
+    worker_loop(app, base_id if threads == 1 else f'{base_id}.0', stop_event, job_types=job_types)
+    for thread in extra:
+        thread.join()
+
+
+class WorkerPool:
+    """A set of worker processes started next to the web server."""
+
+    def __init__(self, num_workers, job_types=None, threads=1):
+        self.num_workers = num_workers
+        self.job_types = tuple(job_types) if job_types else None
+        self.threads = max(1, int(threads))
+        self._ctx = multiprocessing.get_context('spawn')
+        self.stop_event = self._ctx.Event()
+        self.processes = []
+
+    def start(self):
+        for i in range(self.num_workers):
+            p = self._ctx.Process(target=_worker_main, args=(i, self.stop_event, self.job_types, self.threads),
+                                  name=f'job-worker-{i}', daemon=True)
+            p.start()
+            self.processes.append(p)
+        return self
+
+    def stop(self, timeout=10):
+        self.stop_event.set()
+        for p in self.processes:
+            p.join(timeout)
+            if p.is_alive():
+                p.terminate()
+        self.processes = []
+
+
+def start_worker_pool(num_workers=None, job_types=None, threads=None):
+    """Start ``JOB_WORKERS`` (default 2) worker processes of ``JOB_WORKER_THREADS`` (default 1)
+    polling threads each; returns the pool or None if 0."""
+    if num_workers is None:
+        num_workers = int(os.getenv('JOB_WORKERS', 2))
+    if threads is None:
+        threads = int(os.getenv('JOB_WORKER_THREADS', 1))
+    if num_workers <= 0:
+        return None
+    return WorkerPool(num_workers, job_types, threads).start()
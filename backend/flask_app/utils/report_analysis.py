@@ -0,0 +1,241 @@
+"""Report analysis as a background job.
+
+``POST /api/reports/<id>/analyze`` only enqueues an ``analyze_report`` job and
+returns 202; a worker moves the report ``queued -> analyzing -> analyzed`` (or
+``analysis_failed`` once retries are exhausted). The CNN detector comes from
+the process-wide model registry (ai_models/registry.py): workers that run
+``analyze_report`` load and warm it up when they start, so no job pays for
+loading TensorFlow and the model.
+
+Results are stored as JSON tagged with the model version and the SHA-256 of
+the input. CNN results are also kept in ``analysis_cache`` keyed by
+(content hash, model version): analysing the same file again under the same
+model copies the cached result, without a job when it is already there.
+"""
+import ast
+import hashlib
+import importlib.util
+import os
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+
+from ai_models import registry
+from flask_app.models import db, Report, AnalysisCache
+from flask_app.utils.jobs import job_handler, worker_startup, enqueue, INTERACTIVE_PRIORITY
+from flask_app.utils.storage import get_storage
+
+IMAGE_EXTENSIONS = {'jpg', 'jpeg', 'png'}
+PENDING_STATUSES = ('queued', 'analyzing')
+PRELIMINARY_MODEL_VERSION = 'preliminary-1'  # bump when preliminary_analysis() changes
+
+_model_versions = {}  # (path, size, mtime_ns) -> version
+
+
+def cnn_model_path():
+    """The CNN artifact served under MODEL_RUNTIME (the .h5 file, or its .tflite export)."""
+    cfg = current_app.config
+    return registry.model_file(cfg.get('MODEL_PATH', ''), 'cnn_detector', cfg.get('MODEL_RUNTIME', 'keras'))[1]
+
+
+def cnn_model_version():
+    """``cnn-<first 16 hex digits of the model file's SHA-256>``; None if the file is missing.
+
+    Hashed once per process and again only when the file's size or mtime changes.
+    """
+    path = cnn_model_path()
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    key = (path, st.st_size, st.st_mtime_ns)
+    if key not in _model_versions:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        _model_versions[key] = f'cnn-{digest.hexdigest()[:16]}'
+    return _model_versions[key]
+
+
+def get_detector():
+    """The process-wide CNNDiseaseDetector from the model registry, loaded and warmed up on first call."""
+    cfg = current_app.config
+    registry.register_defaults(cfg.get('MODEL_PATH', ''), cfg.get('MODEL_RUNTIME', 'keras'),
+                               cfg.get('INFERENCE_MAX_BATCH_SIZE', 0), cfg.get('INFERENCE_MAX_WAIT_MS', 0),
+                               cfg.get('TENSOR_CACHE_FOLDER'), cfg.get('TENSOR_CACHE_MAX_BYTES', 0))
+    return registry.get('cnn_detector')
+
+
+@worker_startup('analyze_report')
+def preload_detector():
+    """Load the CNN when an inference worker starts, so its first job is as fast as the rest."""
+    if not current_app.config.get('PRELOAD_MODELS', True):
+        return
+    if importlib.util.find_spec('tensorflow') is None and not os.path.exists(cnn_model_path()):
+        print('TensorFlow is not installed and no exported model exists; skipping CNN preload')
+        return
+    get_detector()
+
+
+def is_image(report):
+    name = report.original_filename or report.file_path
+    return '.' in name and name.rsplit('.', 1)[1].lower() in IMAGE_EXTENSIONS
+
+
+def preliminary_analysis(report):
+    """Placeholder summary for documents the image model does not handle."""
+    return {
+        'report_type': report.report_type,
+        'analysis': f'Preliminary analysis of {report.report_type}',
+        'findings': [
+            'All values within normal range',
+            'No abnormalities detected',
+            'Recommend follow-up in 6 months'
+        ],
+        'recommendations': [
+            'Continue current lifestyle',
+            'Maintain regular check-ups',
+            'Monitor for any changes'
+        ],
+        'confidence_score': 0.92
+    }
+
+
+# ========================
+# RESULT CACHE
+# ========================
+
+def lookup_cache(content_hash, model_version):
+    """Cached detector output for this input and model, counting the hit; None on a miss."""
+    if not content_hash or not model_version:
+        return None
+    entry = db.session.execute(
+        select(AnalysisCache.id, AnalysisCache.result)
+        .where(AnalysisCache.content_hash == content_hash, AnalysisCache.model_version == model_version)
+    ).first()
+    if entry is None:
+        return None
+    db.session.execute(update(AnalysisCache).where(AnalysisCache.id == entry.id)
+                       .values(hits=AnalysisCache.hits + 1, last_used_at=datetime.utcnow())
+                       .execution_options(synchronize_session=False))
+    return dict(entry.result)
+
+
+def store_cache(content_hash, model_version, result):
+    """Remember detector output and commit; a concurrent insert of the same key wins."""
+    if not content_hash or not model_version:
+        return
+    try:
+        db.session.add(AnalysisCache(
+            content_hash=content_hash,
+            model_version=model_version,
+            result=result,
+            classification=result.get('classification'),
+            confidence=result.get('confidence'),
+        ))
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+
+
+# ========================
+# ANALYSIS
+# ========================
+
+def analyze(report, upload_folder):
+    """Analyse one report; returns ``(result, model_version)``.
+
+    CNN output comes from the cache when this file was already analysed by the
+    same model version, and is added to it otherwise.
+    """
+    if not is_image(report):
+        return preliminary_analysis(report), PRELIMINARY_MODEL_VERSION
+    version = cnn_model_version()
+    result = lookup_cache(report.content_hash, version)
+    if result is None:
+        detector = get_detector()
+        with get_storage(upload_folder).as_local_file(report.file_path) as path:
+            result = detector.detect_disease(path, content_hash=report.content_hash)
+        if 'error' in result:
+            raise RuntimeError(result['error'])
+        version = version or cnn_model_version()
+        store_cache(report.content_hash, version, result)
+    result['report_type'] = report.report_type
+    result['confidence_score'] = result['confidence']
+    return result, version
+
+
+def analysis_values(result, model_version, content_hash):
+    """Report column values for a finished analysis."""
+    document = dict(result, model_version=model_version, input_sha256=content_hash,
+                    analyzed_at=datetime.utcnow().isoformat())
+    return {
+        'ai_analysis': document,
+        'ai_classification': document.get('classification'),
+        'ai_confidence': document.get('confidence_score'),
+        'analysis_model_version': model_version,
+    }
+
+
+def apply_cached_analysis(report):
+    """Fill in ``report`` from the cache without queueing a job; True on a hit. The caller commits."""
+    if not is_image(report) or not report.content_hash:
+        return False
+    version = cnn_model_version()
+    result = lookup_cache(report.content_hash, version)
+    if result is None:
+        return False
+    result['report_type'] = report.report_type
+    result['confidence_score'] = result['confidence']
+    for column, value in analysis_values(result, version, report.content_hash).items():
+        setattr(report, column, value)
+    report.status = 'analyzed'
+    return True
+
+
+def parse_analysis(value):
+    """``Report.ai_analysis`` as a dict; legacy rows hold a Python repr, parsed back when it is a plain literal."""
+    if not value or isinstance(value, dict):
+        return value or None
+    try:
+        parsed = ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        return value
+    return parsed if isinstance(parsed, dict) else value
+
+
+def enqueue_analysis(report, created_by=None):
+    """Queue ``report`` for analysis and mark it ``queued``; the caller commits."""
+    job = enqueue('analyze_report', {'report_id': report.id}, priority=INTERACTIVE_PRIORITY,
+                  created_by=created_by, commit=False)
+    db.session.flush()
+    report.status = 'queued'
+    report.analysis_job_id = job.id
+    return job
+
+
+def _set_status(report_id, status, **values):
+    db.session.execute(update(Report).where(Report.id == report_id).values(status=status, **values)
+                       .execution_options(synchronize_session=False))
+    db.session.commit()
+
+
+@job_handler('analyze_report')
+def run_analyze_report_job(ctx, report_id):
+    report = db.session.get(Report, report_id)
+    if report is None:
+        return {'report_id': report_id, 'skipped': 'report deleted'}
+    db.session.rollback()  # end the read before progress writes on another connection
+    ctx.set_progress(0.1, 'analyzing')  # raises JobCancelled before the report is touched
+    _set_status(report_id, 'analyzing')
+    try:
+        result, version = analyze(report, current_app.config['UPLOAD_FOLDER'])
+    except Exception:
+        db.session.rollback()
+        _set_status(report_id, 'analysis_failed' if ctx.final_attempt else 'queued')
+        raise
+    _set_status(report_id, 'analyzed', **analysis_values(result, version, report.content_hash))
+    return {'report_id': report_id, 'status': 'analyzed', 'model_version': version}
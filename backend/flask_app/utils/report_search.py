@@ -0,0 +1,329 @@
+"""Full-text search over report descriptions and the text of uploaded documents.
+
+A background ``extract_text`` job reads txt / pdf / docx uploads and writes one
+search document per report:
+
+* SQLite: FTS5 table ``report_fts`` whose rowid is the report id, ranked with
+  bm25 and highlighted with ``snippet()``. The owner is an indexed
+  ``owner`` token, so a user's search is an index intersection rather than a
+  filter over every match.
+* MySQL: table ``report_search`` with a FULLTEXT index, ranked by
+  ``MATCH ... AGAINST`` (see database/schema.sql).
+
+Deleting a report removes its document (trigger on SQLite, FK cascade on MySQL).
+Text extracted for one upload is reused for every report with the same content hash.
+"""
+import html
+import io
+import re
+import zipfile
+from datetime import datetime
+from xml.etree import ElementTree
+
+from flask import current_app
+from sqlalchemy import select, text
+
+from flask_app.models import db, Report
+from flask_app.utils.jobs import job_handler, enqueue
+from flask_app.utils.storage import get_storage
+
+try:
+    import pypdfium2 as pdfium
+except ImportError:  # optional; PDFs are indexed by description only without it
+    pdfium = None
+
+MAX_TEXT_CHARS = 1_000_000  # per report
+MAX_RESULTS = 50  # per page
+SNIPPET_TOKENS = 16
+HIGHLIGHT_OPEN, HIGHLIGHT_CLOSE = '\x02', '\x03'  # swapped for <mark> after HTML-escaping
+
+_WORD = re.compile(r'\w+', re.UNICODE)
+_DOCX_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+
+
+# ========================
+# EXTRACTION
+# ========================
+
+def _extract_txt(path):
+    with open(path, 'rb') as f:
+        raw = f.read(MAX_TEXT_CHARS * 4)
+    return raw.decode('utf-8', errors='replace')
+
+
+def _extract_pdf(path):
+    if pdfium is None:
+        return ''
+    pdf = pdfium.PdfDocument(path)
+    try:
+        parts, total = [], 0
+        for page in pdf:
+            page_text = page.get_textpage().get_text_range()
+            parts.append(page_text)
+            total += len(page_text)
+            if total >= MAX_TEXT_CHARS:
+                break
+        return '\n'.join(parts)
+    finally:
+        pdf.close()
+
+
+def _extract_docx(path):
+    with zipfile.ZipFile(path) as z, z.open('word/document.xml') as f:
+        paragraphs = []
+        for _, el in ElementTree.iterparse(io.BufferedReader(f)):
+            if el.tag == f'{_DOCX_NS}p':
+                paragraphs.append(''.join(t.text or '' for t in el.iter(f'{_DOCX_NS}t')))
+                el.clear()
+        return '\n'.join(paragraphs)
+
+
+EXTRACTORS = {'txt': _extract_txt, 'pdf': _extract_pdf, 'docx': _extract_docx}
+
+
+def extract_text(path, filename):
+    """Plain text of a txt / pdf / docx upload ('' for anything else)."""
+    ext = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    extractor = EXTRACTORS.get(ext)
+    if extractor is None:
+        return ''
+    content = extractor(path)
+    return re.sub(r'\s+', ' ', content)[:MAX_TEXT_CHARS].strip()
+
+
+# ========================
+# INDEX BACKENDS
+# ========================
+
+def fts_query(q):
+    """User input -> safe FTS5 query over the text columns: every word must match, the last one as a prefix."""
+    words = _WORD.findall(q)
+    if not words:
+        return None
+    last = f'"{words[-1]}"*' if len(words[-1]) > 1 else f'"{words[-1]}"'
+    terms = [f'"{w}"' for w in words[:-1]] + [last]
+    return '{report_type description body} : (' + ' '.join(terms) + ')'
+
+
+def _highlight(snippet):
+    return html.escape(snippet).replace(HIGHLIGHT_OPEN, '<mark>').replace(HIGHLIGHT_CLOSE, '</mark>')
+
+
+class SqliteFtsIndex:
+    """FTS5 document per report, rowid = report id."""
+
+    def ensure(self, conn):
+        conn.exec_driver_sql(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS report_fts USING fts5("
+            "owner, report_type, description, body, content_hash UNINDEXED, upload_date UNINDEXED, "
+            "tokenize='porter unicode61', prefix='2 3 4')"  # prefix indexes keep type-ahead queries fast
+        )
+        conn.exec_driver_sql(
+            "CREATE TRIGGER IF NOT EXISTS reports_fts_delete AFTER DELETE ON reports BEGIN "
+            "DELETE FROM report_fts WHERE rowid = old.id; END"
+        )
+
+    def indexed_ids(self):
+        return set(db.session.execute(text("SELECT rowid FROM report_fts")).scalars())
+
+    def body_for_hash(self, content_hash):
+        # content_hash is UNINDEXED in FTS5: find a donor through ix_reports_content_hash, then read its row by rowid
+        return db.session.execute(text(
+            "SELECT f.body FROM reports r CROSS JOIN report_fts f ON f.rowid = r.id "
+            "WHERE r.content_hash = :h LIMIT 1"
+        ), {'h': content_hash}).scalar()
+
+    def upsert(self, doc):
+        doc = dict(doc, upload_date=doc['upload_date'].isoformat())  # compared as text by the date filters
+        db.session.execute(text("DELETE FROM report_fts WHERE rowid = :report_id"), doc)
+        db.session.execute(text(
+            "INSERT INTO report_fts (rowid, owner, report_type, description, body, content_hash, upload_date) "
+            "VALUES (:report_id, :owner, :report_type, :description, :body, :content_hash, :upload_date)"
+        ), doc)
+
+    def search(self, q, user_id=None, report_type=None, date_from=None, date_to=None,
+               limit=20, offset=0):
+        match = fts_query(q)
+        if match is None:
+            return []
+        if user_id is not None:
+            match = f'owner:"u{int(user_id)}" AND {match}'
+        criteria, params = ['report_fts MATCH :match'], {'match': match, 'limit': limit, 'offset': offset}
+        if report_type:
+            criteria.append('report_type = :report_type')
+            params['report_type'] = report_type
+        if date_from:
+            criteria.append('upload_date >= :date_from')
+            params['date_from'] = date_from.isoformat()
+        if date_to:
+            criteria.append('upload_date < :date_to')
+            params['date_to'] = date_to.isoformat()
+        rows = db.session.execute(text(
+            "SELECT rowid AS report_id, bm25(report_fts, 0, 2.0, 3.0, 1.0) AS rank, "
+            f"snippet(report_fts, 2, '{HIGHLIGHT_OPEN}', '{HIGHLIGHT_CLOSE}', '…', {SNIPPET_TOKENS}) AS description_hit, "
+            f"snippet(report_fts, 3, '{HIGHLIGHT_OPEN}', '{HIGHLIGHT_CLOSE}', '…', {SNIPPET_TOKENS}) AS body_hit "
+            f"FROM report_fts WHERE {' AND '.join(criteria)} "
+            "ORDER BY rank LIMIT :limit OFFSET :offset"
+        ), params).all()
+        return [{
+            'report_id': r.report_id,
+            'score': round(-r.rank, 4),  # bm25 is lower-is-better
+            'highlight': _highlight(r.body_hit if HIGHLIGHT_OPEN in (r.body_hit or '') else r.description_hit or ''),
+        } for r in rows]
+
+
+class MysqlFulltextIndex:
+    """``report_search`` row per report with a FULLTEXT(description, body) index."""
+
+    def ensure(self, conn):
+        conn.exec_driver_sql(
+            "CREATE TABLE IF NOT EXISTS report_search ("
+            "report_id INT PRIMARY KEY, user_id INT NOT NULL, report_type VARCHAR(120), "
+            "upload_date DATETIME, content_hash CHAR(64), description TEXT, body MEDIUMTEXT, "
+            "INDEX ix_report_search_user (user_id), INDEX ix_report_search_hash (content_hash), "
+            "FULLTEXT INDEX ft_report_search (description, body), "
+            "FOREIGN KEY (report_id) REFERENCES reports(id) ON DELETE CASCADE"
+            ") ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci"
+        )
+
+    def indexed_ids(self):
+        return set(db.session.execute(text("SELECT report_id FROM report_search")).scalars())
+
+    def body_for_hash(self, content_hash):
+        return db.session.execute(
+            text("SELECT body FROM report_search WHERE content_hash = :h LIMIT 1"), {'h': content_hash}
+        ).scalar()
+
+    def upsert(self, doc):
+        db.session.execute(text(
+            "REPLACE INTO report_search (report_id, user_id, report_type, upload_date, content_hash, description, body) "
+            "VALUES (:report_id, :user_id, :report_type, :upload_date, :content_hash, :description, :body)"
+        ), doc)
+
+    def search(self, q, user_id=None, report_type=None, date_from=None, date_to=None,
+               limit=20, offset=0):
+        words = _WORD.findall(q)
+        if not words:
+            return []
+        criteria = ['MATCH(description, body) AGAINST (:q IN NATURAL LANGUAGE MODE)']
+        params = {'q': ' '.join(words), 'limit': limit, 'offset': offset}
+        if user_id is not None:
+            criteria.append('user_id = :user_id')
+            params['user_id'] = int(user_id)
+        if report_type:
+            criteria.append('report_type = :report_type')
+            params['report_type'] = report_type
+        if date_from:
+            criteria.append('upload_date >= :date_from')
+            params['date_from'] = date_from
+        if date_to:
+            criteria.append('upload_date < :date_to')
+            params['date_to'] = date_to
+        rows = db.session.execute(text(
+            "SELECT report_id, MATCH(description, body) AGAINST (:q IN NATURAL LANGUAGE MODE) AS score, "
+            "description, SUBSTRING(body, 1, 20000) AS body "
+            f"FROM report_search WHERE {' AND '.join(criteria)} "
+            "ORDER BY score DESC LIMIT :limit OFFSET :offset"
+        ), params).all()
+        return [{
+            'report_id': r.report_id,
+            'score': round(float(r.score), 4),
+            'highlight': _highlight(make_snippet(r.body, words) or make_snippet(r.description, words)),
+        } for r in rows]
+
+
+def make_snippet(content, words, radius=80):
+    """Window of ``content`` around the first matching word, with matches marked."""
+    if not content:
+        return ''
+    pattern = re.compile(r'\b(' + '|'.join(re.escape(w) for w in words) + r')', re.IGNORECASE)
+    first = pattern.search(content)
+    if first is None:
+        return ''
+    start, end = max(0, first.start() - radius), min(len(content), first.end() + radius)
+    window = content[start:end]
+    marked = pattern.sub(lambda m: f'{HIGHLIGHT_OPEN}{m.group(0)}{HIGHLIGHT_CLOSE}', window)
+    return ('…' if start else '') + marked + ('…' if end < len(content) else '')
+
+
+_BACKENDS = {'sqlite': SqliteFtsIndex(), 'mysql': MysqlFulltextIndex()}
+
+
+def get_index():
+    backend = _BACKENDS.get(db.engine.dialect.name)
+    if backend is None:
+        raise RuntimeError(f'Full-text search is not supported on {db.engine.dialect.name}')
+    return backend
+
+
+def ensure_index():
+    """Create the search table (and SQLite delete trigger) if missing; called at app start-up."""
+    backend = _BACKENDS.get(db.engine.dialect.name)
+    if backend is not None:
+        with db.engine.begin() as conn:
+            backend.ensure(conn)
+
+
+# ========================
+# INDEXING
+# ========================
+
+def index_report(report, upload_folder, body=None):
+    """Extract (or reuse) the report's text and write its search document; the caller commits."""
+    index = get_index()
+    if body is None and report.content_hash:
+        body = index.body_for_hash(report.content_hash)
+    if body is None:
+        storage = get_storage(upload_folder)
+        body = ''
+        if storage.exists(report.file_path):
+            with storage.as_local_file(report.file_path) as path:
+                body = extract_text(path, report.original_filename or report.file_path)
+    index.upsert({
+        'report_id': report.id,
+        'owner': f'u{report.user_id}',
+        'user_id': report.user_id,
+        'report_type': report.report_type or '',
+        'upload_date': report.upload_date or datetime.utcnow(),
+        'content_hash': report.content_hash,
+        'description': report.description or '',
+        'body': body,
+    })
+    return len(body)
+
+
+def backfill(upload_folder, reindex=False, batch_size=500, progress=None):
+    """Index reports inline (all of them with ``reindex``, else only those missing); returns the count."""
+    skip = set() if reindex else get_index().indexed_ids()
+    ids = [i for i in db.session.execute(select(Report.id).order_by(Report.id)).scalars() if i not in skip]
+    for start in range(0, len(ids), batch_size):
+        for report in Report.query.filter(Report.id.in_(ids[start:start + batch_size])):
+            index_report(report, upload_folder)
+        db.session.commit()
+        if progress:
+            progress(min(start + batch_size, len(ids)), len(ids))
+    return len(ids)
+
+
+def enqueue_indexing(report, created_by=None):
+    return enqueue('extract_text', {'report_id': report.id}, created_by=created_by)
+
+
+@job_handler('extract_text')
+def run_extract_text_job(ctx, report_id):
+    report = db.session.get(Report, report_id)
+    if report is None:
+        return {'report_id': report_id, 'skipped': 'report deleted'}
+    chars = index_report(report, current_app.config['UPLOAD_FOLDER'])
+    db.session.commit()
+    return {'report_id': report_id, 'chars': chars}
+
+
+def search_reports(q, user_id=None, **filters):
+    """Ranked, highlighted hits joined with their reports; ``user_id=None`` searches everyone's."""
+    hits = get_index().search(q, user_id=user_id, **filters)
+    if not hits:
+        return []
+    reports = {r.id: r for r in Report.query.filter(Report.id.in_([h['report_id'] for h in hits]))}
+    return [dict(hit, report=reports[hit['report_id']].to_dict())
+            for hit in hits if hit['report_id'] in reports]
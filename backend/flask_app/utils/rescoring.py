@@ -0,0 +1,154 @@
+"""Bulk re-analysis of historical images after a model change.
+
+Two passes, run from ``rescore_reports.py``:
+
+``build_dataset`` decodes and preprocesses every distinct image blob once
+and packs the tensors into memory-mapped shard files
+(ai_models/shards.py). That is the slow, I/O-bound part and it does not
+depend on the model, so one dataset serves every later model version.
+
+``rescore`` streams the shards through the CNN in fixed-size batches (one
+shape, no retracing), then writes the results back per batch: one
+executemany UPDATE for every report sharing those images, and the
+``analysis_cache`` rows for the new model version, in one short
+transaction per batch. Only the analysis columns change; a report's
+status moves to 'analyzed' only if it had no finished analysis, so admin
+review decisions survive. Reports already at the current model version,
+and reports an analyze job is working on, are left alone.
+"""
+import time
+from contextlib import ExitStack
+
+import numpy as np
+from sqlalchemy import select, update, insert
+from sqlalchemy.exc import IntegrityError
+
+from ai_models.preprocessing import PreprocessPipeline
+from ai_models.shards import ShardWriter, ShardDataset, DEFAULT_SHARD_SIZE
+from flask_app.models import db, Report, AnalysisCache
+from flask_app.utils.report_analysis import (
+    PENDING_STATUSES, analysis_values, cnn_model_version, get_detector, is_image,
+)
+from flask_app.utils.storage import get_storage
+
+DEFAULT_BATCH_SIZE = 64
+SCAN_SIZE = 1024  # report rows read per query while building
+UNANALYZED_STATUSES = ('uploaded', 'analysis_failed', 'analysis_cancelled')  # become 'analyzed' once rescored
+
+
+def _image_blobs(after, limit=SCAN_SIZE):
+    """``(hashes, file paths, last hash)`` of image blobs with content hash > ``after``; last is None when done."""
+    rows = db.session.execute(
+        select(Report.content_hash, Report.file_path, Report.original_filename)
+        .where(Report.content_hash > after)
+        .order_by(Report.content_hash).limit(limit)
+    ).all()
+    db.session.rollback()
+    if not rows:
+        return [], [], None
+    seen = {}
+    for row in rows:
+        if row.content_hash not in seen and is_image(row):
+            seen[row.content_hash] = row.file_path
+    return list(seen), list(seen.values()), rows[-1].content_hash
+
+
+def _local_file(stack, storage, key):
+    try:
+        return stack.enter_context(storage.as_local_file(key))
+    except Exception as e:  # missing object: left for the missing_files cleanup task
+        print(f'Skipping {key}: {e}')
+        return None
+
+
+def build_dataset(out_dir, upload_folder, shard_size=DEFAULT_SHARD_SIZE, batch_size=DEFAULT_BATCH_SIZE,
+                  workers=None, progress=None):
+    """Preprocess every distinct image blob into a shard dataset at ``out_dir``; returns stats."""
+    storage = get_storage(upload_folder)
+    writer = ShardWriter(out_dir, shard_size)
+    pipeline = PreprocessPipeline(batch_size, workers)
+    stats = {'images': 0, 'unreadable': 0}
+    started = time.perf_counter()
+    after = ''
+    try:
+        while True:
+            hashes, keys, after = _image_blobs(after)
+            if after is None:
+                break
+            with ExitStack() as stack:  # S3 downloads live until their batch is written
+                paths = [_local_file(stack, storage, key) for key in keys]
+                found = [i for i, path in enumerate(paths) if path]
+                stats['unreadable'] += len(paths) - len(found)
+                done = 0
+                for chunk, buffer, ok in pipeline.batches([paths[i] for i in found]):
+                    rows = [i for i, flag in enumerate(ok) if flag]
+                    writer.add_batch([hashes[found[done + i]] for i in rows], buffer[rows])
+                    stats['images'] += len(rows)
+                    stats['unreadable'] += len(chunk) - len(rows)
+                    done += len(chunk)
+            if progress:
+                progress(stats)
+    finally:
+        pipeline.close()
+    manifest = writer.close()
+    return dict(stats, shards=len(manifest['shards']), seconds=round(time.perf_counter() - started, 1))
+
+
+def _write_back(hashes, results, version, force=False):
+    """Store one batch of results on its reports and in the cache; returns reports updated."""
+    rows = db.session.execute(
+        select(Report.id, Report.content_hash, Report.report_type, Report.file_path, Report.original_filename,
+               Report.status, Report.analysis_model_version)
+        .where(Report.content_hash.in_(hashes))
+    ).all()
+    params = []
+    for row in rows:
+        if not is_image(row) or row.status in PENDING_STATUSES:
+            continue
+        if row.analysis_model_version == version and not force:
+            continue
+        result = dict(results[row.content_hash], report_type=row.report_type,
+                      confidence_score=results[row.content_hash]['confidence'])
+        values = dict(analysis_values(result, version, row.content_hash), id=row.id)
+        if row.status in UNANALYZED_STATUSES:  # reviewed (approved / rejected) reports keep their status
+            values['status'] = 'analyzed'
+        params.append(values)
+    if params:
+        db.session.execute(update(Report), params)  # bulk UPDATE by primary key, one executemany per column set
+    db.session.commit()
+
+    cached = set(db.session.execute(
+        select(AnalysisCache.content_hash)
+        .where(AnalysisCache.content_hash.in_(hashes), AnalysisCache.model_version == version)
+    ).scalars())
+    missing = [{'content_hash': h, 'model_version': version, 'result': results[h],
+                'classification': results[h]['classification'], 'confidence': results[h]['confidence']}
+               for h in hashes if h not in cached]
+    if missing:
+        try:
+            db.session.execute(insert(AnalysisCache), missing)
+            db.session.commit()
+        except IntegrityError:  # an analyze job cached one of these meanwhile; the rest are re-cached on demand
+            db.session.rollback()
+    return len(params)
+
+
+def rescore(dataset_dir, batch_size=DEFAULT_BATCH_SIZE, force=False, progress=None):
+    """Run the current CNN over a shard dataset and store the results; returns stats."""
+    dataset = ShardDataset(dataset_dir)
+    version = cnn_model_version()
+    if version is None:
+        raise RuntimeError('No CNN model file to rescore with; train or export one first')
+    detector = get_detector()
+    stats = {'images': 0, 'reports': 0, 'total': len(dataset), 'model_version': version}
+    started = time.perf_counter()
+    for hashes, batch in dataset.batches(batch_size):
+        predictions = np.asarray(detector.model.predict_on_batch(batch))  # always a full batch: one input shape
+        results = {h: detector._format_prediction(predictions[i]) for i, h in enumerate(hashes)}
+        stats['reports'] += _write_back(hashes, results, version, force)
+        stats['images'] += len(hashes)
+        if progress:
+            progress(stats)
+    seconds = time.perf_counter() - started
+    return dict(stats, seconds=round(seconds, 1),
+                images_per_second=round(stats['images'] / seconds, 1) if seconds else None)
@@ -0,0 +1,280 @@
+"""Resumable chunked uploads: create a session, PUT chunks at offsets, complete.
+
+Chunks are written to ``<upload folder>/.incoming/resumable/<id>.part`` as
+they stream in, ``CHUNK_SIZE`` bytes at a time, so memory use does not depend
+on the file size and each request stays under MAX_CONTENT_LENGTH. The session
+row holds the confirmed offset. After a dropped connection the client asks for
+the offset and carries on from there; bytes that arrived before the drop are
+kept unless the chunk carried a hash that can no longer be checked.
+
+On completion the part file is hashed, compared with the SHA-256 the client
+declared (if any) and stored in the blob store like a single-shot upload. The
+part file is only removed once the report is committed, so a failed complete
+can be retried.
+"""
+import hashlib
+import os
+import re
+import secrets
+import shutil
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import select, update, delete
+from werkzeug.exceptions import ClientDisconnected
+
+from flask_app.models import db, UploadSession
+from flask_app.utils.blob_store import INCOMING_DIR, CHUNK_SIZE, acquire_blob
+
+RESUMABLE_DIR = 'resumable'
+SESSION_TTL = timedelta(hours=24)  # since the last chunk
+MAX_CHUNK_BYTES = 8 * 1024 * 1024  # keep below MAX_CONTENT_LENGTH
+SUGGESTED_CHUNK_BYTES = 4 * 1024 * 1024
+DEFAULT_MAX_UPLOAD_BYTES = 1024 * 1024 * 1024
+
+_CONTENT_RANGE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+_SHA256 = re.compile(r'^[0-9a-f]{64}$')
+
+
+class OffsetMismatch(Exception):
+    """The chunk does not start at the session's offset; the client should resume from ``offset``."""
+
+    def __init__(self, offset):
+        super().__init__(f'Expected a chunk starting at byte {offset}')
+        self.offset = offset
+
+
+class IncompleteChunk(Exception):
+    """The request body ended early; ``offset`` is how far the upload got."""
+
+    def __init__(self, offset):
+        super().__init__(f'Chunk incomplete; resume from byte {offset}')
+        self.offset = offset
+
+
+def part_dir(upload_folder):
+    return os.path.join(upload_folder, INCOMING_DIR, RESUMABLE_DIR)
+
+
+def part_path(upload_folder, session_id):
+    return os.path.join(part_dir(upload_folder), f'{session_id}.part')
+
+
+def create_session(user_id, filename, size, upload_folder, max_size=DEFAULT_MAX_UPLOAD_BYTES,
+                   sha256=None, report_type=None, description=None, test_date=None):
+    """Open a session for a ``size``-byte upload and create its empty part file; commits."""
+    try:
+        size = int(size)
+    except (TypeError, ValueError):
+        raise ValueError('size must be an integer number of bytes')
+    if size <= 0:
+        raise ValueError('size must be positive')
+    if size > max_size:
+        raise ValueError(f'Uploads are limited to {max_size} bytes')
+    if sha256 is not None:
+        sha256 = str(sha256).lower()
+        if not _SHA256.match(sha256):
+            raise ValueError('sha256 must be 64 hex digits')
+    if test_date:
+        try:
+            test_date = date.fromisoformat(str(test_date))
+        except ValueError:
+            raise ValueError('test_date must be YYYY-MM-DD')
+
+    now = datetime.utcnow()
+    session = UploadSession(
+        id=secrets.token_hex(16),
+        user_id=user_id,
+        filename=filename,
+        report_type=report_type,
+        description=description,
+        test_date=test_date or None,
+        size=size,
+        sha256=sha256,
+        received=0,
+        created_at=now,
+        updated_at=now,
+        expires_at=now + SESSION_TTL,
+    )
+    os.makedirs(part_dir(upload_folder), exist_ok=True)
+    open(part_path(upload_folder, session.id), 'wb').close()
+    db.session.add(session)
+    db.session.commit()
+    return session
+
+
+def parse_content_range(header, total):
+    """``Content-Range: bytes start-end/total`` -> ``(start, length)``."""
+    match = _CONTENT_RANGE.match((header or '').strip())
+    if not match:
+        raise ValueError('Content-Range must be "bytes <start>-<end>/<total>"')
+    start, end, declared = (int(g) for g in match.groups())
+    if declared != total:
+        raise ValueError(f'Content-Range total must be {total}')
+    if end < start or end >= total:
+        raise ValueError('Content-Range is outside the file')
+    length = end - start + 1
+    if length > MAX_CHUNK_BYTES:
+        raise ValueError(f'Chunks are limited to {MAX_CHUNK_BYTES} bytes')
+    return start, length
+
+
+def _advance(session_id, start, new_offset):
+    """Move the confirmed offset forward, unless another request already did; commits."""
+    now = datetime.utcnow()
+    moved = db.session.execute(
+        update(UploadSession)
+        .where(UploadSession.id == session_id, UploadSession.received == start)
+        .values(received=new_offset, updated_at=now, expires_at=now + SESSION_TTL)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    return moved
+
+
+def write_chunk(session, stream, start, length, upload_folder, chunk_sha256=None):
+    """Write ``length`` bytes from ``stream`` at ``start``; returns the new offset.
+
+    With ``chunk_sha256`` the chunk is all-or-nothing: a short or corrupt body
+    is discarded. Without it, whatever arrived is kept and IncompleteChunk
+    reports the offset to resume from.
+    """
+    if start != session.received:
+        raise OffsetMismatch(session.received)
+    session_id = session.id
+    db.session.rollback()  # end the read; the offset is re-checked when it is advanced
+
+    digest = hashlib.sha256()
+    written = 0
+    with open(part_path(upload_folder, session_id), 'r+b') as part:
+        part.truncate(start)  # drop anything past the confirmed offset
+        part.seek(start)
+        try:
+            while written < length:
+                piece = stream.read(min(CHUNK_SIZE, length - written))
+                if not piece:
+                    break
+                digest.update(piece)
+                part.write(piece)
+                written += len(piece)
+        except (ClientDisconnected, OSError):  # client went away mid-body
+            pass
+        verified = chunk_sha256 is None or (written == length and digest.hexdigest() == chunk_sha256.lower())
+        if not verified:
+            part.truncate(start)
+        part.flush()
+        os.fsync(part.fileno())
+
+    if not verified:
+        if written == length:
+            raise ValueError('Chunk SHA-256 does not match')
+        raise IncompleteChunk(start)
+    if not _advance(session_id, start, start + written):
+        raise OffsetMismatch(db.session.get(UploadSession, session_id).received)
+    if written < length:
+        raise IncompleteChunk(start + written)
+    return start + written
+
+
+def _link_part(path, upload_folder):
+    """A second name for the part file in ``.incoming`` for acquire_blob to consume (a copy without hard links)."""
+    tmp_path = os.path.join(upload_folder, INCOMING_DIR, f'{os.path.basename(path)}.{secrets.token_hex(8)}')
+    try:
+        os.link(path, tmp_path)
+    except OSError:
+        shutil.copyfile(path, tmp_path)
+    return tmp_path
+
+
+def complete_session(session, upload_folder, add_report):
+    """Verify the finished upload, store it as a blob and create its report.
+
+    The session row is deleted (and committed) before the file is touched, so
+    a concurrent complete gets OffsetMismatch. ``add_report(blob)`` creates
+    and commits the Report; if storing or that commit fails the session is put
+    back with its part file intact, so the client can simply retry. Returns
+    ``(blob, report)``.
+    """
+    fields = {c.name: getattr(session, c.name) for c in UploadSession.__table__.columns}
+    session_id, size, declared = session.id, session.size, session.sha256
+    if session.received != size:
+        raise ValueError(f'Upload incomplete: {session.received} of {size} bytes received')
+    path = part_path(upload_folder, session_id)
+    digest = hashlib.sha256()
+    try:
+        with open(path, 'rb') as part:
+            for piece in iter(lambda: part.read(CHUNK_SIZE), b''):
+                digest.update(piece)
+    except FileNotFoundError:
+        db.session.rollback()
+        if db.session.get(UploadSession, session_id) is None:  # a concurrent complete finished first
+            raise OffsetMismatch(size)
+        raise
+    sha256 = digest.hexdigest()
+    if declared and sha256 != declared:
+        raise ValueError(f'SHA-256 mismatch: declared {declared}, received {sha256}')
+
+    claimed = db.session.execute(
+        delete(UploadSession).where(UploadSession.id == session_id, UploadSession.received == size)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    if not claimed:  # completed by a concurrent request
+        raise OffsetMismatch(size)
+    try:
+        blob = acquire_blob(_link_part(path, upload_folder), sha256, size, upload_folder)
+        report = add_report(blob)
+    except BaseException:
+        db.session.rollback()
+        db.session.add(UploadSession(**fields))
+        db.session.commit()
+        raise
+    remove_file(path)
+    return blob, report
+
+
+def abort_session(session, upload_folder):
+    """Delete the session and its part file; commits."""
+    remove_sessions([session.id], upload_folder)
+
+
+def remove_file(path):
+    """Delete a part file; returns False if it could not be removed."""
+    try:
+        os.remove(path)
+        return True
+    except OSError:
+        return False
+
+
+def expired_session_ids(now=None, limit=500):
+    return db.session.execute(
+        select(UploadSession.id).where(UploadSession.expires_at < (now or datetime.utcnow()))
+        .order_by(UploadSession.expires_at).limit(limit)
+    ).scalars().all()
+
+
+def remove_sessions(session_ids, upload_folder):
+    """Delete sessions and their part files; commits. Returns the bytes freed."""
+    db.session.execute(delete(UploadSession).where(UploadSession.id.in_(session_ids))
+                       .execution_options(synchronize_session=False))
+    db.session.commit()
+    freed = 0
+    for session_id in session_ids:
+        path = part_path(upload_folder, session_id)
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        if remove_file(path):
+            freed += size
+    return freed
+
+
+def stray_part_files(upload_folder, older_than):
+    """Part files with no session row (e.g. its user was deleted), unmodified since ``older_than`` (epoch seconds)."""
+    folder = part_dir(upload_folder)
+    try:
+        names = [e.name for e in os.scandir(folder)
+                 if e.name.endswith('.part') and e.stat().st_mtime < older_than]
+    except OSError:
+        return []
+    ids = [name[:-len('.part')] for name in names]
+    live = set(db.session.execute(select(UploadSession.id).where(UploadSession.id.in_(ids))).scalars()) if ids else set()
+    return [os.path.join(folder, f'{i}.part') for i in ids if i not in live]
@@ -0,0 +1,281 @@
+"""Where report files live: the local upload folder or an S3-compatible object store.
+
+Both backends take the same keys (``Report.file_path``, e.g. ``ab/cd/<sha256>``)
+and expose put / get / stream / delete / presign. Every transfer moves at
+most ``BUFFER_SIZE`` bytes at a time, so memory use does not depend on file
+size. ``STORAGE_BACKEND`` picks the backend:
+
+* ``local`` (default): files under UPLOAD_FOLDER, mapped by the path resolver.
+* ``s3``: one bucket on AWS S3, MinIO or any other S3-compatible server
+  (``S3_ENDPOINT_URL``; docker-compose runs a MinIO stand-in). Several app
+  nodes can then share report storage. Large files go up as multipart
+  uploads of ``S3_PART_SIZE`` parts.
+
+Temp files (upload spooling, resumable parts) always stay local under
+UPLOAD_FOLDER/.incoming.
+"""
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+from flask import current_app
+
+try:
+    import boto3
+    from botocore.config import Config as BotoConfig
+    from botocore.exceptions import ClientError
+except ImportError:  # optional; only the s3 backend needs it
+    boto3 = None
+
+BUFFER_SIZE = 1024 * 1024
+MIN_PART_SIZE = 5 * 1024 * 1024  # S3 minimum for every part but the last
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+DEFAULT_PRESIGN_SECONDS = 300
+
+
+def _copy(src, dst, length=None):
+    """Copy ``length`` bytes (or everything) from ``src`` to ``dst``, BUFFER_SIZE at a time."""
+    copied = 0
+    while length is None or copied < length:
+        chunk = src.read(BUFFER_SIZE if length is None else min(BUFFER_SIZE, length - copied))
+        if not chunk:
+            break
+        dst.write(chunk)
+        copied += len(chunk)
+    return copied
+
+
+class LocalStorage:
+    """Files under the upload folder; keys resolve through the configured path resolver."""
+
+    name = 'local'
+
+    def __init__(self, upload_folder):
+        self.root = os.path.abspath(upload_folder)
+
+    def local_path(self, key):
+        """Filesystem path for ``key``; local storage only (None for remote backends)."""
+        from flask_app.utils.blob_store import resolve_path  # blob_store imports this module
+        return resolve_path(key, self.root)
+
+    def exists(self, key):
+        return os.path.isfile(self.local_path(key))
+
+    def size(self, key):
+        return os.path.getsize(self.local_path(key))
+
+    def put(self, key, fileobj):
+        """Write ``fileobj`` under ``key`` via a temp file, so readers never see half a file."""
+        final = self.local_path(key)
+        os.makedirs(os.path.dirname(final), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(final))
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                _copy(fileobj, out)
+            os.replace(tmp, final)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def put_file(self, key, path):
+        """Move the local file at ``path`` to ``key`` (a rename when on the same filesystem)."""
+        final = self.local_path(key)
+        os.makedirs(os.path.dirname(final), exist_ok=True)
+        shutil.move(path, final)
+
+    def get(self, key):
+        """A binary file object for ``key``; the caller closes it."""
+        return open(self.local_path(key), 'rb')
+
+    def stream(self, key, start=0, end=None):
+        """Yield the bytes of ``key`` from ``start`` to ``end`` (inclusive) in BUFFER_SIZE chunks."""
+        with self.get(key) as f:
+            f.seek(start)
+            remaining = None if end is None else end - start + 1
+            while remaining is None or remaining > 0:
+                chunk = f.read(BUFFER_SIZE if remaining is None else min(BUFFER_SIZE, remaining))
+                if not chunk:
+                    return
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+    def delete(self, key):
+        try:
+            os.remove(self.local_path(key))
+            return True
+        except OSError:
+            return False
+
+    def presign(self, key, expires=DEFAULT_PRESIGN_SECONDS, filename=None, as_attachment=False):
+        """Local files are served by the app (or nginx X-Accel-Redirect); no direct URL."""
+        return None
+
+    @contextmanager
+    def as_local_file(self, key):
+        yield self.local_path(key)
+
+    def iter_keys(self, prefix=''):
+        """Yield ``(key, size, mtime)`` for every file, including temp files under .incoming."""
+        stack = [os.path.join(self.root, prefix)]
+        while stack:
+            current = stack.pop()
+            try:
+                entries = list(os.scandir(current))
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    st = entry.stat(follow_symlinks=False)
+                    yield os.path.relpath(entry.path, self.root).replace(os.sep, '/'), st.st_size, st.st_mtime
+
+
+class S3Storage:
+    """One bucket (optionally under a key prefix) on an S3-compatible server."""
+
+    name = 's3'
+
+    def __init__(self, bucket, endpoint_url=None, access_key=None, secret_key=None,
+                 region=None, prefix='', part_size=DEFAULT_PART_SIZE, public_endpoint_url=None):
+        if boto3 is None:
+            raise RuntimeError('boto3 is required for STORAGE_BACKEND=s3')
+        self.bucket = bucket
+        self.prefix = prefix.strip('/') + '/' if prefix.strip('/') else ''
+        self.part_size = max(MIN_PART_SIZE, int(part_size))
+        options = dict(
+            aws_access_key_id=access_key or None,
+            aws_secret_access_key=secret_key or None,
+            region_name=region or None,
+            config=BotoConfig(signature_version='s3v4', s3={'addressing_style': 'path'},
+                              retries={'max_attempts': 5, 'mode': 'standard'}),
+        )
+        self.client = boto3.client('s3', endpoint_url=endpoint_url or None, **options)
+        # the host is part of the signature, so URLs for browsers are signed against the address they can reach
+        self.presign_client = (boto3.client('s3', endpoint_url=public_endpoint_url, **options)
+                               if public_endpoint_url else self.client)
+
+    def _key(self, key):
+        return self.prefix + key
+
+    def local_path(self, key):
+        return None
+
+    def exists(self, key):
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._key(key))
+            return True
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+
+    def size(self, key):
+        return self.client.head_object(Bucket=self.bucket, Key=self._key(key))['ContentLength']
+
+    def put(self, key, fileobj):
+        """Upload ``fileobj``: a single PUT if it fits in one part, else a multipart upload."""
+        first = fileobj.read(self.part_size)
+        if len(first) < self.part_size:
+            self.client.put_object(Bucket=self.bucket, Key=self._key(key), Body=first)
+            return
+        upload_id = self.client.create_multipart_upload(Bucket=self.bucket, Key=self._key(key))['UploadId']
+        try:
+            parts, number, body = [], 1, first
+            while body:
+                etag = self.client.upload_part(Bucket=self.bucket, Key=self._key(key), UploadId=upload_id,
+                                               PartNumber=number, Body=body)['ETag']
+                parts.append({'PartNumber': number, 'ETag': etag})
+                number += 1
+                body = fileobj.read(self.part_size)
+            self.client.complete_multipart_upload(Bucket=self.bucket, Key=self._key(key), UploadId=upload_id,
+                                                  MultipartUpload={'Parts': parts})
+        except BaseException:
+            self.client.abort_multipart_upload(Bucket=self.bucket, Key=self._key(key), UploadId=upload_id)
+            raise
+
+    def put_file(self, key, path):
+        """Upload the local file at ``path`` to ``key`` and remove it."""
+        with open(path, 'rb') as f:
+            self.put(key, f)
+        os.remove(path)
+
+    def get(self, key):
+        """The object body as a readable stream; the caller closes it."""
+        return self.client.get_object(Bucket=self.bucket, Key=self._key(key))['Body']
+
+    def stream(self, key, start=0, end=None):
+        params = {'Bucket': self.bucket, 'Key': self._key(key)}
+        if start or end is not None:
+            params['Range'] = f"bytes={start}-{'' if end is None else end}"
+        body = self.client.get_object(**params)['Body']
+        try:
+            yield from body.iter_chunks(BUFFER_SIZE)
+        finally:
+            body.close()
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+        return True
+
+    def presign(self, key, expires=DEFAULT_PRESIGN_SECONDS, filename=None, as_attachment=False):
+        """Time-limited GET URL, so the client downloads straight from the object store."""
+        params = {'Bucket': self.bucket, 'Key': self._key(key)}
+        if filename:
+            disposition = 'attachment' if as_attachment else 'inline'
+            params['ResponseContentDisposition'] = f'{disposition}; filename="{filename}"'
+        return self.presign_client.generate_presigned_url('get_object', Params=params, ExpiresIn=int(expires))
+
+    @contextmanager
+    def as_local_file(self, key):
+        """Download ``key`` to a temp file for code that needs a path (decoders, extractors)."""
+        suffix = os.path.splitext(key)[1]
+        fd, tmp = tempfile.mkstemp(suffix=suffix)
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                body = self.get(key)
+                try:
+                    _copy(body, out)
+                finally:
+                    body.close()
+            yield tmp
+        finally:
+            os.remove(tmp)
+
+    def iter_keys(self, prefix=''):
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self._key(prefix)):
+            for obj in page.get('Contents', []):
+                yield obj['Key'][len(self.prefix):], obj['Size'], obj['LastModified'].timestamp()
+
+
+def create_storage(config, upload_folder=None):
+    backend = config.get('STORAGE_BACKEND') or 'local'
+    if backend == 'local':
+        return LocalStorage(upload_folder or config['UPLOAD_FOLDER'])
+    if backend == 's3':
+        return S3Storage(
+            config['S3_BUCKET'],
+            endpoint_url=config.get('S3_ENDPOINT_URL'),
+            access_key=config.get('S3_ACCESS_KEY'),
+            secret_key=config.get('S3_SECRET_KEY'),
+            region=config.get('S3_REGION'),
+            prefix=config.get('S3_PREFIX', ''),
+            part_size=config.get('S3_PART_SIZE', DEFAULT_PART_SIZE),
+            public_endpoint_url=config.get('S3_PUBLIC_ENDPOINT_URL'),
+        )
+    raise ValueError(f'Unknown STORAGE_BACKEND {backend!r}')
+
+
+def get_storage(upload_folder=None):
+    """The app's storage backend; ``upload_folder`` overrides the root of local storage."""
+    cfg = current_app.config
+    if (cfg.get('STORAGE_BACKEND') or 'local') == 'local':
+        return LocalStorage(upload_folder or cfg['UPLOAD_FOLDER'])
+    storage = current_app.extensions.get('report_storage')
+    if storage is None:
+        storage = current_app.extensions['report_storage'] = create_storage(cfg)
+    return storage
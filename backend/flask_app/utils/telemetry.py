@@ -0,0 +1,290 @@
+"""In-process request metrics and bounded-time health probes for /api/admin/system-health."""
+import bisect
+import importlib.util
+import math
+import os
+import shutil
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from datetime import datetime
+
+from flask import g, request, current_app
+from sqlalchemy import text
+
+try:
+    import psutil
+except ImportError:  # optional; falls back to /proc and os.times()
+    psutil = None
+
+DEFAULT_PROBE_TIMEOUT = 2.0  # seconds
+LOW_DISK_FRACTION = 0.10
+
+# Histogram bucket upper bounds in seconds: 0.1 ms .. ~100 s, 25% apart
+_BUCKETS = [1e-4 * 1.25 ** i for i in range(int(math.log(1e6, 1.25)) + 1)]
+
+
+class LatencyHistogram:
+    """Fixed log-bucket latency histogram; percentiles are bucket upper bounds."""
+
+    def __init__(self):
+        self.counts = [0] * (len(_BUCKETS) + 1)
+        self.total = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, error=False):
+        idx = bisect.bisect_left(_BUCKETS, seconds)
+        with self._lock:
+            self.counts[idx] += 1
+            self.total += 1
+            self.sum += seconds
+            self.max = max(self.max, seconds)
+            if error:
+                self.errors += 1
+
+    def percentile(self, q):
+        with self._lock:
+            if not self.total:
+                return None
+            rank = q * self.total
+            seen = 0
+            for idx, n in enumerate(self.counts):
+                seen += n
+                if seen >= rank:
+                    return _BUCKETS[idx] if idx < len(_BUCKETS) else self.max
+        return self.max
+
+    def snapshot(self):
+        p50, p99 = self.percentile(0.50), self.percentile(0.99)
+        ms = lambda v: round(v * 1000, 2) if v is not None else None
+        return {
+            'count': self.total,
+            'errors': self.errors,
+            'mean_ms': ms(self.sum / self.total) if self.total else None,
+            'p50_ms': ms(p50),
+            'p99_ms': ms(p99),
+            'max_ms': ms(self.max),
+        }
+
+
+_endpoint_metrics = {}
+_metrics_lock = threading.Lock()
+
+
+def _histogram_for(key):
+    hist = _endpoint_metrics.get(key)
+    if hist is None:
+        with _metrics_lock:
+            hist = _endpoint_metrics.setdefault(key, LatencyHistogram())
+    return hist
+
+
+def endpoint_stats():
+    """``{'GET /api/...': {count, p50_ms, p99_ms, ...}}`` for every endpoint seen."""
+    return {key: hist.snapshot() for key, hist in sorted(_endpoint_metrics.items())}
+
+
+def init_app(app):
+    """Time every request by its URL rule (not the raw path, to bound cardinality)."""
+
+    @app.before_request
+    def _start_timer():
+        g._request_started = time.perf_counter()
+
+    @app.after_request
+    def _record_status(response):
+        g._response_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def _record_latency(exc):
+        started = g.pop('_request_started', None)
+        if started is None or request.url_rule is None:
+            return
+        status = g.pop('_response_status', 500)
+        key = f'{request.method} {request.url_rule.rule}'
+        _histogram_for(key).observe(time.perf_counter() - started, error=exc is not None or status >= 500)
+
+
+# ========================
+# PROBES
+# ========================
+
+_probe_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix='health-probe')
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+def run_probes(probes, timeout=DEFAULT_PROBE_TIMEOUT):
+    """Run ``{name: fn}`` probes concurrently, never waiting more than ``timeout`` in total.
+
+    A probe that is still running from an earlier call is not started again,
+    so a hung dependency cannot pile up threads.
+    """
+    app = current_app._get_current_object()
+
+    def call(fn):
+        started = time.perf_counter()
+        with app.app_context():
+            result = fn()
+        result.setdefault('status', 'healthy')
+        result['latency_ms'] = round((time.perf_counter() - started) * 1000, 2)
+        return result
+
+    futures = {}
+    with _inflight_lock:
+        for name, fn in probes.items():
+            running = _inflight.get(name)
+            if running is not None and not running.done():
+                futures[name] = None
+                continue
+            futures[name] = _inflight[name] = _probe_pool.submit(call, fn)
+
+    deadline = time.monotonic() + timeout
+    results = {}
+    for name, future in futures.items():
+        if future is None:
+            results[name] = {'status': 'timeout', 'error': 'previous probe still running'}
+            continue
+        try:
+            results[name] = future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FutureTimeout:
+            results[name] = {'status': 'timeout', 'error': f'no answer within {timeout}s'}
+        except Exception as e:
+            results[name] = {'status': 'unhealthy', 'error': str(e)}
+    return results
+
+
+def probe_database():
+    from flask_app.models import db
+    started = time.perf_counter()
+    with db.engine.connect() as conn:
+        conn.execute(text('SELECT 1'))
+    return {'round_trip_ms': round((time.perf_counter() - started) * 1000, 2),
+            'dialect': db.engine.dialect.name}
+
+
+def probe_pool():
+    from flask_app.models import db
+    pool = db.engine.pool
+    info = {'pool_class': type(pool).__name__}
+    for attr in ('size', 'checkedin', 'checkedout', 'overflow'):
+        fn = getattr(pool, attr, None)
+        if callable(fn):
+            info[attr] = fn()
+    limit = (info.get('size') or 0) + getattr(pool, '_max_overflow', 0)
+    if limit > 0 and info.get('checkedout', 0) >= limit:
+        info['status'] = 'degraded'
+    return info
+
+
+def probe_storage():
+    folder = current_app.config.get('UPLOAD_FOLDER', 'uploads')
+    usage = shutil.disk_usage(folder)
+    info = {
+        'path': folder,
+        'total_bytes': usage.total,
+        'free_bytes': usage.free,
+        'free_fraction': round(usage.free / usage.total, 4) if usage.total else None,
+    }
+    if hasattr(os, 'statvfs'):
+        st = os.statvfs(folder)
+        if st.f_files:
+            info['inodes_total'] = st.f_files
+            info['inodes_free'] = st.f_favail
+            info['inodes_used_fraction'] = round(1 - st.f_favail / st.f_files, 4)
+    low_space = info['free_fraction'] is not None and info['free_fraction'] < LOW_DISK_FRACTION
+    low_inodes = info.get('inodes_used_fraction', 0) > 1 - LOW_DISK_FRACTION
+    if low_space or low_inodes:
+        info['status'] = 'degraded'
+    return info
+
+
+_last_cpu = {'wall': time.monotonic(), 'cpu': sum(os.times()[:2])}
+
+
+def probe_process():
+    """RSS and CPU of this worker; CPU percent is measured since the previous call."""
+    now_wall, now_cpu = time.monotonic(), sum(os.times()[:2])
+    elapsed = now_wall - _last_cpu['wall']
+    cpu_percent = round(100 * (now_cpu - _last_cpu['cpu']) / elapsed, 1) if elapsed > 0 else None
+    _last_cpu.update(wall=now_wall, cpu=now_cpu)
+    info = {'pid': os.getpid(), 'cpu_seconds': round(now_cpu, 2), 'cpu_percent': cpu_percent,
+            'threads': threading.active_count()}
+    if psutil is not None:
+        proc = psutil.Process()
+        info['rss_bytes'] = proc.memory_info().rss
+        info['open_files'] = len(proc.open_files())
+    elif os.path.exists('/proc/self/statm'):
+        with open('/proc/self/statm') as f:
+            info['rss_bytes'] = int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    return info
+
+
+def probe_queues():
+    from flask_app.utils.jobs import queue_depths
+    return queue_depths()
+
+
+# ai_models module -> framework it needs
+AI_MODELS = {
+    'cnn_detector': 'tensorflow',
+    'health_analyzer': 'tensorflow',
+    'nlp_processor': 'transformers',
+}
+
+
+def probe_models():
+    """Whether each AI model's framework is installed and loaded in this process, plus registry load stats."""
+    models = {}
+    for name, framework in AI_MODELS.items():
+        models[name] = {
+            'framework': framework,
+            'framework_installed': importlib.util.find_spec(framework) is not None,
+            'loaded_in_process': f'ai_models.{name}' in sys.modules and framework in sys.modules,
+        }
+    registry = sys.modules.get('ai_models.registry')
+    return {'models': models, 'resident': registry.stats() if registry else {}}
+
+
+def probe_users():
+    from flask_app.models import User
+    return {'total_users': User.query.count()}
+
+
+PROBES = {
+    'database': probe_database,
+    'db_pool': probe_pool,
+    'storage': probe_storage,
+    'process': probe_process,
+    'queues': probe_queues,
+    'models': probe_models,
+    'users': probe_users,
+}
+
+
+def system_health(timeout=DEFAULT_PROBE_TIMEOUT):
+    """Run every probe and roll the results up into one status."""
+    probes = run_probes(PROBES, timeout)
+    statuses = {p.get('status') for p in probes.values()}
+    if probes['database'].get('status') != 'healthy':
+        overall = 'unhealthy'
+    elif statuses - {'healthy'}:
+        overall = 'degraded'
+    else:
+        overall = 'healthy'
+    return {
+        'status': overall,
+        'checked_at': datetime.utcnow().isoformat(),
+        'database': probes['database'].get('status'),
+        'api': 'healthy',
+        'storage': probes['storage'].get('status'),
+        'total_users': probes['users'].get('total_users'),
+        'probes': probes,
+        'endpoints': endpoint_stats(),
+    }
@@ -0,0 +1,157 @@
+"""Report thumbnails and previews, rendered once per content hash by a background job.
+
+Each previewable blob (images, and the first page of PDFs) gets one file per
+entry in ``THUMBNAIL_SIZES`` under ``THUMBNAIL_FOLDER/ab/cd/<sha256>-<size>.<fmt>``.
+``Blob.preview_format`` records the outcome (``webp``/``jpeg``, or ``none`` when
+the file cannot be previewed), so serving a thumbnail never opens the original.
+"""
+import os
+import tempfile
+
+from flask import current_app
+from sqlalchemy import select, update
+
+from flask_app.models import db, Blob
+from flask_app.utils.blob_store import blob_path
+from flask_app.utils.jobs import job_handler, enqueue
+from flask_app.utils.storage import get_storage
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:  # optional; blobs get no preview without it
+    Image = None
+
+try:
+    import pypdfium2 as pdfium
+except ImportError:  # optional; PDFs get no preview without it
+    pdfium = None
+
+# name -> longest edge in pixels
+THUMBNAIL_SIZES = {'thumb': 256, 'preview': 1024}
+IMAGE_EXTENSIONS = {'jpg', 'jpeg', 'png'}
+PDF_EXTENSIONS = {'pdf'}
+NO_PREVIEW = 'none'
+JPEG_QUALITY = 82
+WEBP_QUALITY = 80
+
+
+class PreviewUnsupported(Exception):
+    """The file cannot be previewed; recorded as ``preview_format = 'none'``."""
+
+
+def source_kind(filename):
+    ext = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    if ext in IMAGE_EXTENSIONS:
+        return 'image'
+    if ext in PDF_EXTENSIONS:
+        return 'pdf'
+    return None
+
+
+def thumbnail_path(sha256, size, fmt):
+    """Path relative to THUMBNAIL_FOLDER, sharded like the blobs."""
+    return f'{blob_path(sha256)}-{size}.{fmt}'
+
+
+def output_format():
+    return 'webp' if features.check('webp') else 'jpeg'
+
+
+def _open_image(path, max_edge):
+    img = Image.open(path)
+    img.draft('RGB', (max_edge, max_edge))  # JPEG: let the decoder downscale (1/2, 1/4, 1/8)
+    img = ImageOps.exif_transpose(img)
+    if img.mode not in ('RGB', 'L'):
+        background = Image.new('RGB', img.size, 'white')
+        img = img.convert('RGBA')
+        background.paste(img, mask=img.getchannel('A'))
+        img = background
+    return img
+
+
+def _render_pdf_page(path, max_edge):
+    if pdfium is None:
+        raise PreviewUnsupported('pypdfium2 is not installed')
+    pdf = pdfium.PdfDocument(path)
+    try:
+        page = pdf[0]
+        width, height = page.get_size()
+        return page.render(scale=max_edge / max(width, height)).to_pil().convert('RGB')
+    finally:
+        pdf.close()
+
+
+def render_thumbnails(src_path, kind, sha256, folder):
+    """Write every THUMBNAIL_SIZES rendition of ``src_path``; returns the format used."""
+    if Image is None:  # recorded as no preview, like PDFs without pypdfium2, so clients stop polling
+        raise PreviewUnsupported('Pillow is not installed')
+    max_edge = max(THUMBNAIL_SIZES.values())
+    try:
+        img = _render_pdf_page(src_path, max_edge) if kind == 'pdf' else _open_image(src_path, max_edge)
+    except PreviewUnsupported:
+        raise
+    except Exception as e:  # corrupt file, decompression bomb, encrypted PDF, ...
+        raise PreviewUnsupported(str(e))
+
+    fmt = output_format()
+    save_options = {'quality': WEBP_QUALITY, 'method': 4} if fmt == 'webp' else {'quality': JPEG_QUALITY, 'optimize': True}
+    for size, edge in sorted(THUMBNAIL_SIZES.items(), key=lambda item: -item[1]):
+        img.thumbnail((edge, edge), Image.LANCZOS)  # largest first, each step shrinks the last
+        final = os.path.join(folder, thumbnail_path(sha256, size, fmt))
+        os.makedirs(os.path.dirname(final), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(final))
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                img.save(out, format=fmt.upper(), **save_options)
+            os.replace(tmp, final)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+    return fmt
+
+
+def remove_thumbnails(folder, sha256):
+    for size in THUMBNAIL_SIZES:
+        for fmt in ('webp', 'jpeg'):
+            try:
+                os.remove(os.path.join(folder, thumbnail_path(sha256, size, fmt)))
+            except OSError:
+                pass
+
+
+def enqueue_thumbnails(blob, filename, created_by=None):
+    """Queue rendering for a freshly stored blob unless it is done or not previewable."""
+    if blob.preview_format is not None:
+        return None
+    if source_kind(filename) is None:
+        blob.preview_format = NO_PREVIEW
+        db.session.commit()
+        return None
+    return enqueue('thumbnails', {'sha256': blob.sha256, 'filename': filename},
+                   max_attempts=2, created_by=created_by)
+
+
+@job_handler('thumbnails')
+def run_thumbnails_job(ctx, sha256, filename):
+    blob = db.session.execute(select(Blob).where(Blob.sha256 == sha256)).scalar_one_or_none()
+    if blob is None:
+        return {'sha256': sha256, 'skipped': 'blob deleted'}
+    if blob.preview_format is not None:
+        return {'sha256': sha256, 'format': blob.preview_format, 'skipped': 'already rendered'}
+    db.session.rollback()
+
+    cfg = current_app.config
+    kind = source_kind(filename)
+    try:
+        if kind is None:
+            raise PreviewUnsupported(f'No preview for {filename}')
+        with get_storage().as_local_file(blob_path(sha256)) as source:
+            fmt = render_thumbnails(source, kind, sha256, cfg['THUMBNAIL_FOLDER'])
+        reason = None
+    except PreviewUnsupported as e:
+        fmt, reason = NO_PREVIEW, str(e)
+    db.session.execute(update(Blob).where(Blob.sha256 == sha256).values(preview_format=fmt)
+                       .execution_options(synchronize_session=False))
+    db.session.commit()
+    return {'sha256': sha256, 'format': fmt, 'reason': reason}
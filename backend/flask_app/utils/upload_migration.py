@@ -0,0 +1,146 @@
+"""Move pre-content-addressing uploads into the sharded blob layout, online.
+
+Reports uploaded before the blob store have ``content_hash IS NULL`` and a
+bare ``file_path`` in the upload folder root. For each batch:
+
+1. hash every file (streamed) and hard-link it into ``.incoming`` (a copy if
+   links are not possible), then hand the link to ``acquire_blob``, which
+   stores it at ``ab/cd/<sha256>`` (on the configured storage backend, so
+   this also uploads legacy files to S3) or drops it as a duplicate;
+2. repoint the report with a conditional UPDATE and commit, one report per
+   transaction;
+3. once the batch is done, unlink the old flat files.
+
+Until step 2 commits, the app keeps serving the old path, and afterwards
+the new one. Either path is valid at every moment, so the app can stay up.
+A report deleted mid-batch fails its conditional update and gives its
+blob reference back.
+"""
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import time
+from types import SimpleNamespace
+
+from sqlalchemy import select, update
+
+from flask_app.models import db, Report
+from flask_app.utils.blob_store import (
+    INCOMING_DIR, CHUNK_SIZE, acquire_blob, blob_path, release_report_files, purge_files, resolve_path,
+)
+
+DEFAULT_BATCH_SIZE = 200
+DEFAULT_BATCH_PAUSE = 0.1  # seconds between batches
+_TIMESTAMP_PREFIX = re.compile(r'^\d{8}_\d{6}_')  # legacy names were '<YYYYmmdd_HHMMSS>_<name>'
+
+
+def _hash_file(path):
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+
+def _stage(path, upload_folder):
+    """A second name for ``path`` in .incoming that acquire_blob may consume."""
+    incoming = os.path.join(upload_folder, INCOMING_DIR)
+    os.makedirs(incoming, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=incoming)
+    os.close(fd)
+    os.remove(tmp)
+    try:
+        os.link(path, tmp)
+    except OSError:
+        shutil.copyfile(path, tmp)
+    return tmp
+
+
+def legacy_count():
+    return db.session.execute(
+        select(db.func.count()).select_from(Report).where(Report.content_hash.is_(None))
+    ).scalar_one()
+
+
+def migrate_batch(upload_folder, last_id=0, batch_size=DEFAULT_BATCH_SIZE, dry_run=False):
+    """Migrate the next ``batch_size`` legacy reports after ``last_id``.
+
+    Returns ``(last_id, stats)``, or ``(None, stats)`` when none are left.
+    """
+    stats = {'migrated': 0, 'missing': 0, 'duplicates': 0, 'bytes': 0}
+    rows = db.session.execute(
+        select(Report.id, Report.file_path, Report.original_filename)
+        .where(Report.content_hash.is_(None), Report.id > last_id)
+        .order_by(Report.id).limit(batch_size)
+    ).all()
+    db.session.rollback()  # hashing can take a while; hold no snapshot meanwhile
+    if not rows:
+        return None, stats
+
+    moved = []  # (row, sha256, size)
+    for row in rows:
+        path = resolve_path(row.file_path, upload_folder)
+        if not os.path.isfile(path):
+            stats['missing'] += 1  # left for the missing_files cleanup task
+            continue
+        sha256, size = _hash_file(path)
+        moved.append((row, sha256, size))
+        stats['bytes'] += size
+    if dry_run:
+        stats['migrated'] = len(moved)
+        return rows[-1].id, stats
+
+    old_paths, released = [], []
+    for row, sha256, size in moved:
+        # one transaction per report: acquire_blob may roll back to resolve a concurrent insert
+        blob = acquire_blob(_stage(resolve_path(row.file_path, upload_folder), upload_folder),
+                            sha256, size, upload_folder)
+        if blob.ref_count > 1:
+            stats['duplicates'] += 1
+        repointed = db.session.execute(
+            update(Report)
+            .where(Report.id == row.id, Report.content_hash.is_(None), Report.file_path == row.file_path)
+            .values(content_hash=sha256, file_path=blob_path(sha256), file_size=size,
+                    original_filename=row.original_filename or _TIMESTAMP_PREFIX.sub('', row.file_path))
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if repointed:
+            stats['migrated'] += 1
+            old_paths.append(row.file_path)
+        else:  # deleted or changed since the batch was read: give the reference back
+            released += release_report_files([SimpleNamespace(content_hash=sha256, file_path=None)])
+        db.session.commit()
+
+    # a flat name shared by several legacy reports stays until the last of them has moved
+    still_used = set(db.session.execute(
+        select(Report.file_path).where(Report.file_path.in_(old_paths))
+    ).scalars()) if old_paths else set()
+    db.session.rollback()
+    purge_files(upload_folder, released)
+    for old in set(old_paths) - still_used:  # legacy files are always local, whatever the storage backend
+        try:
+            os.remove(resolve_path(old, upload_folder))
+        except OSError:
+            pass
+    return rows[-1].id, stats
+
+
+def migrate_uploads(upload_folder, batch_size=DEFAULT_BATCH_SIZE, pause=DEFAULT_BATCH_PAUSE,
+                    dry_run=False, progress=None):
+    """Migrate every legacy report, one short transaction per batch."""
+    totals = {'migrated': 0, 'missing': 0, 'duplicates': 0, 'bytes': 0}
+    last_id = 0
+    while True:
+        last_id, stats = migrate_batch(upload_folder, last_id, batch_size, dry_run)
+        for key, value in stats.items():
+            totals[key] += value
+        if last_id is None:
+            return totals
+        if progress:
+            progress(totals)
+        if pause:
+            time.sleep(pause)
@@ -67,10 +67,64 @@ CREATE TABLE reports (
     upload_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     test_date DATE,
     status VARCHAR(50) DEFAULT 'uploaded',
-    ai_analysis TEXT,
+    ai_analysis JSON,
+    ai_classification VARCHAR(50),
+    ai_confidence FLOAT,
+    analysis_model_version VARCHAR(64),
+    content_hash CHAR(64),
+    original_filename VARCHAR(255),
+    file_size BIGINT,
+    analysis_job_id INT,
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
     INDEX idx_user_id (user_id),
-    INDEX idx_upload_date (upload_date)
+    INDEX idx_upload_date (upload_date),
+    INDEX ix_reports_status_upload_date (status, upload_date),
+    INDEX ix_reports_content_hash (content_hash),
+    INDEX ix_reports_ai_classification_confidence (ai_classification, ai_confidence)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Content-addressed Upload Blobs (see backend/flask_app/utils/blob_store.py)
+CREATE TABLE blobs (
+    id INT PRIMARY KEY AUTO_INCREMENT,
+    sha256 CHAR(64) NOT NULL UNIQUE,
+    size BIGINT NOT NULL,
+    ref_count INT NOT NULL DEFAULT 0,
+    preview_format VARCHAR(10),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Resumable Uploads in progress (see backend/flask_app/utils/resumable_uploads.py)
+CREATE TABLE upload_sessions (
+    id CHAR(32) PRIMARY KEY,
+    user_id INT NOT NULL,
+    filename VARCHAR(255) NOT NULL,
+    report_type VARCHAR(120),
+    description TEXT,
+    test_date DATE,
+    size BIGINT NOT NULL,
+    sha256 CHAR(64),
+    received BIGINT NOT NULL DEFAULT 0,
+    created_at DATETIME,
+    updated_at DATETIME,
+    expires_at DATETIME NOT NULL,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    INDEX ix_upload_sessions_user_id (user_id),
+    INDEX ix_upload_sessions_expires_at (expires_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Report Full-Text Search, one row per report (see backend/flask_app/utils/report_search.py)
+CREATE TABLE report_search (
+    report_id INT PRIMARY KEY,
+    user_id INT NOT NULL,
+    report_type VARCHAR(120),
+    upload_date DATETIME,
+    content_hash CHAR(64),
+    description TEXT,
+    body MEDIUMTEXT,
+    FOREIGN KEY (report_id) REFERENCES reports(id) ON DELETE CASCADE,
+    INDEX ix_report_search_user (user_id),
+    INDEX ix_report_search_hash (content_hash),
+    FULLTEXT INDEX ft_report_search (description, body)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 -- Medicines Table
@@ -148,4 +202,55 @@ CREATE TABLE activity_logs (
     INDEX idx_timestamp (timestamp)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
+-- Background Jobs Table (see backend/flask_app/utils/jobs.py)
+CREATE TABLE jobs (
+    id INT PRIMARY KEY AUTO_INCREMENT,
+    job_type VARCHAR(80) NOT NULL,
+    payload TEXT,
+    status VARCHAR(20) DEFAULT 'queued',
+    priority INT DEFAULT 100,
+    attempts INT DEFAULT 0,
+    max_attempts INT DEFAULT 3,
+    run_after DATETIME,
+    progress FLOAT DEFAULT 0,
+    progress_message VARCHAR(255),
+    result TEXT,
+    error TEXT,
+    cancel_requested BOOLEAN DEFAULT FALSE,
+    worker_id VARCHAR(120),
+    heartbeat_at DATETIME,
+    created_by INT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    started_at DATETIME,
+    finished_at DATETIME,
+    INDEX ix_jobs_status_priority_run_after (status, priority, run_after)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Admin Analytics Cube (see backend/flask_app/utils/analytics.py)
+CREATE TABLE analytics_daily (
+    id INT PRIMARY KEY AUTO_INCREMENT,
+    day DATE NOT NULL,
+    metric VARCHAR(40) NOT NULL,
+    dimension VARCHAR(40) NOT NULL DEFAULT 'all',
+    dim_value VARCHAR(80) NOT NULL DEFAULT '',
+    value FLOAT NOT NULL DEFAULT 0,
+    updated_at DATETIME,
+    UNIQUE KEY uq_analytics_daily_cell (metric, dimension, day, dim_value),
+    INDEX ix_analytics_daily_day (day)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Analysis Result Cache, one row per (file content, model version) (see backend/flask_app/utils/report_analysis.py)
+CREATE TABLE analysis_cache (
+    id INT PRIMARY KEY AUTO_INCREMENT,
+    content_hash CHAR(64) NOT NULL,
+    model_version VARCHAR(64) NOT NULL,
+    result JSON NOT NULL,
+    classification VARCHAR(50),
+    confidence FLOAT,
+    hits INT NOT NULL DEFAULT 0,
+    created_at DATETIME,
+    last_used_at DATETIME,
+    UNIQUE KEY uq_analysis_cache_input_model (content_hash, model_version)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
 SET FOREIGN_KEY_CHECKS=1;
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+"""
+Export the Keras models to TFLite for the light CPU runtime (MODEL_RUNTIME=tflite|auto).
+Writes cnn_detector.tflite / health_analyzer.tflite next to the .h5 files in MODEL_PATH.
+Run from project root:
+  python export_models.py                                  # float32
+  python export_models.py --quantize dynamic               # int8 weights
+  python export_models.py --quantize int8 --images data/sample_scans --health-samples features.npy
+Check accuracy with python test_model_runtime.py before switching production over.
+"""
+import os
+import sys
+import glob
+import json
+import argparse
+
+import numpy as np
+
+# Run from project root; backend must be on path
+backend_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend')
+sys.path.insert(0, backend_path)
+
+from config import config
+from ai_models.registry import MODEL_FILES
+from ai_models.runtime import export_tflite, tflite_path
+
+CALIBRATION_SAMPLES = 100
+
+
+def cnn_samples(image_dir, count):
+    """Preprocessed images from ``image_dir`` (random images if none are given)."""
+    if not image_dir:
+        return np.random.default_rng(0).random((count, 224, 224, 3), dtype='float32')
+    from ai_models.preprocessing import load_into
+    paths = sorted(p for p in glob.glob(os.path.join(image_dir, '*'))
+                   if p.lower().endswith(('.jpg', '.jpeg', '.png')))[:count]
+    samples = np.empty((len(paths), 224, 224, 3), dtype='float32')
+    ok = [load_into(p, samples[i]) for i, p in enumerate(paths)]
+    if not any(ok):
+        raise SystemExit(f'No readable images in {image_dir}')
+    return samples[np.array(ok)]
+
+
+def health_samples(path, count):
+    """Feature rows (N, 10) from a .npy file (standard-normal rows if none is given)."""
+    if not path:
+        return np.random.default_rng(0).standard_normal((count, 10)).astype('float32')
+    return np.load(path).astype('float32')[:count]
+
+
+def load_keras_model(name, keras_path):
+    if name == 'cnn_detector':
+        from ai_models.cnn_detector import CNNDiseaseDetector
+        model = CNNDiseaseDetector(keras_path)
+    else:
+        from ai_models.health_analyzer import HealthAnalyzer
+        model = HealthAnalyzer(keras_path)
+    if not model.load_model():
+        raise SystemExit(f'Could not load {name}')
+    return model.model
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export the AI models to TFLite')
+    parser.add_argument('--models', default=','.join(MODEL_FILES), help='Comma-separated model names')
+    parser.add_argument('--model-dir', default=config.MODEL_PATH, help='Where the .h5 files live')
+    parser.add_argument('--quantize', choices=['none', 'dynamic', 'int8'], default='none')
+    parser.add_argument('--images', help='Directory of sample scans to calibrate the CNN for int8')
+    parser.add_argument('--health-samples', help='.npy file of (N, 10) feature rows to calibrate the health model')
+    parser.add_argument('--samples', type=int, default=CALIBRATION_SAMPLES, help='Calibration samples per model')
+    args = parser.parse_args()
+
+    quantize = None if args.quantize == 'none' else args.quantize
+    os.makedirs(args.model_dir, exist_ok=True)
+    summary = {}
+    for name in [m.strip() for m in args.models.split(',') if m.strip()]:
+        keras_path = os.path.join(args.model_dir, MODEL_FILES[name])
+        representative = None
+        if quantize == 'int8':
+            representative = (cnn_samples(args.images, args.samples) if name == 'cnn_detector'
+                              else health_samples(args.health_samples, args.samples))
+        out = tflite_path(keras_path)
+        size = export_tflite(load_keras_model(name, keras_path), out, quantize, representative)
+        summary[name] = {'path': out, 'bytes': size, 'quantize': args.quantize,
+                         'source': keras_path if os.path.exists(keras_path) else 'untrained default model'}
+        print(f'{name}: wrote {out} ({size / 1024:.0f} KiB)')
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,6 @@
 #!/usr/bin/env python
 """Migrate SQLite schema to match current models."""
-import os, sys
+import os, sys, json
 sys.path.insert(0, 'backend')
 
 from flask_app import create_flask_app
@@ -24,6 +24,14 @@ with app.app_context():
         ("health_records", "blood_glucose", "FLOAT"),
         ("health_records", "oxygen_saturation", "FLOAT"),
         ("health_records", "timestamp", "DATETIME"),
+        ("reports", "content_hash", "VARCHAR(64)"),
+        ("reports", "original_filename", "VARCHAR(255)"),
+        ("reports", "file_size", "BIGINT"),
+        ("reports", "analysis_job_id", "INTEGER"),
+        ("reports", "ai_classification", "VARCHAR(50)"),
+        ("reports", "ai_confidence", "FLOAT"),
+        ("reports", "analysis_model_version", "VARCHAR(64)"),
+        ("blobs", "preview_format", "VARCHAR(10)"),
     ]
 
     with db.engine.connect() as conn:
@@ -40,6 +48,61 @@ with app.app_context():
                 else:
                     print(f"  = {table}.{col} already exists")
 
+    indexes = [
+        ("reports", "ix_reports_status_upload_date", "status, upload_date"),
+        ("reports", "ix_reports_upload_date", "upload_date"),
+        ("users", "ix_users_created_at", "created_at"),
+        ("health_records", "ix_health_records_timestamp", "timestamp"),
+        ("reports", "ix_reports_content_hash", "content_hash"),
+        ("reports", "ix_reports_ai_classification_confidence", "ai_classification, ai_confidence"),
+    ]
+
+    with db.engine.connect() as conn:
+        for table, name, columns in indexes:
+            if table in insp.get_table_names():
+                existing = {i['name']: i['column_names'] for i in insp.get_indexes(table)}
+                # database/schema.sql already indexes some of these under its own names (idx_upload_date, ...)
+                same = [n for n, cols in existing.items() if cols == [c.strip() for c in columns.split(',')]]
+                if same and name not in existing:
+                    print(f"  = index {name} covered by existing {same[0]}")
+                elif name not in existing:
+                    try:
+                        conn.execute(text(f"CREATE INDEX {name} ON {table} ({columns})"))
+                        conn.commit()
+                        print(f"  + Added index {name}")
+                    except Exception as e:
+                        print(f"  ! Skip index {name}: {e}")
+                else:
+                    print(f"  = index {name} already exists")
+
+    # reports.ai_analysis used to hold str(dict): rewrite those rows as JSON and fill the filter columns
+    from flask_app.utils.report_analysis import parse_analysis
+    converted = 0
+    with db.engine.connect() as conn:
+        rows = conn.execute(text(
+            "SELECT id, ai_analysis FROM reports WHERE ai_analysis IS NOT NULL AND ai_classification IS NULL AND ai_confidence IS NULL"
+        )).all()
+        for report_id, raw in rows:
+            try:
+                doc = json.loads(raw) if isinstance(raw, str) else raw
+            except ValueError:
+                doc = parse_analysis(raw)
+                if not isinstance(doc, dict):
+                    doc = {'legacy_text': raw}
+            if not isinstance(doc, dict):
+                continue
+            conn.execute(text(
+                "UPDATE reports SET ai_analysis = :doc, ai_classification = :cls, ai_confidence = :conf "
+                "WHERE id = :id"
+            ), {'doc': json.dumps(doc), 'cls': doc.get('classification'),
+                'conf': doc.get('confidence_score', doc.get('confidence')), 'id': report_id})
+            converted += 1
+        conn.commit()
+        if db.engine.dialect.name == 'mysql':
+            conn.execute(text("ALTER TABLE reports MODIFY ai_analysis JSON"))
+            conn.commit()
+    print(f"  + Normalised {converted} reports.ai_analysis rows to JSON")
+
     db.create_all()
     print("\n  db.create_all() done")
 
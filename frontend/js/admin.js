@@ -58,9 +58,11 @@ async function deleteUser(id) {
     return adminRequest(`/admin/users/${id}/delete`, 'DELETE');
 }
 
-async function getAdminReports(page = 1, status = '') {
+async function getAdminReports(page = 1, status = '', classification = '', minConfidence = '') {
     let url = `/admin/reports?page=${page}&per_page=20`;
     if (status) url += `&status=${encodeURIComponent(status)}`;
+    if (classification) url += `&classification=${encodeURIComponent(classification)}`;
+    if (minConfidence !== '') url += `&min_confidence=${encodeURIComponent(minConfidence)}`;
     return adminRequest(url);
 }
 
@@ -72,6 +74,16 @@ async function rejectReport(id) {
     return adminRequest(`/admin/reports/${id}/reject`, 'POST');
 }
 
+async function bulkUpdateReportStatus(ids, status) {
+    return adminRequest('/admin/reports/bulk-status', 'POST', { ids, status });
+}
+
+async function getReviewQueue(cursor = '', limit = 50) {
+    let url = `/admin/reports/queue?limit=${limit}`;
+    if (cursor) url += `&cursor=${encodeURIComponent(cursor)}`;
+    return adminRequest(url);
+}
+
 async function deleteReport(id) {
     return adminRequest(`/admin/reports/${id}/delete`, 'DELETE');
 }
@@ -86,6 +98,34 @@ async function rejectAppointment(id) {
     return adminRequest(`/admin/appointments/${id}/reject`, 'POST');
 }
 
+async function getJobs(page = 1, status = '') {
+    let url = `/admin/jobs?page=${page}&per_page=20`;
+    if (status) url += `&status=${encodeURIComponent(status)}`;
+    return adminRequest(url);
+}
+
+async function getJob(id) {
+    return adminRequest(`/admin/jobs/${id}`);
+}
+
+async function cancelJob(id) {
+    return adminRequest(`/admin/jobs/${id}/cancel`, 'POST');
+}
+
+async function getAnalytics(metric, from = '', to = '', groupBy = 'all') {
+    let url = `/admin/analytics?metric=${encodeURIComponent(metric)}&group_by=${encodeURIComponent(groupBy)}`;
+    if (from) url += `&from=${encodeURIComponent(from)}`;
+    if (to) url += `&to=${encodeURIComponent(to)}`;
+    return adminRequest(url);
+}
+
+async function refreshAnalytics(since = '', until = '') {
+    const body = {};
+    if (since) body.since = since;
+    if (until) body.until = until;
+    return adminRequest('/admin/analytics/refresh', 'POST', body);
+}
+
 async function getSystemHealth() {
     return adminRequest('/admin/system-health');
 }
@@ -108,9 +148,16 @@ window.adminAPI = {
     getAdminReports,
     approveReport,
     rejectReport,
+    bulkUpdateReportStatus,
+    getReviewQueue,
     deleteReport,
     getAdminAppointments,
     rejectAppointment,
+    getJobs,
+    getJob,
+    cancelJob,
+    getAnalytics,
+    refreshAnalytics,
     getSystemHealth,
     showAdminToast
 };
@@ -319,6 +319,29 @@ async function getReports() {
     }
 }
 
+async function searchReports(query, filters = {}) {
+    try {
+        const params = new URLSearchParams({ q: query, ...filters });
+        const response = await apiRequest(`/reports/search?${params}`);
+        return response.results || [];
+    } catch (error) {
+        return [];
+    }
+}
+
+// Thumbnails need the auth header, so fetch them and hand back an object URL (null if none yet)
+async function getReportThumbnail(reportId, size = 'thumb') {
+    try {
+        const response = await fetch(`${API_BASE_URL}/reports/${reportId}/thumbnail?size=${size}`, {
+            headers: { 'Authorization': `Bearer ${getToken()}` }
+        });
+        if (!response.ok) return null;
+        return URL.createObjectURL(await response.blob());
+    } catch (error) {
+        return null;
+    }
+}
+
 // ========================
 // RECOMMENDATIONS
 // ========================
@@ -408,6 +431,8 @@ window.healthAssistant = {
     cancelAppointment,
     uploadReport,
     getReports,
+    searchReports,
+    getReportThumbnail,
     getDietRecommendations,
     getExerciseRecommendations,
     sendChatMessage,
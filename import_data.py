@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+"""
+Bulk-import users or health records from CSV / NDJSON. Run from project root:
+  python import_data.py users clinic_users.csv
+  python import_data.py health_records readings.ndjson --batch-size 20000
+"""
+import os
+import sys
+import json
+import argparse
+
+# Run from project root; backend must be on path
+backend_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend')
+sys.path.insert(0, backend_path)
+
+from flask_app import create_flask_app
+from flask_app.utils.bulk_import import (
+    bulk_import, detect_format, enqueue_analytics_refresh, IMPORT_KINDS, DEFAULT_BATCH_SIZE,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk-import users or health records')
+    parser.add_argument('kind', choices=IMPORT_KINDS, help='What the file contains')
+    parser.add_argument('path', help='CSV or NDJSON file')
+    parser.add_argument('--format', choices=('csv', 'ndjson'), help='Override format detection')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Rows per insert batch')
+    parser.add_argument('--hash-workers', type=int, help='Threads used for password hashing')
+    args = parser.parse_args()
+
+    app = create_flask_app()
+    with app.app_context(), open(args.path, 'rb') as f:
+        summary = bulk_import(
+            f, args.kind,
+            fmt=args.format or detect_format(args.path),
+            batch_size=args.batch_size,
+            hash_workers=args.hash_workers,
+            progress=lambda n: print(f'  {n} rows processed', end='\r'),
+        )
+        job = enqueue_analytics_refresh(summary)
+    print()
+    print(json.dumps(summary, indent=2))
+    if job is not None:
+        print(f'Queued analytics refresh job #{job.id} for {summary["first_timestamp"]} .. {summary["last_timestamp"]}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+"""
+Build the report full-text search index for reports uploaded before it existed. Run from project root:
+  python index_reports.py             # only reports not indexed yet
+  python index_reports.py --reindex   # re-extract everything
+"""
+import os
+import sys
+import argparse
+
+# Run from project root; backend must be on path
+backend_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend')
+sys.path.insert(0, backend_path)
+
+from flask_app import create_flask_app
+from flask_app.utils.report_search import backfill
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Index report text for /api/reports/search')
+    parser.add_argument('--reindex', action='store_true', help='Rebuild every report, not just missing ones')
+    parser.add_argument('--batch-size', type=int, default=500, help='Reports per commit')
+    args = parser.parse_args()
+
+    app = create_flask_app()
+    with app.app_context():
+        count = backfill(
+            app.config['UPLOAD_FOLDER'],
+            reindex=args.reindex,
+            batch_size=args.batch_size,
+            progress=lambda done, total: print(f'  {done}/{total} reports indexed', end='\r'),
+        )
+    print()
+    print(f'Indexed {count} reports')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+"""
+Move uploads from before content addressing (flat files in uploads/) into the
+sharded ab/cd/<sha256> layout, in small batches while the app keeps running. Run from project root:
+  python migrate_uploads.py --dry-run
+  python migrate_uploads.py --batch-size 500 --pause 0.2
+"""
+import os
+import sys
+import json
+import argparse
+
+# Run from project root; backend must be on path
+backend_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend')
+sys.path.insert(0, backend_path)
+
+from flask_app import create_flask_app
+from flask_app.utils.upload_migration import (
+    migrate_uploads, legacy_count, DEFAULT_BATCH_SIZE, DEFAULT_BATCH_PAUSE,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Migrate legacy flat uploads into the sharded blob layout')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Reports per transaction')
+    parser.add_argument('--pause', type=float, default=DEFAULT_BATCH_PAUSE, help='Seconds to sleep between batches')
+    parser.add_argument('--dry-run', action='store_true', help='Hash and count only; move nothing')
+    args = parser.parse_args()
+
+    app = create_flask_app()
+    with app.app_context():
+        print(f'{legacy_count()} reports still in the flat layout')
+        summary = migrate_uploads(
+            app.config['UPLOAD_FOLDER'],
+            batch_size=args.batch_size,
+            pause=args.pause,
+            dry_run=args.dry_run,
+            progress=lambda t: print(f"  {t['migrated']} migrated, {t['missing']} missing", end='\r'),
+        )
+    print()
+    print(json.dumps(dict(summary, dry_run=args.dry_run), indent=2))
+
+
+if __name__ == '__main__':
+    main()
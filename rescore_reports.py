@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+"""
+Re-analyse historical report images after a model change. Run from project root:
+  python rescore_reports.py build instance/rescore_dataset     # preprocess every image once into shards
+  python rescore_reports.py rescore instance/rescore_dataset   # run the current CNN, write results back
+  python rescore_reports.py rescore instance/rescore_dataset --batch-size 128 --force
+The dataset does not depend on the model, so build it once and rescore after each model update
+(rebuild only when preprocessing changes; rescore refuses a stale dataset).
+"""
+import os
+import sys
+import json
+import argparse
+
+# Run from project root; backend must be on path
+backend_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend')
+sys.path.insert(0, backend_path)
+
+from flask_app import create_flask_app
+from flask_app.utils.rescoring import build_dataset, rescore, DEFAULT_BATCH_SIZE
+from ai_models.shards import DEFAULT_SHARD_SIZE
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk re-analysis of historical report images')
+    sub = parser.add_subparsers(dest='command', required=True)
+    build = sub.add_parser('build', help='Pack preprocessed images into memory-mapped shards')
+    build.add_argument('dataset', help='Output directory (must not already hold a dataset)')
+    build.add_argument('--shard-size', type=int, default=DEFAULT_SHARD_SIZE, help='Images per shard file')
+    build.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Images decoded per batch')
+    build.add_argument('--workers', type=int, help='Decode threads (default: one per CPU)')
+    run = sub.add_parser('rescore', help='Run the current CNN over a dataset and update reports')
+    run.add_argument('dataset', help='Directory written by build')
+    run.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Images per forward pass')
+    run.add_argument('--force', action='store_true', help='Also rewrite reports already at the current model version')
+    args = parser.parse_args()
+
+    app = create_flask_app()
+    with app.app_context():
+        if args.command == 'build':
+            summary = build_dataset(
+                args.dataset, app.config['UPLOAD_FOLDER'],
+                shard_size=args.shard_size, batch_size=args.batch_size, workers=args.workers,
+                progress=lambda s: print(f"  {s['images']} images packed, {s['unreadable']} unreadable", end='\r'),
+            )
+        else:
+            summary = rescore(
+                args.dataset, batch_size=args.batch_size, force=args.force,
+                progress=lambda s: print(f"  {s['images']}/{s['total']} images, {s['reports']} reports updated",
+                                         end='\r'),
+            )
+    print()
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -18,6 +18,7 @@ if backend_path not in sys.path:
 # ─── App Factory ───────────────────────────────────────────────────────────────
 from flask_app import create_flask_app
 from flask_app.models import db
+from flask_app.utils.jobs import start_worker_pool
 
 
 def main():
@@ -51,6 +52,13 @@ def main():
     print(f"📁  Uploads       : {uploads_dir}")
     print("=" * 60 + "\n")
 
+    # Background job workers (JOB_WORKERS=0 disables). With the reloader on,
+    # only the serving child process starts them, not the file watcher.
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        pool = start_worker_pool()
+        if pool:
+            print(f"⚙️   Job workers   : {pool.num_workers} process(es)")
+
     app.run(
         host='0.0.0.0',
         port=5000,
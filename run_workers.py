@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+"""
+Run background job workers on their own (e.g. on a dedicated node).
+Run from the project root:
+  python run_workers.py            # JOB_WORKERS processes (default 2)
+  python run_workers.py --workers 4
+  python run_workers.py --workers 2 --types analyze_report   # dedicated inference pool
+  python run_workers.py --workers 1 --threads 8 --types analyze_report   # one process, micro-batched CNN calls
+"""
+import os
+import sys
+import time
+import argparse
+
+# Run from project root; backend must be on path
+backend_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend')
+sys.path.insert(0, backend_path)
+
+from flask_app.utils.jobs import start_worker_pool
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run background job workers')
+    parser.add_argument('--workers', type=int, default=int(os.getenv('JOB_WORKERS', 2)),
+                        help='Number of worker processes')
+    parser.add_argument('--types', help='Comma-separated job types to run (default: all)')
+    parser.add_argument('--threads', type=int, default=int(os.getenv('JOB_WORKER_THREADS', 1)),
+                        help='Polling threads per worker process; they share its models')
+    args = parser.parse_args()
+
+    job_types = [t.strip() for t in args.types.split(',') if t.strip()] if args.types else None
+    pool = start_worker_pool(args.workers, job_types, args.threads)
+    if pool is None:
+        print('No workers requested')
+        return
+    print(f"Started {pool.num_workers} job worker(s) for {', '.join(job_types or ['all job types'])}; Ctrl+C to stop")
+    try:
+        while any(p.is_alive() for p in pool.processes):
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print('Stopping workers...')
+    finally:
+        pool.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+"""
+Bulk Import Test
+Posts CSV and NDJSON files to POST /api/admin/data-management
+(action=bulk_import) through the Flask test client. Malformed rows (bad JSON,
+non-object lines, wrong field types, out-of-range values and timestamps,
+fractional or unknown user ids, duplicates) must come back as row errors
+while the good rows around them are still imported.
+Runs against a throwaway SQLite database.
+
+Usage:
+    python test_bulk_import.py
+"""
+
+import io
+import json
+import os
+import sys
+import tempfile
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+
+USERS_NDJSON = '\n'.join([
+    json.dumps({'name': 'Ada', 'email': 'ada@example.com', 'phone': '1', 'date_of_birth': '1990-01-01',
+                'gender': 'female', 'password': 'secret'}),
+    '{not json',
+    '[1, 2, 3]',
+    json.dumps({'name': 7, 'email': 'seven@example.com', 'phone': '1', 'date_of_birth': '1990-01-01',
+                'gender': 'male'}),
+    json.dumps({'name': 'Int Email', 'email': 12, 'phone': '1', 'date_of_birth': '1990-01-01', 'gender': 'male'}),
+    json.dumps({'name': 'Bad Password', 'email': 'pw@example.com', 'phone': '1', 'date_of_birth': '1990-01-01',
+                'gender': 'male', 'password': 1234}),
+    json.dumps({'name': 'Ada Again', 'email': 'ada@example.com', 'phone': '1', 'date_of_birth': '1990-01-01',
+                'gender': 'female'}),
+    json.dumps({'name': 'No Gender', 'email': 'ng@example.com', 'phone': '1', 'date_of_birth': '1990-01-01'}),
+    json.dumps({'name': 'Bob', 'email': 'bob@example.com', 'phone': 5550100, 'date_of_birth': '1985-06-30',
+                'gender': 'Male', 'height': '180'}),
+]) + '\n'
+
+HEALTH_CSV = '\n'.join([
+    'user_email,user_id,heart_rate,systolic,temperature,timestamp,notes',
+    'ada@example.com,,72,120,36.6,2024-01-02T08:00:00Z,ok',
+    'ada@example.com,,999,120,36.6,2024-01-02T09:00:00Z,heart rate out of range',
+    'ada@example.com,,70,120,36.6,not a date,bad timestamp',
+    ',,70,120,36.6,,no user',
+    'nobody@example.com,,70,120,36.6,,unknown user',
+    'bob@example.com,,abc,120,36.6,,not a number',
+    'bob@example.com,,65,118,36.8,2024-01-03T08:00:00,ok',
+]) + '\n'
+
+
+def check(label, ok):
+    print(f"  [{'PASS' if ok else 'FAIL'}] {label}")
+    return ok
+
+
+def errors_by_row(summary):
+    return {e['row']: e['error'] for e in summary['errors']}
+
+
+def test_bulk_import(tmp):
+    print('\n' + '='*60)
+    print('[BULK IMPORT TEST] malformed rows are row errors')
+    print('='*60 + '\n')
+
+    os.environ['DATABASE_URI'] = f"sqlite:///{os.path.join(tmp, 'import_test.db')}"
+    from flask_jwt_extended import create_access_token
+    from flask_app import create_flask_app
+    from flask_app.models import db, User, HealthRecord
+
+    app = create_flask_app()
+    client = app.test_client()
+    with app.app_context():
+        admin = User(name='Admin', email='admin@example.com', phone='1', date_of_birth=date(1980, 1, 1),
+                     gender='other', password_hash='x', role='admin')
+        db.session.add(admin)
+        db.session.commit()
+        headers = {'Authorization': f'Bearer {create_access_token(identity=str(admin.id))}'}
+
+    def post(kind, filename, body, **form):
+        data = dict(action='bulk_import', kind=kind, file=(io.BytesIO(body.encode()), filename), **form)
+        return client.post('/api/admin/data-management', headers=headers, data=data,
+                           content_type='multipart/form-data')
+
+    results = []
+
+    print('[TEST 1] users from NDJSON')
+    response = post('users', 'users.ndjson', USERS_NDJSON)
+    summary = response.get_json().get('summary', {})
+    errors = errors_by_row(summary)
+    results.append(check('import completes (200)', response.status_code == 200))
+    results.append(check(f"2 of 9 rows inserted (got {summary.get('inserted')})", summary.get('inserted') == 2))
+    expected = {2: 'Invalid JSON', 3: 'Row is not a JSON object', 4: 'Invalid name', 5: 'Invalid email',
+                6: 'Invalid password', 7: 'Duplicate email in file', 8: 'Missing fields: gender'}
+    for row, error in expected.items():
+        results.append(check(f'row {row}: {error}', errors.get(row) == error))
+    with app.app_context():
+        bob = User.query.filter_by(email='bob@example.com').first()
+        results.append(check('numeric phone and mixed-case gender normalised',
+                             bob is not None and bob.phone == '5550100' and bob.gender == 'male'))
+
+    print('[TEST 2] health records from CSV')
+    response = post('health_records', 'vitals.csv', HEALTH_CSV)
+    summary = response.get_json().get('summary', {})
+    errors = errors_by_row(summary)
+    results.append(check('import completes (200)', response.status_code == 200))
+    results.append(check(f"2 of 7 rows inserted (got {summary.get('inserted')})", summary.get('inserted') == 2))
+    expected = {2: 'Invalid heart_rate', 3: 'Invalid timestamp', 4: 'user_id or user_email is required',
+                6: 'Invalid heart_rate'}
+    for row, error in expected.items():
+        results.append(check(f'row {row}: {error}', errors.get(row) == error))
+    results.append(check('row 5: unknown user reported', 'Unknown user' in (errors.get(5) or '')))
+
+    print('[TEST 3] health records from NDJSON with wrong types')
+    with app.app_context():
+        ada_id = User.query.filter_by(email='ada@example.com').one().id
+    lines = [
+        {'user_id': ada_id, 'heart_rate': 80, 'timestamp': 1704268800},
+        {'user_id': ada_id + 0.7, 'heart_rate': 80},
+        {'user_email': 42, 'heart_rate': 80},
+        {'user_id': ada_id, 'heart_rate': 80, 'timestamp': 1e20},
+        {'user_id': ada_id, 'heart_rate': [80]},
+        {'user_id': ada_id, 'heart_rate': 81, 'notes': {'free': 'text'}},
+    ]
+    response = post('health_records', 'vitals.ndjson', '\n'.join(json.dumps(line) for line in lines))
+    summary = response.get_json().get('summary', {})
+    errors = errors_by_row(summary)
+    results.append(check('import completes (200)', response.status_code == 200))
+    expected = {2: 'Invalid user_id', 3: 'Invalid user_email', 4: 'Invalid timestamp', 5: 'Invalid heart_rate'}
+    for row, error in expected.items():
+        results.append(check(f'row {row}: {error}', errors.get(row) == error))
+    with app.app_context():
+        count = HealthRecord.query.filter_by(user_id=ada_id).count()
+        results.append(check(f'good rows stored for the right user (ada has {count} of 3)', count == 3))
+
+    print('[TEST 4] request errors')
+    response = post('health_records', 'vitals.csv', HEALTH_CSV, batch_size='lots')
+    results.append(check('non-integer batch_size is 400', response.status_code == 400))
+    response = post('pets', 'pets.csv', 'name\nrex\n')
+    results.append(check('unknown kind is 400', response.status_code == 400))
+
+    with app.app_context():
+        db.session.remove()
+    passed = sum(1 for r in results if r)
+    print(f'\n{passed}/{len(results)} checks passed')
+    return passed == len(results)
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as tmp:
+        ok = test_bulk_import(tmp)
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,192 @@
+#!/usr/bin/env python
+"""
+Data Cleanup Test
+Runs POST /api/admin/data-management (action=cleanup) through the Flask test
+client over a seeded database: orphaned and recent upload files, reports
+whose file is gone, old and recent cancelled appointments, a deactivated
+user sharing a blob with an active one, a deactivated admin, and expired or
+stray resumable uploads. A dry run must change nothing, the real run must
+remove exactly the stale data in small batches, and a second run must find
+nothing left.
+Runs against a throwaway SQLite database and upload folder.
+
+Usage:
+    python test_data_cleanup.py
+"""
+
+import io
+import os
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+
+SHARED = b'shared scan bytes\n' * 100
+PRIVATE = b'only the deactivated user has this\n' * 50
+OLD = time.time() - 2 * 3600  # past ORPHAN_GRACE_SECONDS
+
+
+def check(label, ok):
+    print(f"  [{'PASS' if ok else 'FAIL'}] {label}")
+    return ok
+
+
+def write_file(path, body, mtime=None):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(body)
+    if mtime:
+        os.utime(path, (mtime, mtime))
+
+
+def test_data_cleanup(tmp):
+    print('\n' + '='*60)
+    print('[CLEANUP TEST] dry run, batched cleanup, re-run')
+    print('='*60 + '\n')
+
+    os.environ['DATABASE_URI'] = f"sqlite:///{os.path.join(tmp, 'cleanup_test.db')}"
+    from flask_jwt_extended import create_access_token
+    from flask_app import create_flask_app
+    from flask_app.models import db, User, HealthRecord, Appointment, Report, Blob, UploadSession
+    from flask_app.utils import resumable_uploads
+    from flask_app.utils.blob_store import blob_path
+
+    app = create_flask_app()
+    upload_folder = app.config['UPLOAD_FOLDER'] = os.path.join(tmp, 'uploads')
+    app.config.update(CLEANUP_BATCH_SIZE=2, CLEANUP_BATCH_PAUSE=0)  # several batches per task
+    client = app.test_client()
+    now = datetime.utcnow()
+
+    with app.app_context():
+        def user(email, role='user'):
+            u = User(name=email.split('@')[0], email=email, phone='1', date_of_birth=date(1980, 1, 1),
+                     gender='other', password_hash='x', role=role)
+            db.session.add(u)
+            db.session.commit()
+            return u.id, {'Authorization': f'Bearer {create_access_token(identity=str(u.id))}'}
+
+        admin_id, admin_headers = user('admin@example.com', 'admin')
+        active_id, active_headers = user('active@example.com')
+        gone_id, gone_headers = user('gone@example.com')
+        old_admin_id, _ = user('old-admin@example.com', 'admin')
+
+    def upload(headers, body, name):
+        return client.post('/api/reports/upload', headers=headers, content_type='multipart/form-data',
+                           data={'file': (io.BytesIO(body), name), 'report_type': 'lab'}).get_json()['report']
+
+    kept = upload(active_headers, SHARED, 'a.pdf')
+    upload(gone_headers, SHARED, 'b.pdf')
+    private = upload(gone_headers, PRIVATE, 'c.pdf')
+
+    with app.app_context():
+        ghost_hash = 'e' * 64
+        db.session.add_all([
+            Report(user_id=active_id, report_type='lab', file_path=blob_path(ghost_hash), content_hash=ghost_hash,
+                   original_filename='ghost.pdf', status='uploaded'),
+            Appointment(user_id=active_id, doctor_name='Dr Old', appointment_date=now - timedelta(days=200),
+                        status='cancelled'),
+            Appointment(user_id=active_id, doctor_name='Dr Old 2', appointment_date=now - timedelta(days=150),
+                        status='cancelled'),
+            Appointment(user_id=active_id, doctor_name='Dr Recent', appointment_date=now - timedelta(days=10),
+                        status='cancelled'),
+            Appointment(user_id=active_id, doctor_name='Dr Kept', appointment_date=now - timedelta(days=200),
+                        status='completed'),
+            Appointment(user_id=gone_id, doctor_name='Dr Gone', appointment_date=now, status='scheduled'),
+            HealthRecord(user_id=gone_id, heart_rate=70, timestamp=now),
+            UploadSession(id='expired0', user_id=active_id, filename='x.pdf', size=10, received=3,
+                          expires_at=now - timedelta(hours=1)),
+            UploadSession(id='alive000', user_id=active_id, filename='y.pdf', size=10, received=3,
+                          expires_at=now + timedelta(hours=1)),
+        ])
+        db.session.commit()
+        db.session.execute(db.update(User).where(User.id.in_([gone_id, old_admin_id]))
+                           .values(is_active=False, updated_at=now - timedelta(days=400)))
+        db.session.commit()
+
+    orphan = os.path.join(upload_folder, blob_path('d' * 64))
+    recent_orphan = os.path.join(upload_folder, blob_path('c' * 64))
+    write_file(orphan, b'nobody points here', OLD)
+    write_file(recent_orphan, b'being uploaded right now')
+    for session_id in ('expired0', 'alive000'):
+        write_file(resumable_uploads.part_path(upload_folder, session_id), b'abc')
+    stray_part = resumable_uploads.part_path(upload_folder, 'stray000')
+    write_file(stray_part, b'session row is gone', OLD)
+    shared_file = os.path.join(upload_folder, kept['file_path'])
+    private_file = os.path.join(upload_folder, private['file_path'])
+
+    def cleanup(**body):
+        response = client.post('/api/admin/data-management', headers=admin_headers,
+                               json=dict(action='cleanup', **body))
+        return response.status_code, (response.get_json().get('report') or {}).get('tasks', {})
+
+    def snapshot():
+        with app.app_context():
+            return (Report.query.count(), Appointment.query.count(), User.query.count(),
+                    UploadSession.query.count(), HealthRecord.query.count(),
+                    sum(len(files) for _, _, files in os.walk(upload_folder)))
+
+    results = []
+
+    print('[TEST 1] dry run')
+    before = snapshot()
+    status, tasks = cleanup()
+    results.append(check('dry run completes (200)', status == 200))
+    results.append(check('one orphan file found, the recent one ignored',
+                         tasks['orphan_files']['found'] == 1 and tasks['orphan_files']['sample'] == [blob_path('d' * 64)]))
+    results.append(check('one report with a missing file found', tasks['missing_files']['found'] == 1))
+    results.append(check('two old cancelled appointments found', tasks['cancelled_appointments']['found'] == 2))
+    results.append(check('one deactivated user found (admins excluded)', tasks['deactivated_users']['found'] == 1))
+    results.append(check('one expired upload session and one stray part file found',
+                         tasks['stale_uploads']['found'] == 2))
+    results.append(check('nothing changed', snapshot() == before))
+
+    print('[TEST 2] cleanup')
+    status, tasks = cleanup(dry_run=False)
+    results.append(check('cleanup completes (200)', status == 200))
+    results.append(check('orphan file deleted, recent one kept',
+                         not os.path.exists(orphan) and os.path.exists(recent_orphan)))
+    with app.app_context():
+        results.append(check('report with the missing file deleted',
+                             Report.query.filter_by(content_hash='e' * 64).count() == 0))
+        doctors = sorted(a.doctor_name for a in Appointment.query)
+        results.append(check(f'only old cancelled appointments deleted ({", ".join(doctors)})',
+                             doctors == ['Dr Kept', 'Dr Recent']))
+        results.append(check('deactivated user and all their rows deleted',
+                             db.session.get(User, gone_id) is None
+                             and Report.query.filter_by(user_id=gone_id).count() == 0
+                             and HealthRecord.query.filter_by(user_id=gone_id).count() == 0))
+        results.append(check('deactivated admin kept', db.session.get(User, old_admin_id) is not None))
+        shared = Blob.query.filter_by(sha256=kept['content_hash']).first()
+        results.append(check('shared blob kept with one reference',
+                             shared is not None and shared.ref_count == 1 and os.path.exists(shared_file)))
+        results.append(check("deactivated user's own blob deleted",
+                             Blob.query.filter_by(sha256=private['content_hash']).count() == 0
+                             and not os.path.exists(private_file)))
+        results.append(check('active report untouched', db.session.get(Report, kept['id']) is not None))
+        sessions = [s.id for s in UploadSession.query]
+        results.append(check('expired upload session deleted, live one kept', sessions == ['alive000']))
+    results.append(check('expired and stray part files deleted, live one kept',
+                         not os.path.exists(resumable_uploads.part_path(upload_folder, 'expired0'))
+                         and not os.path.exists(stray_part)
+                         and os.path.exists(resumable_uploads.part_path(upload_folder, 'alive000'))))
+
+    print('[TEST 3] re-run')
+    status, tasks = cleanup(dry_run=False)
+    results.append(check('nothing left to clean', status == 200 and all(
+        t['found'] == 0 for t in tasks.values())))
+    status, _ = cleanup(tasks='orphan_files,bogus')
+    results.append(check('unknown task is 400', status == 400))
+
+    with app.app_context():
+        db.session.remove()
+    passed = sum(1 for r in results if r)
+    print(f'\n{passed}/{len(results)} checks passed')
+    return passed == len(results)
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as tmp:
+        ok = test_data_cleanup(tmp)
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+"""
+Model Runtime Parity Test
+Exports the CNN and health models to TFLite (float32, dynamic-range and int8),
+checks their outputs (and the health model's NumPy forward pass) against Keras
+on the same inputs, and prints a latency / memory comparison. Needs TensorFlow
+(to build the reference Keras models).
+
+Usage:
+    python test_model_runtime.py
+    python test_model_runtime.py --samples 200 --json runtime_report.json
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+
+# max |probability difference| allowed against Keras, per export
+TOLERANCE = {'float32': 1e-4, 'dynamic': 0.02, 'int8': 0.05}
+# top-1 must agree where Keras is at least this sure of its top class
+MIN_MARGIN = 0.1
+
+
+def rss_bytes():
+    from ai_models.registry import _rss_bytes
+    return _rss_bytes()
+
+
+def latency_ms(predict, batch, repeats=50):
+    predict(batch)
+    times = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        predict(batch)
+        times.append(time.perf_counter() - started)
+    times.sort()
+    return round(times[len(times) // 2] * 1000, 3), round(times[int(0.99 * (len(times) - 1))] * 1000, 3)
+
+
+def compare(name, keras_model, inputs, representative, workdir):
+    from ai_models.runtime import TFLiteModel, export_tflite
+
+    reference = np.asarray(keras_model.predict_on_batch(inputs))
+    rows = []
+    for quantize in ('float32', 'dynamic', 'int8'):
+        path = os.path.join(workdir, f'{name}-{quantize}.tflite')
+        size = export_tflite(keras_model, path, None if quantize == 'float32' else quantize, representative)
+        before = rss_bytes()
+        lite = TFLiteModel(path)
+        output = lite.predict_on_batch(inputs)
+        grown = (rss_bytes() or 0) - (before or 0)
+        max_diff = float(np.max(np.abs(output - reference)))
+        if reference.shape[1] > 1:
+            ordered = np.sort(reference, axis=1)
+            confident = ordered[:, -1] - ordered[:, -2] >= MIN_MARGIN
+            agree = np.argmax(output, 1)[confident] == np.argmax(reference, 1)[confident]
+        else:
+            confident = np.abs(reference[:, 0] - 0.5) >= MIN_MARGIN
+            agree = (output[confident, 0] > 0.5) == (reference[confident, 0] > 0.5)
+        rows.append({
+            'model': name, 'runtime': f'tflite-{quantize}', 'file_bytes': size,
+            'max_abs_diff': round(max_diff, 6),
+            'top1_agreement': round(float(agree.mean()), 4) if agree.size else None,
+            'passed': max_diff <= TOLERANCE[quantize] and (not agree.size or agree.all()),
+            'latency_ms_b1': latency_ms(lite.predict_on_batch, inputs[:1]),
+            'latency_ms_b32': latency_ms(lite.predict_on_batch, inputs[:32]),
+            'rss_growth_bytes': grown,
+        })
+    rows.insert(0, {
+        'model': name, 'runtime': 'keras', 'passed': True,
+        'latency_ms_b1': latency_ms(keras_model.predict_on_batch, inputs[:1]),
+        'latency_ms_b32': latency_ms(keras_model.predict_on_batch, inputs[:32]),
+    })
+    return rows
+
+
+def compare_numpy(keras_model, inputs):
+    """The NumPy forward pass HealthAnalyzer serves Keras Dense models with, against Keras itself."""
+    from ai_models.runtime import DenseNetwork
+
+    network = DenseNetwork.from_keras(keras_model)
+    if network is None:
+        return []
+    reference = np.asarray(keras_model.predict_on_batch(inputs))
+    max_diff = float(np.max(np.abs(network.predict_on_batch(inputs) - reference)))
+    return [{
+        'model': 'health_analyzer', 'runtime': 'numpy', 'max_abs_diff': round(max_diff, 6),
+        'passed': max_diff <= TOLERANCE['float32'],
+        'latency_ms_b1': latency_ms(network.predict_on_batch, inputs[:1]),
+        'latency_ms_b32': latency_ms(network.predict_on_batch, inputs[:32]),
+    }]
+
+
+def test_model_runtime(samples, json_path=None):
+    print('\n' + '='*60)
+    print('[RUNTIME TEST] Keras vs TFLite parity, latency and memory')
+    print('='*60 + '\n')
+
+    import importlib.util
+    if importlib.util.find_spec('tensorflow') is None:
+        print('[SKIP] TensorFlow is not installed; nothing to compare against')
+        return True
+
+    from ai_models.cnn_detector import CNNDiseaseDetector
+    from ai_models.health_analyzer import HealthAnalyzer
+
+    rng = np.random.default_rng(42)
+    rss_start = rss_bytes()
+    detector = CNNDiseaseDetector()
+    detector.load_model()
+    analyzer = HealthAnalyzer()
+    analyzer.load_model()
+    print(f'Keras models loaded; process RSS grew by {((rss_bytes() or 0) - (rss_start or 0)) / 2**20:.0f} MiB '
+          f'(TensorFlow import included)\n')
+
+    images = rng.random((max(samples, 32), 224, 224, 3), dtype='float32')
+    features = rng.standard_normal((max(samples, 32), 10)).astype('float32')
+    rows = []
+    with tempfile.TemporaryDirectory() as workdir:
+        rows += compare('cnn_detector', detector.model, images, images[:50], workdir)
+        rows += compare('health_analyzer', analyzer.model, features, features[:200], workdir)
+    rows += compare_numpy(analyzer.model, features)
+
+    print(f"{'model':<17}{'runtime':<17}{'max diff':>10}{'top-1':>8}{'b1 p50 ms':>11}{'b32 p50 ms':>12}{'KiB':>9}  result")
+    for row in rows:
+        print(f"{row['model']:<17}{row['runtime']:<17}{row.get('max_abs_diff', ''):>10}"
+              f"{row.get('top1_agreement') if row.get('top1_agreement') is not None else '':>8}"
+              f"{row['latency_ms_b1'][0]:>11}{row['latency_ms_b32'][0]:>12}"
+              f"{row['file_bytes'] // 1024 if 'file_bytes' in row else '':>9}  {'PASS' if row['passed'] else 'FAIL'}")
+
+    if json_path:
+        with open(json_path, 'w') as f:
+            json.dump(rows, f, indent=2)
+        print(f'\nWrote {json_path}')
+    return all(row['passed'] for row in rows)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Keras vs TFLite parity test')
+    parser.add_argument('--samples', type=int, default=100, help='Random inputs per model')
+    parser.add_argument('--json', help='Also write the comparison to this file')
+    args = parser.parse_args()
+    sys.exit(0 if test_model_runtime(args.samples, args.json) else 1)
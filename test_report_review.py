@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+"""
+Report Review Test
+Exercises the admin review queue (GET /api/admin/reports/queue) and bulk
+status updates (POST /api/admin/reports/bulk-status) through the Flask test
+client: keyset pagination in priority order, cursor and limit validation,
+updates by id list and by filter, and reports an analyze job owns being left
+alone.
+Runs against a throwaway SQLite database.
+
+Usage:
+    python test_report_review.py
+"""
+
+import os
+import sys
+import tempfile
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+
+# (status, report_type, minutes after the first upload)
+REPORTS = [
+    ('uploaded', 'xray', 0),
+    ('pending_review', 'blood', 5),
+    ('uploaded', 'blood', 10),
+    ('pending_review', 'xray', 1),
+    ('pending_review', 'xray', 1),  # same upload_date: ordered by id
+    ('uploaded', 'xray', 3),
+    ('analyzed', 'xray', 2),
+    ('queued', 'xray', 4),
+    ('analyzing', 'blood', 6),
+]
+
+
+def check(label, ok):
+    print(f"  [{'PASS' if ok else 'FAIL'}] {label}")
+    return ok
+
+
+def test_report_review(tmp):
+    print('\n' + '='*60)
+    print('[REVIEW TEST] review queue and bulk status updates')
+    print('='*60 + '\n')
+
+    os.environ['DATABASE_URI'] = f"sqlite:///{os.path.join(tmp, 'review_test.db')}"
+    from flask_jwt_extended import create_access_token
+    from flask_app import create_flask_app
+    from flask_app.models import db, User, Report
+
+    app = create_flask_app()
+    client = app.test_client()
+    first = datetime(2024, 1, 1, 9, 0)
+    with app.app_context():
+        admin = User(name='Admin', email='admin@example.com', phone='1', date_of_birth=date(1980, 1, 1),
+                     gender='other', password_hash='x', role='admin')
+        patient = User(name='Patient', email='patient@example.com', phone='1', date_of_birth=date(1990, 1, 1),
+                       gender='other', password_hash='x')
+        db.session.add_all([admin, patient])
+        db.session.commit()
+        db.session.add_all([
+            Report(user_id=patient.id, report_type=report_type, file_path=f'r{i}.pdf', status=status,
+                   upload_date=first + timedelta(minutes=minutes))
+            for i, (status, report_type, minutes) in enumerate(REPORTS)
+        ])
+        db.session.commit()
+        headers = {'Authorization': f'Bearer {create_access_token(identity=str(admin.id))}'}
+        patient_headers = {'Authorization': f'Bearer {create_access_token(identity=str(patient.id))}'}
+        expected = [r.id for r in sorted(
+            Report.query.filter(Report.status.in_(['pending_review', 'uploaded'])),
+            key=lambda r: (r.status != 'pending_review', r.upload_date, r.id))]
+
+    def queue(**params):
+        response = client.get('/api/admin/reports/queue', headers=headers, query_string=params)
+        return response.status_code, response.get_json()
+
+    def bulk(**body):
+        response = client.post('/api/admin/reports/bulk-status', headers=headers, json=body)
+        return response.status_code, response.get_json()
+
+    def statuses():
+        with app.app_context():
+            return [r.status for r in Report.query.order_by(Report.id)]
+
+    results = []
+
+    print('[TEST 1] review queue pagination')
+    seen, cursor, pages = [], None, 0
+    while True:
+        status, body = queue(limit=2, **({'cursor': cursor} if cursor else {}))
+        if status != 200:
+            break
+        seen += [r['id'] for r in body['reports']]
+        pages += 1
+        cursor = body['next_cursor']
+        if not cursor or pages > 10:
+            break
+    results.append(check(f'{pages} pages of 2 cover the queue in priority order, each report once',
+                         seen == expected))
+    status, body = queue()
+    results.append(check('queue rows carry the owner', status == 200
+                         and body['reports'][0]['user_email'] == 'patient@example.com'))
+    status, body = queue(limit=0)
+    results.append(check('limit=0 is clamped to 1', status == 200 and len(body['reports']) == 1))
+    status, _ = queue(cursor='approved|2024-01-01T09:00:00|1')
+    results.append(check('cursor with a non-queue status is 400', status == 400))
+    status, _ = queue(cursor='garbage')
+    results.append(check('malformed cursor is 400', status == 400))
+    response = client.get('/api/admin/reports/queue', headers=patient_headers)
+    results.append(check('non-admin is refused', response.status_code == 403))
+
+    print('[TEST 2] bulk status by ids')
+    ids = expected[:2] + [8]  # the first two in the queue and a report the analyze job owns
+    status, body = bulk(status='approved', ids=ids)
+    results.append(check(f"two approved, the queued one skipped (updated {body.get('updated')})",
+                         status == 200 and body['updated'] == 2))
+    current = statuses()
+    results.append(check('queued report still queued', current[7] == 'queued'))
+    status, body = bulk(status='approved', ids=expected[:2])
+    results.append(check('repeating the update changes nothing', status == 200 and body['updated'] == 0))
+
+    print('[TEST 3] bulk status by filter')
+    before = statuses()
+    status, body = bulk(status='rejected', filter={'status': 'uploaded', 'report_type': 'xray',
+                                                   'from': '2024-01-01T09:00:00', 'to': '2024-01-01T10:00:00'})
+    after = statuses()
+    changed = [i for i, (old, new) in enumerate(zip(before, after)) if old != new]
+    results.append(check(f"filter rejects the two uploaded x-rays only (updated {body.get('updated')})",
+                         status == 200 and body['updated'] == 2 and changed == [0, 5]))
+    status, body = bulk(status='pending_review', filter={'report_type': 'blood'})
+    results.append(check('only the uploaded blood report moves; the analysing one is skipped',
+                         status == 200 and statuses()[8] == 'analyzing' and body['updated'] == 1))
+
+    print('[TEST 4] validation')
+    for label, body in [
+        ('worker-owned status is 400', {'status': 'queued', 'ids': [1]}),
+        ('unknown status is 400', {'status': 'archived', 'ids': [1]}),
+        ('non-integer ids are 400', {'status': 'approved', 'ids': ['x']}),
+        ('empty id list is 400', {'status': 'approved', 'ids': []}),
+        ('empty filter is 400', {'status': 'approved', 'filter': {}}),
+        ('bad date in filter is 400', {'status': 'approved', 'filter': {'from': 'yesterday'}}),
+    ]:
+        status, _ = bulk(**body)
+        results.append(check(label, status == 400))
+
+    with app.app_context():
+        db.session.remove()
+    passed = sum(1 for r in results if r)
+    print(f'\n{passed}/{len(results)} checks passed')
+    return passed == len(results)
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as tmp:
+        ok = test_report_review(tmp)
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+"""
+Report Storage Test
+Uploads the same file twice through POST /api/reports/upload and checks the
+content-addressed store: one file on disk, a reference count of two, the
+file kept when one report is deleted and removed with the last one. Also
+covers a different user uploading the same bytes and the admin delete path.
+Runs against a throwaway SQLite database and upload folder.
+
+Usage:
+    python test_report_storage.py
+"""
+
+import hashlib
+import io
+import os
+import sys
+import tempfile
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+
+CONTENT = b'%PDF-1.4 lab results\n' * 500
+
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def check(label, ok):
+    print(f"  [{'PASS' if ok else 'FAIL'}] {label}")
+    return ok
+
+
+def test_report_storage(tmp):
+    print('\n' + '='*60)
+    print('[STORAGE TEST] deduplicated uploads and reference counting')
+    print('='*60 + '\n')
+
+    os.environ['DATABASE_URI'] = f"sqlite:///{os.path.join(tmp, 'storage_test.db')}"
+    from flask_jwt_extended import create_access_token
+    from flask_app import create_flask_app
+    from flask_app.models import db, User, Report, Blob
+    from flask_app.utils.blob_store import blob_path
+
+    app = create_flask_app()
+    upload_folder = app.config['UPLOAD_FOLDER'] = os.path.join(tmp, 'uploads')
+    client = app.test_client()
+    with app.app_context():
+        def user(email, role='user'):
+            u = User(name=email.split('@')[0], email=email, phone='1', date_of_birth=date(1990, 1, 1),
+                     gender='other', password_hash='x', role=role)
+            db.session.add(u)
+            db.session.commit()
+            return {'Authorization': f'Bearer {create_access_token(identity=str(u.id))}'}
+
+        alice, bob, admin = user('alice@example.com'), user('bob@example.com'), user('admin@example.com', 'admin')
+
+    sha256 = hashlib.sha256(CONTENT).hexdigest()
+    stored = os.path.join(upload_folder, blob_path(sha256))
+
+    def upload(headers, name='labs.pdf', body=CONTENT):
+        response = client.post('/api/reports/upload', headers=headers, content_type='multipart/form-data',
+                               data={'file': (io.BytesIO(body), name), 'report_type': 'blood_test'})
+        return response.status_code, response.get_json()
+
+    def ref_count():
+        with app.app_context():
+            blob = Blob.query.filter_by(sha256=sha256).first()
+            return blob.ref_count if blob else None
+
+    def blob_files():
+        return [f for root, _, files in os.walk(upload_folder) if '.incoming' not in root for f in files]
+
+    results = []
+
+    print('[TEST 1] duplicate upload')
+    status, first = upload(alice)
+    results.append(check('first upload is 201 and not a duplicate', status == 201 and first['duplicate'] is False))
+    status, second = upload(alice, 'labs-again.pdf')
+    results.append(check('second upload is 201 and flagged duplicate', status == 201 and second['duplicate'] is True))
+    first, second = first['report'], second['report']
+    results.append(check('both reports point at the same content-addressed file',
+                         first['file_path'] == second['file_path'] == blob_path(sha256)))
+    results.append(check('one file on disk with the uploaded bytes',
+                         blob_files() == [sha256] and read(stored) == CONTENT))
+    results.append(check('reference count is 2', ref_count() == 2))
+    results.append(check('no temp files left in .incoming',
+                         not any(files for _, _, files in os.walk(os.path.join(upload_folder, '.incoming')))))
+
+    print('[TEST 2] another user uploads the same bytes')
+    status, third = upload(bob, 'bobs.pdf')
+    third = third['report']
+    results.append(check('stored once more by reference (count 3)', status == 201 and ref_count() == 3))
+    response = client.get(f"/api/reports/{first['id']}/file", headers=bob)
+    results.append(check("bob cannot read alice's report", response.status_code == 404))
+    response = client.get(f"/api/reports/{third['id']}/file", headers=bob)
+    results.append(check('bob downloads his own copy', response.status_code == 200 and response.data == CONTENT))
+
+    print('[TEST 3] deleting reports')
+    response = client.delete(f"/api/reports/{first['id']}/delete", headers=bob)
+    results.append(check("bob cannot delete alice's report", response.status_code == 404 and ref_count() == 3))
+    response = client.delete(f"/api/reports/{first['id']}/delete", headers=alice)
+    results.append(check('delete one report: blob kept with count 2',
+                         response.status_code == 200 and ref_count() == 2 and os.path.exists(stored)))
+    response = client.delete(f"/api/admin/reports/{third['id']}/delete", headers=admin)
+    results.append(check('admin delete: blob kept with count 1',
+                         response.status_code == 200 and ref_count() == 1 and os.path.exists(stored)))
+    response = client.get(f"/api/reports/{second['id']}/file", headers=alice)
+    results.append(check('remaining report still downloads', response.status_code == 200 and response.data == CONTENT))
+    response = client.delete(f"/api/reports/{second['id']}/delete", headers=alice)
+    results.append(check('delete the last report: blob row and file gone',
+                         response.status_code == 200 and ref_count() is None and not os.path.exists(stored)))
+    with app.app_context():
+        results.append(check('no reports left', Report.query.count() == 0))
+
+    print('[TEST 4] upload after the blob is gone')
+    status, again = upload(alice)
+    results.append(check('same bytes stored afresh', status == 201 and again['duplicate'] is False
+                         and ref_count() == 1 and os.path.exists(stored)))
+    status, _ = upload(alice, 'script.exe', b'MZ')
+    results.append(check('disallowed file type is 400', status == 400 and ref_count() == 1))
+
+    with app.app_context():
+        db.session.remove()
+    passed = sum(1 for r in results if r)
+    print(f'\n{passed}/{len(results)} checks passed')
+    return passed == len(results)
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as tmp:
+        ok = test_report_storage(tmp)
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+"""
+Resumable Upload Test
+Drives /api/reports/uploads through the Flask test client: a chunk cut short
+by a dropped connection and resumed from the reported offset, a chunk whose
+X-Chunk-SHA256 does not match, a complete that fails to commit and is
+retried, and a second complete of a finished upload.
+Runs against a throwaway SQLite database and upload folder.
+
+Usage:
+    python test_resumable_uploads.py
+"""
+
+import hashlib
+import os
+import sys
+import tempfile
+from datetime import date
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+
+CONTENT = os.urandom(300 * 1024)
+
+
+def check(label, ok):
+    print(f"  [{'PASS' if ok else 'FAIL'}] {label}")
+    return ok
+
+
+def put_chunk(client, headers, url, start, body, declared=None, chunk_sha256=None):
+    """PUT ``body`` at ``start``; ``declared`` > len(body) simulates a connection dropped mid-chunk."""
+    declared = declared or len(body)
+    extra = {'Content-Range': f'bytes {start}-{start + declared - 1}/{len(CONTENT)}'}
+    if chunk_sha256:
+        extra['X-Chunk-SHA256'] = chunk_sha256
+    return client.put(url, data=body, headers=dict(headers, **extra),
+                      environ_overrides={'CONTENT_LENGTH': str(declared)})
+
+
+def test_resumable_uploads(tmp):
+    print('\n' + '='*60)
+    print('[RESUMABLE UPLOAD TEST] resume, chunk hash, retried complete')
+    print('='*60 + '\n')
+
+    os.environ['DATABASE_URI'] = f"sqlite:///{os.path.join(tmp, 'uploads_test.db')}"
+    from flask_jwt_extended import create_access_token
+    from flask_app import create_flask_app
+    from flask_app.models import db, User, Report, Blob, UploadSession
+    from flask_app.routes import reports as report_routes
+    from flask_app.utils import resumable_uploads
+
+    app = create_flask_app()
+    upload_folder = app.config['UPLOAD_FOLDER'] = os.path.join(tmp, 'uploads')
+    client = app.test_client()
+    with app.app_context():
+        user = User(name='Upload Tester', email='uploads@example.com', phone='+1000000000',
+                    date_of_birth=date(1990, 1, 1), gender='female', password_hash='x')
+        db.session.add(user)
+        db.session.commit()
+        headers = {'Authorization': f'Bearer {create_access_token(identity=str(user.id))}'}
+
+    results = []
+    sha256 = hashlib.sha256(CONTENT).hexdigest()
+    response = client.post('/api/reports/uploads', headers=headers,
+                           json={'filename': 'scan.pdf', 'size': len(CONTENT), 'sha256': sha256})
+    results.append(check('session created', response.status_code == 201))
+    url = response.get_json()['upload_url']
+    upload_id = response.get_json()['upload_id']
+
+    print('[TEST 1] chunk cut short, then resumed')
+    response = put_chunk(client, headers, url, 0, CONTENT[:60000], declared=100000)
+    offset = response.get_json().get('offset')
+    results.append(check(f'short chunk reports how far it got (offset {offset})',
+                         response.status_code == 400 and offset == 60000))
+    response = client.get(url, headers=headers)
+    results.append(check('GET reports the same offset', response.get_json().get('offset') == 60000))
+    response = put_chunk(client, headers, url, 0, CONTENT[:100000])
+    results.append(check('chunk at a stale offset is 409', response.status_code == 409))
+
+    print('[TEST 2] X-Chunk-SHA256 mismatch')
+    response = put_chunk(client, headers, url, 60000, CONTENT[60000:160000], chunk_sha256='0' * 64)
+    results.append(check('mismatched chunk rejected', response.status_code == 400))
+    response = client.get(url, headers=headers)
+    results.append(check('offset unchanged by the rejected chunk', response.get_json().get('offset') == 60000))
+    piece = CONTENT[60000:160000]
+    response = put_chunk(client, headers, url, 60000, piece, chunk_sha256=hashlib.sha256(piece).hexdigest())
+    results.append(check('matching chunk accepted', response.status_code == 200
+                         and response.get_json().get('offset') == 160000))
+    response = put_chunk(client, headers, url, 160000, CONTENT[160000:])
+    results.append(check('last chunk completes the bytes', response.get_json().get('complete') is True))
+
+    print('[TEST 3] complete fails to commit, then is retried')
+    add_report = report_routes._add_report
+
+    def failing_add_report(*args, **kwargs):
+        raise RuntimeError('simulated commit failure')
+
+    report_routes._add_report = failing_add_report
+    try:
+        response = client.post(f'{url}/complete', headers=headers)
+    finally:
+        report_routes._add_report = add_report
+    part = resumable_uploads.part_path(upload_folder, upload_id)
+    results.append(check('failed complete is a 500', response.status_code == 500))
+    with app.app_context():
+        session = db.session.get(UploadSession, upload_id)
+        results.append(check('session restored with every byte received',
+                             session is not None and session.received == len(CONTENT)))
+        results.append(check('no report and no blob reference left behind',
+                             Report.query.count() == 0 and Blob.query.count() == 0))
+        stale = SimpleNamespace(**{c.name: getattr(session, c.name) for c in UploadSession.__table__.columns})
+    results.append(check('part file kept for the retry', os.path.exists(part)))
+    response = client.post(f'{url}/complete', headers=headers)
+    results.append(check('retried complete creates the report', response.status_code == 201))
+    results.append(check('part file removed after the report is committed', not os.path.exists(part)))
+    with app.app_context():
+        report = Report.query.one()
+        stored = os.path.join(upload_folder, report.file_path)
+        with open(stored, 'rb') as f:
+            results.append(check('stored file matches the upload', hashlib.sha256(f.read()).hexdigest() == sha256))
+        results.append(check('blob referenced once', Blob.query.filter_by(sha256=sha256).one().ref_count == 1))
+
+    print('[TEST 4] completing a finished upload again')
+    response = client.post(f'{url}/complete', headers=headers)
+    results.append(check('session is gone (404)', response.status_code == 404))
+    with app.app_context():
+        try:
+            resumable_uploads.complete_session(stale, upload_folder, lambda blob: None)
+            conflict = False
+        except resumable_uploads.OffsetMismatch:
+            conflict = True
+        results.append(check('a complete that loaded the session before it finished gets a conflict', conflict))
+        db.session.remove()
+
+    passed = sum(1 for r in results if r)
+    print(f'\n{passed}/{len(results)} checks passed')
+    return passed == len(results)
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as tmp:
+        ok = test_resumable_uploads(tmp)
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+"""
+Startup Time Test
+Checks that create_flask_app() is fast and imports no ML framework, and that
+importing the ai_models modules does not import one either: TensorFlow,
+transformers, NLTK and OpenCV load only when a model is first used.
+Each measurement runs in a fresh interpreter against a throwaway SQLite database.
+
+Usage:
+    python test_startup_time.py
+    python test_startup_time.py --budget 0.5 --runs 5
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend')
+HEAVY_MODULES = ('tensorflow', 'keras', 'transformers', 'torch', 'nltk', 'cv2')
+AI_MODULES = ('ai_models.cnn_detector', 'ai_models.health_analyzer', 'ai_models.nlp_processor',
+              'ai_models.registry', 'ai_models.runtime', 'ai_models.tensor_cache', 'ai_models.shards')
+DEFAULT_BUDGET = 0.5  # seconds for create_flask_app()
+
+PROBE = '''
+import importlib, json, sys, time
+sys.path.insert(0, {backend!r})
+started = time.perf_counter()
+from flask_app import create_flask_app
+imported = time.perf_counter()
+app = create_flask_app()
+created = time.perf_counter()
+after_app = sorted({{m.split('.')[0] for m in sys.modules}} & set({heavy!r}))
+for name in {ai_modules!r}:
+    importlib.import_module(name)
+after_ai = sorted({{m.split('.')[0] for m in sys.modules}} & set({heavy!r}))
+print(json.dumps({{'import_seconds': imported - started, 'create_seconds': created - imported,
+                  'heavy_after_app': after_app, 'heavy_after_ai_imports': after_ai}}))
+'''
+
+
+def probe():
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DATABASE_URI=f"sqlite:///{os.path.join(tmp, 'startup.db')}")
+        code = PROBE.format(backend=BACKEND, heavy=HEAVY_MODULES, ai_modules=AI_MODULES)
+        proc = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, env=env, cwd=tmp)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip() or proc.stdout.strip())
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def check(label, ok):
+    print(f"  [{'PASS' if ok else 'FAIL'}] {label}")
+    return ok
+
+
+def test_startup_time(budget, runs):
+    print('\n' + '='*60)
+    print('[STARTUP TEST] create_flask_app() time and heavy imports')
+    print('='*60 + '\n')
+
+    samples = [probe() for _ in range(runs)]
+    best = min(samples, key=lambda s: s['create_seconds'])
+    print(f"create_flask_app(): best {best['create_seconds'] * 1000:.0f} ms of {runs} runs "
+          f"(importing flask_app: {best['import_seconds'] * 1000:.0f} ms)\n")
+
+    results = [
+        check(f'create_flask_app() under {budget:g} s', best['create_seconds'] < budget),
+        check('no ML framework imported by the app (found: {})'.format(', '.join(best['heavy_after_app']) or 'none'),
+              not best['heavy_after_app']),
+        check('no ML framework imported by the ai_models modules (found: {})'.format(
+              ', '.join(best['heavy_after_ai_imports']) or 'none'), not best['heavy_after_ai_imports']),
+    ]
+    passed = sum(1 for r in results if r)
+    print(f'\n{passed}/{len(results)} checks passed')
+    return passed == len(results)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Flask startup time test')
+    parser.add_argument('--budget', type=float, default=DEFAULT_BUDGET, help='Seconds allowed for create_flask_app()')
+    parser.add_argument('--runs', type=int, default=3, help='Fresh interpreters to try; the fastest counts')
+    args = parser.parse_args()
+    sys.exit(0 if test_startup_time(args.budget, args.runs) else 1)
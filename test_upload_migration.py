@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+"""
+Upload Migration Test
+Seeds reports in the old flat upload layout (duplicate content, two reports
+sharing one file name, a missing file, content already in the blob store),
+then runs migrate_uploads: a dry run, a run that crashes mid-batch, and a
+re-run. Every report must end up in the sharded layout with correct
+reference counts and still download through the API; a third run must find
+nothing to do.
+Runs against a throwaway SQLite database and upload folder.
+
+Usage:
+    python test_upload_migration.py
+"""
+
+import io
+import os
+import sys
+import tempfile
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+
+A, B, C, D = (f'{name} report body\n'.encode() * 200 for name in 'ABCD')
+# flat file name -> contents (None: the file is gone)
+LEGACY = [
+    ('20230101_090000_a.pdf', A),
+    ('20230101_090100_b.pdf', B),
+    ('20230101_090200_a_copy.pdf', A),
+    ('20230101_090300_shared.pdf', C),
+    ('20230101_090300_shared.pdf', C),  # two reports, one file
+    ('20230101_090400_missing.pdf', None),
+    ('20230101_090500_d.pdf', D),
+]
+OLD = time.time() - 2 * 3600  # legacy files are old; past the orphan cleanup's grace period
+CRASH_ON_CALL = 4  # the second report of the second batch (batch size 2)
+
+
+def check(label, ok):
+    print(f"  [{'PASS' if ok else 'FAIL'}] {label}")
+    return ok
+
+
+def test_upload_migration(tmp):
+    print('\n' + '='*60)
+    print('[MIGRATION TEST] dry run, interrupted run, re-run')
+    print('='*60 + '\n')
+
+    os.environ['DATABASE_URI'] = f"sqlite:///{os.path.join(tmp, 'migration_test.db')}"
+    from flask_jwt_extended import create_access_token
+    from flask_app import create_flask_app
+    from flask_app.models import db, User, Report, Blob
+    from flask_app.utils import upload_migration
+    from flask_app.utils.blob_store import blob_path
+    from flask_app.utils.cleanup import run_cleanup
+
+    app = create_flask_app()
+    upload_folder = app.config['UPLOAD_FOLDER'] = os.path.join(tmp, 'uploads')
+    os.makedirs(upload_folder, exist_ok=True)
+    client = app.test_client()
+    with app.app_context():
+        user = User(name='Legacy', email='legacy@example.com', phone='1', date_of_birth=date(1970, 1, 1),
+                    gender='other', password_hash='x')
+        db.session.add(user)
+        db.session.commit()
+        headers = {'Authorization': f'Bearer {create_access_token(identity=str(user.id))}'}
+        legacy_ids = []
+        for name, body in LEGACY:
+            report = Report(user_id=user.id, report_type='lab', file_path=name, status='uploaded')
+            db.session.add(report)
+            db.session.commit()
+            legacy_ids.append(report.id)
+            if body is not None:
+                path = os.path.join(upload_folder, name)
+                with open(path, 'wb') as f:
+                    f.write(body)
+                os.utime(path, (OLD, OLD))
+    response = client.post('/api/reports/upload', headers=headers, content_type='multipart/form-data',
+                           data={'file': (io.BytesIO(D), 'd-new.pdf'), 'report_type': 'lab'})
+    modern_id = response.get_json()['report']['id']
+    expected = {report_id: body for report_id, (_, body) in zip(legacy_ids, LEGACY)}
+    expected[modern_id] = D
+
+    def flat_files():
+        return sorted(e.name for e in os.scandir(upload_folder) if e.is_file())
+
+    def refcounts():
+        with app.app_context():
+            return {b.sha256: b.ref_count for b in Blob.query}
+
+    results = []
+
+    with app.app_context():
+        print('[TEST 1] dry run')
+        before = flat_files()
+        totals = upload_migration.migrate_uploads(upload_folder, batch_size=2, pause=0, dry_run=True)
+        results.append(check(f"6 to migrate, 1 missing (got {totals['migrated']}, {totals['missing']})",
+                             totals['migrated'] == 6 and totals['missing'] == 1))
+        results.append(check('nothing moved', flat_files() == before and upload_migration.legacy_count() == 7))
+
+        print('[TEST 2] run crashes mid-batch')
+        acquire_blob, calls = upload_migration.acquire_blob, []
+
+        def crashing_acquire_blob(*args, **kwargs):
+            blob = acquire_blob(*args, **kwargs)  # file stored, reference not yet committed
+            calls.append(1)
+            if len(calls) == CRASH_ON_CALL:
+                raise RuntimeError('simulated crash')
+            return blob
+
+        upload_migration.acquire_blob = crashing_acquire_blob
+        try:
+            upload_migration.migrate_uploads(upload_folder, batch_size=2, pause=0)
+            crashed = False
+        except RuntimeError:
+            crashed = True
+            db.session.rollback()
+        finally:
+            upload_migration.acquire_blob = acquire_blob
+        results.append(check('run interrupted', crashed))
+        results.append(check(f'three reports committed before the crash ({7 - upload_migration.legacy_count()})',
+                             upload_migration.legacy_count() == 4))
+        results.append(check('finished batch cleaned up its flat files',
+                             '20230101_090000_a.pdf' not in flat_files() and '20230101_090100_b.pdf' not in flat_files()))
+        results.append(check('shared flat file untouched', '20230101_090300_shared.pdf' in flat_files()))
+
+        print('[TEST 3] re-run')
+        totals = upload_migration.migrate_uploads(upload_folder, batch_size=2, pause=0)
+        results.append(check(f"remaining 3 migrated, 1 missing (got {totals['migrated']}, {totals['missing']})",
+                             totals['migrated'] == 3 and totals['missing'] == 1))
+        results.append(check('only the missing report is still legacy', upload_migration.legacy_count() == 1))
+        reports = {r.id: r for r in Report.query}
+        results.append(check('migrated reports point at ab/cd/<sha256>', all(
+            r.file_path == blob_path(r.content_hash) for r in reports.values() if r.content_hash)))
+        results.append(check('timestamp prefix stripped into original_filename',
+                             reports[legacy_ids[0]].original_filename == 'a.pdf'))
+        hashes = {r.content_hash for r in reports.values() if r.content_hash}
+        counts = refcounts()
+        results.append(check('one blob per distinct content', len(counts) == 4 and set(counts) == hashes))
+        results.append(check('reference counts match the reports', all(
+            counts[h] == sum(1 for r in reports.values() if r.content_hash == h) for h in hashes)))
+        results.append(check('nothing left in .incoming',
+                             not os.listdir(os.path.join(upload_folder, '.incoming'))))
+        leftover = flat_files()
+        results.append(check(f'only the crashed batch left a flat file behind ({", ".join(leftover)})',
+                             leftover == ['20230101_090200_a_copy.pdf']))
+        orphans = run_cleanup(upload_folder, tasks=['orphan_files'], dry_run=True, pause=0)
+        results.append(check('which the orphan cleanup picks up',
+                             orphans['tasks']['orphan_files']['sample'] == leftover))
+
+        print('[TEST 4] third run')
+        totals = upload_migration.migrate_uploads(upload_folder, batch_size=2, pause=0)
+        results.append(check('nothing left to migrate', totals['migrated'] == 0 and refcounts() == counts))
+        db.session.remove()
+
+    downloads = {report_id: client.get(f'/api/reports/{report_id}/file', headers=headers)
+                 for report_id in expected}
+    results.append(check('every report with a file still downloads its own bytes', all(
+        response.status_code == 200 and response.data == expected[report_id]
+        for report_id, response in downloads.items() if expected[report_id] is not None)))
+    results.append(check('the missing one is 404', downloads[legacy_ids[5]].status_code == 404))
+
+    passed = sum(1 for r in results if r)
+    print(f'\n{passed}/{len(results)} checks passed')
+    return passed == len(results)
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as tmp:
+        ok = test_upload_migration(tmp)
+    sys.exit(0 if ok else 1)